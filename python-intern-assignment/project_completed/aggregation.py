@@ -0,0 +1,184 @@
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+REDUCERS = ("sum", "count", "min", "max", "mean")
+
+
+class Metric(NamedTuple):
+    """
+    Declarative description of one grouped aggregation.
+    `order` can be "desc" or "asc" to sort the result by value (like get_top_articles).
+    """
+    name: str
+    keys: Tuple[str, ...]
+    value: str
+    reducer: str = "sum"
+    order: Optional[str] = None
+
+
+class _GroupCodes:
+    """
+    Group keys factorized once and shared by every metric that groups on the same keys.
+    """
+
+    def __init__(self, df: pd.DataFrame, keys: Tuple[str, ...]):
+        codes = []
+        levels = []
+        for key in keys:
+            key_codes, uniques = pd.factorize(df[key], sort=True)
+            if isinstance(uniques.dtype, pd.CategoricalDtype):
+                # categorical keys group on their codes; the result index holds plain values
+                uniques = np.asarray(uniques)
+            codes.append(key_codes)
+            levels.append(uniques)
+        valid = np.logical_and.reduce([c >= 0 for c in codes])  # groupby drops null keys
+        if len(keys) == 1:
+            self.codes = codes[0]
+            self.index = pd.Index(levels[0], name=keys[0])
+            self.ngroups = len(levels[0])
+        else:
+            # combine the per-key codes into one code per row, then keep only observed groups
+            combined = np.ravel_multi_index(
+                [np.where(valid, c, 0) for c in codes], [max(len(l), 1) for l in levels]
+            )
+            observed, inverse = np.unique(combined[valid], return_inverse=True)
+            self.codes = np.full(len(df), -1, dtype=np.intp)
+            self.codes[valid] = inverse
+            positions = np.unravel_index(observed, [max(len(l), 1) for l in levels])
+            self.index = pd.MultiIndex.from_arrays(
+                [level.take(pos) for level, pos in zip(levels, positions)], names=list(keys)
+            )
+            self.ngroups = len(observed)
+        self.valid = valid
+        self._order = None
+
+    @property
+    def order(self) -> np.ndarray:
+        """
+        Row positions sorted by group, computed lazily for the reduceat kernels.
+        """
+        if self._order is None:
+            self._order = np.argsort(self.codes[self.valid], kind="stable")
+        return self._order
+
+    def reduce(self, values: pd.Series, reducer: str) -> np.ndarray:
+        if reducer not in REDUCERS:
+            raise ValueError(f"Unknown reducer: {reducer}")
+        codes = self.codes[self.valid]
+        array = values.to_numpy()[self.valid]
+        notna = ~pd.isna(array)
+        if reducer == "count":
+            return np.bincount(codes[notna], minlength=self.ngroups).astype(np.int64)
+        if reducer in ("sum", "mean"):
+            if array.dtype.kind in "iub":
+                # exact integer sums: sort once and add contiguous runs
+                sorted_values = array[self.order].astype(np.int64)
+                starts = np.searchsorted(codes[self.order], np.arange(self.ngroups))
+                sums = np.add.reduceat(sorted_values, starts) if len(sorted_values) else sorted_values
+            else:
+                sums = np.bincount(
+                    codes, weights=np.where(notna, array, 0).astype(np.float64), minlength=self.ngroups
+                )
+            if reducer == "sum":
+                return sums
+            counts = np.bincount(codes[notna], minlength=self.ngroups)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return sums / counts
+        # min / max over contiguous runs of the sorted values
+        ufunc = np.minimum if reducer == "min" else np.maximum
+        sorted_codes = codes[self.order]
+        sorted_values = array[self.order]
+        if sorted_values.dtype.kind == "f":
+            fill = np.inf if reducer == "min" else -np.inf
+            sorted_values = np.where(np.isnan(sorted_values), fill, sorted_values)
+        starts = np.searchsorted(sorted_codes, np.arange(self.ngroups))
+        reduced = ufunc.reduceat(sorted_values, starts) if len(sorted_values) else sorted_values
+        if reduced.dtype.kind == "f":
+            # a group with only NaN values is NaN, as in groupby().min(), not the +/-inf fill
+            empty = np.bincount(codes[notna], minlength=self.ngroups) == 0
+            reduced = np.where(empty, np.nan, reduced)
+        return reduced
+
+
+def sort_by_value(result: pd.Series, ascending: bool = False) -> pd.Series:
+    """
+    Sorts a metric by value with ties in group-key order, like `ORDER BY value DESC, key`
+    in the SQL backend, so both backends rank tied groups the same way.
+    """
+    return result.sort_index(kind="stable").sort_values(ascending=ascending, kind="stable")
+
+
+def _finish(metric: Metric, result: pd.Series) -> pd.Series:
+    if metric.order is None:
+        return result
+    return sort_by_value(result, ascending=metric.order == "asc")
+
+
+def compute_metrics(df: pd.DataFrame, metrics: Iterable[Metric], finalize: bool = True) -> Dict[str, pd.Series]:
+    """
+    Computes all metrics in a single pass: each distinct set of group keys is factorized
+    once and every metric on those keys is reduced with vectorized NumPy kernels.
+    Results have the same shape as the equivalent `groupby(keys)[value].agg(reducer)`.
+    """
+    metrics = list(metrics)
+    groups: Dict[Tuple[str, ...], _GroupCodes] = {}
+    results = {}
+    for metric in metrics:
+        keys = tuple(metric.keys)
+        if keys not in groups:
+            groups[keys] = _GroupCodes(df, keys)
+        grouped = groups[keys]
+        values = grouped.reduce(df[metric.value], metric.reducer)
+        result = pd.Series(values, index=grouped.index.copy(), name=metric.value)
+        results[metric.name] = _finish(metric, result) if finalize else result
+    logging.debug("Computed %s metrics over %s rows with %s key factorizations.", len(metrics), len(df), len(groups))
+    return results
+
+
+def combine_metric_results(
+    metrics: Iterable[Metric],
+    totals: Optional[Dict[str, pd.Series]],
+    partials: Dict[str, pd.Series],
+) -> Dict[str, pd.Series]:
+    """
+    Merges partial results (e.g. from two chunks) into running totals.
+    Sums and counts are added, mins and maxes are re-reduced; means cannot be combined.
+    """
+    if totals is None:
+        return dict(partials)
+    combined = {}
+    for metric in metrics:
+        if metric.reducer == "mean":
+            raise ValueError(f"Metric '{metric.name}' uses 'mean', which cannot be combined across chunks")
+        # a shard whose rows all have a NULL key contributes an empty partial; skip it so it
+        # does not affect the result dtype
+        parts = [part for part in (totals[metric.name], partials[metric.name]) if len(part)]
+        if len(parts) < 2:
+            combined[metric.name] = parts[0] if parts else totals[metric.name]
+            continue
+        stacked = pd.concat(parts)
+        how = "sum" if metric.reducer in ("sum", "count") else metric.reducer
+        combined[metric.name] = stacked.groupby(level=list(range(stacked.index.nlevels))).agg(how)
+    return combined
+
+
+def finalize_metric_results(metrics: Iterable[Metric], results: Dict[str, pd.Series]) -> Dict[str, pd.Series]:
+    """
+    Applies the requested ordering once all partial results have been combined.
+    """
+    return {metric.name: _finish(metric, results[metric.name]) for metric in metrics}
+
+
+def metric_columns(metrics: Iterable[Metric]) -> List[str]:
+    """
+    Returns every column the given metrics read.
+    """
+    columns = []
+    for metric in metrics:
+        for column in (*metric.keys, metric.value):
+            if column not in columns:
+                columns.append(column)
+    return columns
@@ -1,76 +1,274 @@
-import random
 import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Iterable, Optional
 import logging
 
 import pandas as pd
-from utils import setup_logging
+from aggregation import (
+    Metric, compute_metrics, combine_metric_results,
+    finalize_metric_results, metric_columns, sort_by_value
+)
+from instrumentation import instrumented
+from persistence import write_metric_tables
+from processing import DERIVED_COLUMN_SOURCES
+from profiling import DataProfile, profile_dataframe
+from topk import top_k_articles
 
-setup_logging(log_file="analysis.log")
-
-logging.basicConfig(level=logging.INFO)
-
-def explore_dataframe(df: pd.DataFrame, name:str="DataFrame"):
+@instrumented
+def explore_dataframe(
+    df: pd.DataFrame,
+    name: str = "DataFrame",
+    sample_size: int = 0,
+    max_rows: Optional[int] = 100_000,
+    max_seconds: Optional[float] = None,
+) -> DataProfile:
+    """
+    Explores the given DataFrame: per-column counts, missing values, min/max, mean/std and
+    approximate distinct counts, computed in one pass. Frames larger than `max_rows` are
+    profiled from a random sample. Returns the structured profile and logs it.
     """
-    Explores the given DataFrame and prints basic information, statistics, and missing values."""
-    print(f"{name} Info:")
-    print(df.info())
-    print("\n")
-    print(df.describe())
-    print("\n")
-    print("Missing values:")
-    print(df.isnull().sum())
-    print("\n")
+    profile = profile_dataframe(df, name, sample_size, max_rows, max_seconds)
+    logging.info("%s profile (%s of %s rows):\n%s", name, profile.rows_profiled, len(df), profile.columns)
+    return profile
 
     #buisness metrics functions
 
+# The business metrics main.py reports, as declarative group-by aggregations
+BUSINESS_METRICS = [
+    Metric("branch_sales", ("branch_id",), "total_amount"),
+    Metric("top_articles", ("article_name",), "quantity", order="desc"),
+    Metric("monthly_revenue", ("year_month",), "total_amount"),
+    Metric("category_revenue", ("category",), "total_amount"),
+]
 
+# Columns of the processed sales frame that each metric reads
+METRIC_COLUMNS = {metric.name: metric_columns([metric]) for metric in BUSINESS_METRICS}
+
+@instrumented
+def required_sales_columns(metric_names: Iterable[str]) -> List[str]:
+    """
+    Returns the raw `sales` columns needed to compute the given metrics, so the
+    loader can read only those columns.
+    """
+    needed = set()
+    for name in metric_names:
+        for column in METRIC_COLUMNS[name]:
+            needed.update(DERIVED_COLUMN_SOURCES.get(column, [column]))
+    return sorted(needed)
 
 
+@instrumented
 def sales_per_branch(sales_with_price: pd.DataFrame) -> pd.Series:
     try:
         """
         Calculates total sales per branch.
         """
-        return sales_with_price.groupby("branch_id")["total_amount"].sum()
+        return sales_with_price.groupby("branch_id", observed=True)["total_amount"].sum()
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
+        logging.error("Error occurred: %s", e)
         return pd.Series(dtype=float)
 
-def get_top_articles(sales_with_price: pd.DataFrame) -> pd.Series:
+@instrumented
+def get_top_articles(sales_with_price: pd.DataFrame, k: Optional[int] = None) -> pd.Series:
     """
     Gets the top-selling articles from the sales DataFrame.
+    With `k`, only the k best are selected (see `topk.top_k_articles`) instead of sorting them all.
     """
     try:
-        return sales_with_price.groupby("article_name")["quantity"].sum().sort_values(ascending=False)
+        if k is not None:
+            return top_k_articles(sales_with_price, k)
+        return sort_by_value(sales_with_price.groupby("article_name", observed=True)["quantity"].sum())
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
+        logging.error("Error occurred: %s", e)
         return pd.Series(dtype=float)
 
+def _with_year_month(sales_with_price: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the yyyymm `year_month` key to frames that only carry year and month columns.
+    """
+    if "year_month" in sales_with_price.columns or not {"year", "month"} <= set(sales_with_price.columns):
+        return sales_with_price
+    sales_with_price = sales_with_price.copy(deep=False)
+    sales_with_price["year_month"] = sales_with_price["year"] * 100 + sales_with_price["month"]
+    return sales_with_price
+
+def _expand_year_month(result: pd.Series) -> pd.Series:
+    """
+    Turns a result grouped on the yyyymm key back into the (year, month) index callers expect.
+    """
+    if result.index.name != "year_month":
+        return result
+    year_month = result.index.to_numpy()
+    result.index = pd.MultiIndex.from_arrays([year_month // 100, year_month % 100], names=["year", "month"])
+    return result
+
+@instrumented
 def calculate_monthly_revenue(sales_with_price: pd.DataFrame) -> pd.Series:
     """
     Calculates monthly revenue from the sales DataFrame.
+    Groups on the single yyyymm key and returns a (year, month) index.
     """
     try:
-        return sales_with_price.groupby(["year", "month"])["total_amount"].sum()
+        if "year_month" in sales_with_price.columns:
+            return _expand_year_month(sales_with_price.groupby("year_month")["total_amount"].sum())
+        return sales_with_price.groupby(["year", "month"], observed=True)["total_amount"].sum()
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
+        logging.error("Error occurred: %s", e)
         return pd.Series(dtype=float)
 
+@instrumented
 def calculate_category_revenue(sales_with_price: pd.DataFrame) -> pd.Series:
     """
     Calculates total revenue per product category from the sales DataFrame.
     """
     try:
-        return sales_with_price.groupby("category")["total_amount"].sum()
+        return sales_with_price.groupby("category", observed=True)["total_amount"].sum()
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
+        logging.error("Error occurred: %s", e)
         return pd.Series(dtype=float)
 
 
+@instrumented
+def calculate_all_metrics(sales_with_price: pd.DataFrame, metrics: List[Metric] = None) -> Dict[str, pd.Series]:
+    """
+    Calculates branch sales, top articles, monthly revenue and category revenue in one
+    pass over the data. Each result matches the corresponding single-metric function.
+    """
+    try:
+        results = compute_metrics(_with_year_month(sales_with_price), metrics or BUSINESS_METRICS)
+        return {name: _expand_year_month(result) for name, result in results.items()}
+    except Exception as e:
+        logging.error("Error occurred: %s", e)
+        return {metric.name: pd.Series(dtype=float) for metric in metrics or BUSINESS_METRICS}
+
+
+#streaming metrics (partial results combined chunk by chunk)
+
+@instrumented
+def partial_metrics_from_chunks(chunks: Iterable[pd.DataFrame], metrics: List[Metric] = None) -> Optional[Dict[str, pd.Series]]:
+    """
+    Aggregates processed sales chunks into unordered per-group totals, which can be combined
+    further with `combine_metric_results`. Returns None if there were no chunks.
+    """
+    metrics = metrics or BUSINESS_METRICS
+    totals = None
+    try:
+        for chunk in chunks:
+            partials = compute_metrics(_with_year_month(chunk), metrics, finalize=False)
+            totals = combine_metric_results(metrics, totals, partials)
+    except Exception as e:
+        logging.error("Error occurred while aggregating chunks: %s", e)
+        raise
+    return totals
+
+@instrumented
+def finish_metrics(totals: Optional[Dict[str, pd.Series]], metrics: List[Metric] = None) -> Dict[str, pd.Series]:
+    """
+    Orders combined totals and gives them the same shape as `calculate_all_metrics`.
+    """
+    metrics = metrics or BUSINESS_METRICS
+    if totals is None:
+        return {metric.name: pd.Series(dtype=float) for metric in metrics}
+    results = finalize_metric_results(metrics, totals)
+    return {name: _expand_year_month(result) for name, result in results.items()}
+
+@instrumented
+def calculate_metrics_from_chunks(chunks: Iterable[pd.DataFrame], metrics: List[Metric] = None) -> Dict[str, pd.Series]:
+    """
+    Calculates the business metrics over processed sales chunks. Each chunk is aggregated
+    in a single pass and only the small per-group totals are kept between chunks.
+    """
+    return finish_metrics(partial_metrics_from_chunks(chunks, metrics), metrics)
+
+
+#selectable metric backends
+
+# The business metrics as SQL over the raw sales/articles tables. Every query returns the
+# group keys followed by the value column, in the same order the pandas groupby uses.
+# TOTAL() is used for revenue because, like pandas, it returns 0.0 when all values are NULL.
+METRIC_QUERIES = {
+    "branch_sales": """
+        SELECT s.branch_id, TOTAL(s.quantity * a.price) AS total_amount
+        FROM sales s
+        LEFT JOIN articles a ON s.article_id = a.article_id
+        WHERE s.branch_id IS NOT NULL
+        GROUP BY s.branch_id
+        ORDER BY s.branch_id
+    """,
+    "top_articles": """
+        SELECT a.article_name, SUM(s.quantity) AS quantity
+        FROM sales s
+        JOIN articles a ON s.article_id = a.article_id
+        WHERE a.article_name IS NOT NULL
+        GROUP BY a.article_name
+        ORDER BY quantity DESC, a.article_name
+    """,
+    "monthly_revenue": """
+        SELECT CAST(strftime('%Y', s.sale_date) AS INTEGER) AS year,
+               CAST(strftime('%m', s.sale_date) AS INTEGER) AS month,
+               TOTAL(s.quantity * a.price) AS total_amount
+        FROM sales s
+        LEFT JOIN articles a ON s.article_id = a.article_id
+        WHERE s.sale_date IS NOT NULL
+        GROUP BY year, month
+        ORDER BY year, month
+    """,
+    "category_revenue": """
+        SELECT a.category, TOTAL(s.quantity * a.price) AS total_amount
+        FROM sales s
+        JOIN articles a ON s.article_id = a.article_id
+        WHERE a.category IS NOT NULL
+        GROUP BY a.category
+        ORDER BY a.category
+    """,
+}
+
+METRIC_BACKENDS = ("pandas", "sqlite")
+
+@instrumented
+def calculate_metrics_sql(conn: sqlite3.Connection, metric_names: List[str] = None) -> Dict[str, pd.Series]:
+    """
+    Calculates the business metrics inside SQLite, directly against sales/articles.
+    Only the aggregated rows are read into Python.
+    """
+    results = {}
+    for metric in BUSINESS_METRICS:
+        if metric_names is not None and metric.name not in metric_names:
+            continue
+        try:
+            df = pd.read_sql_query(METRIC_QUERIES[metric.name], conn)
+            results[metric.name] = df.set_index(list(df.columns[:-1]))[df.columns[-1]]
+        except Exception as e:
+            logging.error("Error occurred while calculating '%s' in SQLite: %s", metric.name, e)
+            results[metric.name] = pd.Series(dtype=float)
+    return results
+
+@instrumented
+def calculate_business_metrics(
+    backend: str = "pandas",
+    sales_with_price: pd.DataFrame = None,
+    conn: sqlite3.Connection = None,
+    metric_names: List[str] = None,
+) -> Dict[str, pd.Series]:
+    """
+    Calculates the business metrics with the selected backend. "pandas" aggregates the
+    processed sales frame; "sqlite" runs the join and aggregations in the database so
+    the merged frame is never built. Both return the same Series for each metric.
+    """
+    if backend == "pandas":
+        if sales_with_price is None:
+            raise ValueError("The pandas backend needs the processed sales frame")
+        metrics = [m for m in BUSINESS_METRICS if metric_names is None or m.name in metric_names]
+        return calculate_all_metrics(sales_with_price, metrics)
+    if backend == "sqlite":
+        if conn is None:
+            raise ValueError("The sqlite backend needs a database connection")
+        return calculate_metrics_sql(conn, metric_names)
+    raise ValueError(f"Unknown metric backend '{backend}', expected one of {METRIC_BACKENDS}")
+
+
 #sql queries on sales data
 
+@instrumented
 def get_total_sales_per_branch(conn: sqlite3.Connection) -> pd.DataFrame:
     """
     Calculates total sales per branch.
@@ -85,9 +283,10 @@ def get_total_sales_per_branch(conn: sqlite3.Connection) -> pd.DataFrame:
         """
         return pd.read_sql_query(query, conn)
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
+        logging.error("Error occurred: %s", e)
         return pd.DataFrame()
 
+@instrumented
 def get_revenue_per_category(conn: sqlite3.Connection) -> pd.DataFrame:
     """
     Calculates total revenue per product category.
@@ -102,12 +301,13 @@ def get_revenue_per_category(conn: sqlite3.Connection) -> pd.DataFrame:
         """
         return pd.read_sql_query(query, conn)
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
+        logging.error("Error occurred: %s", e)
         return pd.DataFrame()
 
-def top5_selling_articles(conn: sqlite3.Connection) -> pd.DataFrame:
+@instrumented
+def top5_selling_articles(conn: sqlite3.Connection, k: int = 5) -> pd.DataFrame:
     """
-    Gets the top 5 selling articles from the sales data.
+    Gets the top 5 (or `k`) selling articles from the sales data.
     """
     try:
         query = """
@@ -116,13 +316,14 @@ def top5_selling_articles(conn: sqlite3.Connection) -> pd.DataFrame:
         JOIN articles a ON s.article_id = a.article_id
         GROUP BY a.article_name
         ORDER BY total_quantity DESC
-        LIMIT 5
+        LIMIT ?
         """
-        return pd.read_sql_query(query, conn)
+        return pd.read_sql_query(query, conn, params=(int(k),))
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
+        logging.error("Error occurred: %s", e)
         return pd.DataFrame()
 
+@instrumented
 def monthly_sales_trend(conn: sqlite3.Connection) -> pd.DataFrame:
     """
     Gets the monthly sales trend from the sales data.
@@ -136,10 +337,11 @@ def monthly_sales_trend(conn: sqlite3.Connection) -> pd.DataFrame:
         """
         return pd.read_sql_query(query, conn)
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
+        logging.error("Error occurred: %s", e)
         return pd.DataFrame()
 
 
+@instrumented
 def sales_performance_by_city(conn: sqlite3.Connection) -> pd.DataFrame:
    """
    Gets the sales performance by city from the sales data.
@@ -156,40 +358,31 @@ def sales_performance_by_city(conn: sqlite3.Connection) -> pd.DataFrame:
        """
        return pd.read_sql_query(query, conn)
    except Exception as e:
-       logging.error(f"Error occurred: {e}")
+       logging.error("Error occurred: %s", e)
        return pd.DataFrame()
 
+@instrumented
 def save_metrics_to_db(
     conn: sqlite3.Connection,
-    sales_by_branch: pd.DataFrame,
-    top_articles: pd.DataFrame,
-    monthly_revenue: pd.DataFrame,
-    category_revenue: pd.DataFrame
-):
+    sales_by_branch: pd.Series,
+    top_articles: pd.Series,
+    monthly_revenue: pd.Series,
+    category_revenue: pd.Series
+) -> Dict[str, Dict[str, float]]:
     """
-    Saves the calculated business metrics to the database.
+    Saves the calculated business metrics to typed, keyed metrics tables in one transaction.
+    Accepts the metric Series (or DataFrames with key and value columns).
+    Returns the rows written and time spent per table.
     """
     try:
-        sales_by_branch = sales_by_branch.reset_index()
-        sales_by_branch.columns = ["branch_id", "total_sales"]
-        sales_by_branch.to_sql(
-            "metrics_sales_by_branch", conn, if_exists="replace", index=False
-        )
-
-        top_articles.columns = ["article_name", "total_quantity"]
-        top_articles.to_sql("metrics_top_articles", conn, if_exists="replace", index=False)
-
-        monthly_revenue.columns = ["year", "month", "revenue"]
-        monthly_revenue.to_sql(
-            "metrics_monthly_revenue", conn, if_exists="replace", index=False
-        )
-
-        category_revenue.columns = ["category", "revenue"]
-        category_revenue.to_sql(
-            "metrics_category_revenue", conn, if_exists="replace", index=False
-        )
-
-        conn.commit()
+        report = write_metric_tables(conn, {
+            "branch_sales": sales_by_branch,
+            "top_articles": top_articles,
+            "monthly_revenue": monthly_revenue,
+            "category_revenue": category_revenue,
+        })
         logging.info("\nAll business metrics saved to database successfully!")
+        return report
     except Exception as e:
-        logging.error(f"Error occurred while saving metrics to DB: {e}")
\ No newline at end of file
+        logging.error("Error occurred while saving metrics to DB: %s", e)
+        return {}
@@ -0,0 +1,160 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+from synthetic_data import generate_database
+from utils import setup_logging
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_DATA_DIR = os.path.join(BENCHMARK_DIR, "data")
+DEFAULT_SCALES = (10_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.3
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak if sys.platform == "darwin" else peak * 1024) / 1024 ** 2
+
+
+def run_benchmark(name: str, db_path: str, repeat: int = 1) -> Dict[str, float]:
+    """
+    Runs one benchmark `repeat` times and keeps the fastest run. Meant to run in a fresh
+    process, so the peak RSS is that of this benchmark alone.
+    """
+    from benchmarks.suite import BENCHMARKS
+    benchmark = next(b for b in BENCHMARKS if b.name == name)
+    runs = [benchmark.func(db_path) for _ in range(repeat)]
+    rows, seconds = min(runs, key=lambda run: run[1])
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 6),
+        "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def database_for(scale: int, data_dir: str, seed: int = 0) -> str:
+    """
+    Returns the generated database for `scale` sales rows, generating it on first use.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    db_path = os.path.join(data_dir, f"sales_{scale}_seed{seed}.db")
+    if not os.path.exists(db_path):
+        logging.info("Generating %s sales rows into %s.", scale, db_path)
+        partial_path = db_path + ".partial"
+        generate_database(partial_path, scale, seed=seed)
+        os.replace(partial_path, db_path)
+    return db_path
+
+
+def run_suite(
+    scales: List[int],
+    names: Optional[List[str]] = None,
+    data_dir: str = DEFAULT_DATA_DIR,
+    repeat: int = 1,
+    isolate: bool = True,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Runs the selected benchmarks at every scale. Results are keyed "<benchmark>@<rows>".
+    With `isolate`, every benchmark runs in its own freshly spawned process.
+    """
+    from benchmarks.suite import BENCHMARKS
+    results = {}
+    for scale in scales:
+        db_path = database_for(scale, data_dir)
+        for benchmark in BENCHMARKS:
+            if names and benchmark.name not in names:
+                continue
+            if benchmark.max_rows is not None and scale > benchmark.max_rows:
+                continue
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    result = executor.submit(run_benchmark, benchmark.name, db_path, repeat).result()
+            else:
+                result = run_benchmark(benchmark.name, db_path, repeat)
+            results[f"{benchmark.name}@{scale}"] = result
+            logging.info("%s@%s: %s", benchmark.name, scale, result)
+    return results
+
+
+def compare_to_baseline(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """
+    Returns a message for every benchmark whose throughput fell, or whose peak RSS grew,
+    by more than `threshold` (a fraction) against the baseline. Benchmarks missing from
+    the baseline are not compared.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if base.get("rows_per_second") and result.get("rows_per_second") is not None:
+            if result["rows_per_second"] < base["rows_per_second"] * (1 - threshold):
+                regressions.append(
+                    f"{key}: throughput {result['rows_per_second']:.0f} rows/s, "
+                    f"baseline {base['rows_per_second']:.0f} rows/s"
+                )
+        if base.get("peak_rss_mb") and result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(
+                f"{key}: peak RSS {result['peak_rss_mb']:.0f} MB, baseline {base['peak_rss_mb']:.0f} MB"
+            )
+    return regressions
+
+
+def format_results(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> str:
+    lines = [f"{'benchmark':<36}{'rows/s':>14}{'baseline':>14}{'peak RSS MB':>13}"]
+    for key, result in results.items():
+        base = baseline.get(key, {}).get("rows_per_second")
+        lines.append(
+            f"{key:<36}{result['rows_per_second'] or 0:>14,.0f}"
+            f"{base if base is not None else float('nan'):>14,.0f}{result['peak_rss_mb']:>13.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on generated data")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES, help="sales rows, e.g. 1e4 1e6")
+    parser.add_argument("--only", nargs="+", help="benchmark names to run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the fastest counts")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where generated databases are kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, e.g. 0.3")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    setup_logging(log_file="benchmarks.log")
+
+    results = run_suite([int(scale) for scale in args.scales], args.only, args.data_dir, args.repeat)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_results(results, baseline))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
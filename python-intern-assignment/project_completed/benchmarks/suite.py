@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from analysis import BUSINESS_METRICS, calculate_metrics_from_chunks
+from data_loading import load_table_from_db, load_table_in_chunks
+from persistence import write_metric_tables
+from processing import add_total_and_date_columns, merge_sales_with_articles, process_sales_chunks
+
+CHUNKSIZE = 100_000
+
+
+class Benchmark(NamedTuple):
+    """
+    One benchmark: `func(db_path)` returns (rows handled, seconds spent in the code under
+    test); setup work such as loading the input is not counted. Benchmarks that hold the
+    whole sales table in memory set `max_rows` and are skipped at larger scales.
+    """
+    name: str
+    func: Callable[[str], Tuple[int, float]]
+    max_rows: Optional[int] = None
+
+
+class _ProducerClock:
+    """
+    Passes chunks through while timing how long producing them took, so a consumer's own
+    time is its total time minus `seconds`.
+    """
+
+    def __init__(self, chunks: Iterable[pd.DataFrame]):
+        self.chunks = chunks
+        self.seconds = 0.0
+        self.rows = 0
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        chunks = iter(self.chunks)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                self.seconds += time.perf_counter() - started
+                return
+            self.seconds += time.perf_counter() - started
+            self.rows += len(chunk)
+            yield chunk
+
+
+def _sales_chunks(db_path: str) -> Iterator[pd.DataFrame]:
+    return load_table_in_chunks(db_path, "sales", chunksize=CHUNKSIZE)
+
+
+def bench_load_table(db_path: str) -> Tuple[int, float]:
+    started = time.perf_counter()
+    df = load_table_from_db(db_path, "sales")
+    return len(df), time.perf_counter() - started
+
+
+def bench_load_chunks(db_path: str) -> Tuple[int, float]:
+    started = time.perf_counter()
+    rows = sum(len(chunk) for chunk in _sales_chunks(db_path))
+    return rows, time.perf_counter() - started
+
+
+def bench_merge(db_path: str) -> Tuple[int, float]:
+    df_articles = load_table_from_db(db_path, "articles")
+    rows, seconds = 0, 0.0
+    for chunk in _sales_chunks(db_path):
+        started = time.perf_counter()
+        merged = merge_sales_with_articles(chunk, df_articles)
+        seconds += time.perf_counter() - started
+        rows += len(merged)
+    return rows, seconds
+
+
+def bench_dates(db_path: str) -> Tuple[int, float]:
+    df_articles = load_table_from_db(db_path, "articles")
+    rows, seconds = 0, 0.0
+    for chunk in _sales_chunks(db_path):
+        merged = merge_sales_with_articles(chunk, df_articles)
+        started = time.perf_counter()
+        processed = add_total_and_date_columns(merged)
+        seconds += time.perf_counter() - started
+        rows += len(processed)
+    return rows, seconds
+
+
+def _bench_metric(metric) -> Callable[[str], Tuple[int, float]]:
+    def bench(db_path: str) -> Tuple[int, float]:
+        df_articles = load_table_from_db(db_path, "articles")
+        clock = _ProducerClock(process_sales_chunks(_sales_chunks(db_path), df_articles))
+        started = time.perf_counter()
+        calculate_metrics_from_chunks(clock, [metric])
+        return clock.rows, time.perf_counter() - started - clock.seconds
+    return bench
+
+
+def bench_persist(db_path: str) -> Tuple[int, float]:
+    df_articles = load_table_from_db(db_path, "articles")
+    metrics = calculate_metrics_from_chunks(process_sales_chunks(_sales_chunks(db_path), df_articles))
+    # metrics go to a scratch database so the generated one stays unchanged
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, "metrics.db"))
+        try:
+            started = time.perf_counter()
+            report = write_metric_tables(conn, metrics)
+            seconds = time.perf_counter() - started
+        finally:
+            conn.close()
+    return sum(stats["rows"] for stats in report.values()), seconds
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark("load_table", bench_load_table, max_rows=10_000_000),
+    Benchmark("load_chunks", bench_load_chunks),
+    Benchmark("merge", bench_merge),
+    Benchmark("dates", bench_dates),
+    *[Benchmark(f"metric_{metric.name}", _bench_metric(metric)) for metric in BUSINESS_METRICS],
+    Benchmark("persist", bench_persist),
+]
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_loading import build_select_query, load_table_from_db
+
+INDEX_FILE = "index.json"
+# Per-table counters bumped by triggers on UPDATE and DELETE (see ensure_change_tracking)
+VERSIONS_TABLE = "table_versions"
+TRACKED_TABLES = ("sales", "articles", "branches")
+
+
+def _write_frame(df: pd.DataFrame, path: str):
+    """
+    Writes a frame as one .npy file per column plus a small JSON header. Numeric, boolean
+    and datetime columns are stored raw so they can be memory-mapped back; text columns are
+    stored as integer codes plus their distinct values.
+    """
+    os.makedirs(path)
+    header = {"columns": [], "index": None}
+    if not (isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1):
+        header["index"] = [
+            name if name is not None else f"level_{i}" for i, name in enumerate(df.index.names)
+        ]
+        df = df.reset_index(names=header["index"])
+    for position, column in enumerate(df.columns):
+        series = df[column]
+        entry = {"name": column, "file": f"{position}.npy"}
+        if series.dtype.kind in "biufcmM" and not isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            np.save(os.path.join(path, entry["file"]), series.to_numpy())
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            entry["categories"] = series.cat.categories.tolist()
+            entry["categorical"] = True
+            entry["ordered"] = bool(series.cat.ordered)
+            np.save(os.path.join(path, entry["file"]), series.cat.codes.to_numpy().astype(np.int32))
+        else:
+            codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=True)
+            entry["categories"] = uniques.tolist()
+            np.save(os.path.join(path, entry["file"]), codes.astype(np.int32))
+        header["columns"].append(entry)
+    with open(os.path.join(path, "header.json"), "w") as f:
+        json.dump(header, f)
+
+
+def _read_frame(path: str) -> pd.DataFrame:
+    """
+    Reads a frame written by _write_frame. Raw columns are memory-mapped copy-on-write,
+    so nothing is copied until (and unless) the caller modifies them.
+    """
+    with open(os.path.join(path, "header.json")) as f:
+        header = json.load(f)
+    data = {}
+    for entry in header["columns"]:
+        # np.asarray gives a plain ndarray view over the mapping, without copying
+        array = np.asarray(np.load(os.path.join(path, entry["file"]), mmap_mode="c", allow_pickle=False))
+        if "categories" in entry:
+            categories = pd.Index(entry["categories"], dtype=object)
+            if entry.get("categorical"):
+                data[entry["name"]] = pd.Categorical.from_codes(array, categories, entry["ordered"])
+            elif len(categories):
+                values = categories.to_numpy().take(array)
+                values[array < 0] = None
+                data[entry["name"]] = values
+            else:
+                data[entry["name"]] = np.full(len(array), None, dtype=object)
+        else:
+            data[entry["name"]] = array
+    df = pd.DataFrame(data, copy=False)
+    if header["index"]:
+        df = df.set_index(header["index"])
+    return df
+
+
+def _directory_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def _trigger_names(table: str) -> Dict[str, str]:
+    return {event: f"trg_{table}_version_{event.lower()}" for event in ("UPDATE", "DELETE")}
+
+def ensure_change_tracking(conn: sqlite3.Connection, tables=TRACKED_TABLES) -> List[str]:
+    """
+    Installs triggers that bump a per-table version in VERSIONS_TABLE on every UPDATE and
+    DELETE, so FrameCache.table_marker notices in-place changes (appends already change the
+    row count and largest rowid). Views are skipped. Safe to run repeatedly; returns the
+    tables that are tracked. The triggers run once per changed row, which slows large
+    UPDATEs and DELETEs on these tables.
+    """
+    existing = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    tracked = [table for table in tables if table in existing]
+    with conn:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (table_name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        for table in tracked:
+            for event, trigger in _trigger_names(table).items():
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {table}
+                    BEGIN
+                        INSERT INTO {VERSIONS_TABLE} VALUES ('{table}', 1)
+                        ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+                    END
+                """)
+    return tracked
+
+def _table_version(conn: sqlite3.Connection, table: str) -> Optional[int]:
+    # None when the table has no change tracking
+    triggers = list(_trigger_names(table).values())
+    installed = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (?, ?)", triggers
+    ).fetchone()[0]
+    if installed < len(triggers):
+        return None
+    row = conn.execute(f"SELECT version FROM {VERSIONS_TABLE} WHERE table_name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+class FrameCache:
+    """
+    An on-disk columnar cache for loaded and processed frames with LRU eviction.
+    Raw tables are keyed on the table, the query and a change marker of the source table;
+    processed frames are keyed on a stage name and the markers of the tables they were built from.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    # index bookkeeping
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE)) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        # drop entries whose files have gone missing
+        return {key: meta for key, meta in index.items() if os.path.isdir(self._entry_path(key))}
+
+    def _save_index(self):
+        tmp_path = os.path.join(self.cache_dir, INDEX_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, os.path.join(self.cache_dir, INDEX_FILE))
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _remove(self, key: str):
+        shutil.rmtree(self._entry_path(key), ignore_errors=True)
+        self._index.pop(key, None)
+
+    def _evict(self):
+        total = sum(meta["size"] for meta in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._index[key]["size"]
+            logging.info("Evicting cache entry %s (%s).", key, self._index[key]['name'])
+            self._remove(key)
+
+    # keys and change markers
+
+    @staticmethod
+    def table_marker(db_path: str, table_name: str, strict: bool = False) -> str:
+        """
+        Returns a cheap change marker for a table: its row count, largest rowid, its CREATE
+        statement and, for tables with change tracking (see ensure_change_tracking), the
+        version bumped by every UPDATE and DELETE. Writes to other tables, such as the metric
+        tables, do not change it. A table without change tracking could be updated in place
+        unnoticed, so its marker also includes the database file's mtime and size, as it does
+        for every table with `strict`; any write to the file then counts as a change.
+        """
+        conn = sqlite3.connect(db_path)
+        try:
+            try:
+                count, max_rowid = conn.execute(f"SELECT COUNT(*), MAX(rowid) FROM {table_name}").fetchone()
+            except sqlite3.OperationalError:
+                # views (e.g. a partitioned sales table) have no rowid; fall back to the count
+                count, max_rowid = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0], None
+            definition = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table_name,)).fetchone()
+            schema = hashlib.sha256(str(definition).encode()).hexdigest()[:12]
+            version = _table_version(conn, table_name)
+        finally:
+            conn.close()
+        marker = f"{count}:{max_rowid}:{schema}:{version}"
+        if strict or version is None:
+            for path in (db_path, db_path + "-wal"):
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    marker += f":{stat.st_mtime_ns}:{stat.st_size}"
+        return marker
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:32]
+
+    # public API
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                df = _read_frame(self._entry_path(key))
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning("Dropping unreadable cache entry %s: %s", key, e)
+                self._remove(key)
+                self._save_index()
+                return None
+            self._index[key]["last_used"] = time.time()
+            self._save_index()
+            return df
+
+    def put(self, key: str, df: pd.DataFrame, name: str = "", tables: Optional[List[str]] = None):
+        with self._lock:
+            self._remove(key)
+            path = self._entry_path(key)
+            try:
+                _write_frame(df, path)
+            except Exception:
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+            self._index[key] = {
+                "name": name,
+                "tables": tables or [],
+                "size": _directory_size(path),
+                "last_used": time.time(),
+            }
+            self._evict()
+            self._save_index()
+
+    def invalidate(self, table_name: Optional[str] = None) -> int:
+        """
+        Removes every entry built from `table_name`, or everything if no table is given.
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            keys = [
+                key for key, meta in self._index.items()
+                if table_name is None or table_name in meta["tables"]
+            ]
+            for key in keys:
+                self._remove(key)
+            self._save_index()
+            return len(keys)
+
+    def load_table(self, db_path: str, table_name: str, strict: bool = False, **load_kwargs) -> pd.DataFrame:
+        """
+        Same as `load_table_from_db`, but served from the cache while the table is unchanged.
+        """
+        query, params = build_select_query(table_name, **load_kwargs)
+        key = self.make_key("table", os.path.abspath(db_path), query, params,
+                            self.table_marker(db_path, table_name, strict))
+        df = self.get(key)
+        if df is not None:
+            logging.info("Loaded %s records from table '%s' (cache hit).", len(df), table_name)
+            return df
+        df = load_table_from_db(db_path, table_name, **load_kwargs)
+        if len(df.columns):  # an empty frame without columns means the load failed
+            self._try_put(key, df, table_name, [table_name])
+        return df
+
+    def cached_frame(self, name: str, db_path: str, tables: List[str],
+                     build: Callable[[], pd.DataFrame], strict: bool = False) -> pd.DataFrame:
+        """
+        Returns the processed frame `name` from the cache, or builds and stores it. The entry
+        is reused only while none of `tables` has changed.
+        """
+        markers = [self.table_marker(db_path, table, strict) for table in tables]
+        key = self.make_key("frame", name, os.path.abspath(db_path), tables, markers)
+        df = self.get(key)
+        if df is not None:
+            logging.info("Loaded processed frame '%s' from cache.", name)
+            return df
+        df = build()
+        self._try_put(key, df, name, list(tables))
+        return df
+
+    def _try_put(self, key: str, df: pd.DataFrame, name: str, tables: List[str]):
+        # a frame the cache cannot store is still returned to the caller, just not cached
+        try:
+            self.put(key, df, name=name, tables=tables)
+        except Exception as e:
+            logging.warning("Could not cache frame '%s': %s", name, e)
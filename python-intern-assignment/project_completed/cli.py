@@ -0,0 +1,423 @@
+import argparse
+import logging
+import os
+import sys
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
+
+from utils import setup_logging
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Only argparse, logging and utils are imported up front. pandas and the pipeline modules
+# are imported by the subcommand that needs them, so `--help` stays fast and importing
+# this module (e.g. in a worker process) has no side effects.
+
+DEFAULT_DB_PATH = "data/retail_sales.db"
+DEFAULT_LOG_FILE = "main.log"
+METRIC_NAMES = ("branch_sales", "top_articles", "monthly_revenue", "category_revenue")
+BACKENDS = ("pandas", "sqlite", "parallel", "approximate")
+DIMENSION_TABLES = ("branches", "articles")
+
+
+#loading helpers
+
+def _load_dimensions(args) -> Dict[str, "pd.DataFrame"]:
+    """
+    Loads the dimension tables, through the on-disk cache when --cache-dir is given.
+    """
+    if args.cache_dir:
+        from cache import FrameCache
+        frame_cache = FrameCache(args.cache_dir)
+        return {name: frame_cache.load_table(args.db, name) for name in DIMENSION_TABLES}
+    from data_loading import load_tables_parallel
+    return load_tables_parallel(args.db, list(DIMENSION_TABLES))
+
+def _sales_chunks(args, columns: Optional[List[str]] = None) -> Iterator["pd.DataFrame"]:
+    from data_loading import load_table_in_chunks
+    return load_table_in_chunks(args.db, "sales", chunksize=args.chunksize, columns=columns, compact=args.compact)
+
+def _profiled(args, name: str, chunks: Iterable["pd.DataFrame"]):
+    """
+    Wraps `chunks` in a streaming profile when --explore is set. Returns (chunks, profile).
+    """
+    if not args.explore:
+        return chunks, None
+    from profiling import StreamingProfile, profiled_chunks
+    profile = StreamingProfile(name, sample_size=1_000, max_rows=args.explore_rows)
+    return profiled_chunks(chunks, profile), profile
+
+def _explore_dimensions(args, dimensions: Dict[str, "pd.DataFrame"]):
+    if args.explore:
+        from analysis import explore_dataframe
+        for name, df in dimensions.items():
+            explore_dataframe(df, name.capitalize())
+
+def _log_profile(profile):
+    if profile is not None:
+        result = profile.result()
+        logging.info(
+            "%s profile (%s rows, complete=%s):\n%s",
+            result.name, result.rows_profiled, result.complete, result.columns,
+        )
+
+def _write_chunks(chunks: Iterable["pd.DataFrame"], path: str) -> int:
+    """
+    Writes chunks to one CSV file, header first. Returns the number of rows written.
+    """
+    rows = 0
+    with open(path, "w", newline="") as f:
+        for chunk in chunks:
+            chunk.to_csv(f, header=rows == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+
+#metric helpers
+
+def _selected_metrics(args) -> List[str]:
+    return list(args.metrics or METRIC_NAMES)
+
+def calculate_metrics(args, df_articles=None) -> Dict[str, "pd.DataFrame"]:
+    """
+    Calculates the selected metrics with the backend chosen on the command line. The
+    approximate backend returns the sketch summaries instead of the exact metrics.
+    """
+    names = _selected_metrics(args)
+    if args.backend == "sqlite":
+        from analysis import calculate_metrics_sql
+        import sqlite3
+        conn = sqlite3.connect(args.db)
+        try:
+            return calculate_metrics_sql(conn, names)
+        finally:
+            conn.close()
+    if args.backend == "parallel":
+        from parallel import calculate_metrics_parallel
+        return calculate_metrics_parallel(args.db, workers=args.workers, metric_names=names, chunksize=args.chunksize)
+
+    from data_loading import load_table_from_db
+    from processing import process_sales_chunks
+    if df_articles is None:
+        df_articles = load_table_from_db(args.db, "articles")
+    if args.backend == "approximate":
+        from sketches import approximate_metrics
+        chunks, profile = _profiled(args, "Sales", _sales_chunks(args))
+        results = approximate_metrics(process_sales_chunks(chunks, df_articles, compact=args.compact))
+    else:
+        from analysis import BUSINESS_METRICS, calculate_metrics_from_chunks, required_sales_columns
+        chunks, profile = _profiled(args, "Sales", _sales_chunks(args, required_sales_columns(names)))
+        metrics = [metric for metric in BUSINESS_METRICS if metric.name in names]
+        results = calculate_metrics_from_chunks(process_sales_chunks(chunks, df_articles, compact=args.compact), metrics)
+    _log_profile(profile)
+    return results
+
+def report_metrics(results: Dict[str, "pd.DataFrame"], output: Optional[str] = None):
+    """
+    Prints every metric, or writes each one to `<output>/<name>.csv`.
+    """
+    if output:
+        os.makedirs(output, exist_ok=True)
+    for name, result in results.items():
+        # full tables only at debug level; %-style args are not formatted when it is off
+        logging.info("%s: %s rows", name, len(result))
+        logging.debug("%s:\n%s", name, result)
+        if output:
+            result.to_csv(os.path.join(output, f"{name}.csv"))
+        else:
+            print(f"{name}:\n{result}\n")
+
+def persist_metrics(args, results: Dict[str, "pd.DataFrame"]) -> Dict[str, Dict[str, float]]:
+    """
+    Writes the exact metrics to their typed tables in one transaction.
+    """
+    from connections import connect
+    from persistence import write_metric_tables
+    conn = connect(args.db)
+    try:
+        return write_metric_tables(conn, results)
+    finally:
+        conn.close()
+
+
+#subcommands
+
+def cmd_load(args) -> int:
+    dimensions = _load_dimensions(args)
+    _explore_dimensions(args, dimensions)
+    chunks, profile = _profiled(args, "Sales", _sales_chunks(args))
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        for name, df in dimensions.items():
+            df.to_csv(os.path.join(args.output, f"{name}.csv"), index=False)
+        sales_rows = _write_chunks(chunks, os.path.join(args.output, "sales.csv"))
+    else:
+        sales_rows = sum(len(chunk) for chunk in chunks)
+    _log_profile(profile)
+    for name, df in dimensions.items():
+        print(f"{name}: {len(df)} rows")
+    print(f"sales: {sales_rows} rows")
+    return 0
+
+def cmd_process(args) -> int:
+    from processing import process_sales_chunks
+    df_articles = _load_dimensions(args)["articles"]
+    chunks, profile = _profiled(args, "Sales", _sales_chunks(args))
+    processed = process_sales_chunks(chunks, df_articles, compact=args.compact)
+    if args.output:
+        rows = _write_chunks(processed, args.output)
+    else:
+        rows = sum(len(chunk) for chunk in processed)
+    _log_profile(profile)
+    print(f"Processed {rows} sales rows.")
+    return 0
+
+def cmd_metrics(args) -> int:
+    report_metrics(calculate_metrics(args), args.output)
+    return 0
+
+def cmd_persist(args) -> int:
+    if args.incremental:
+        from incremental import refresh_metrics_incremental
+        print(refresh_metrics_incremental(args.db, chunksize=args.chunksize))
+        return 0
+    report = persist_metrics(args, calculate_metrics(args))
+    for table, stats in report.items():
+        print(f"{table}: {stats['rows']} rows")
+    return 0
+
+def cmd_run(args) -> int:
+    """
+    The full pipeline: index check, loading, optional exploration, metrics, reporting
+    and saving the metrics. With the pandas backend the stages run as a task graph
+    (see pipeline_graph.build_pipeline), so independent stages overlap and, with --cache-dir,
+    stages whose inputs are unchanged are skipped.
+    """
+    from cache import ensure_change_tracking
+    from connections import connect
+    from schema import ensure_indexes
+    conn = connect(args.db)
+    try:
+        ensure_indexes(conn)  # idempotent; only does work the first time or after a schema change
+        ensure_change_tracking(conn)  # lets --cache-dir notice in-place UPDATEs
+    finally:
+        conn.close()
+    if args.backend == "pandas":
+        report_metrics(run_pipeline_graph(args), args.output)  # the graph persists the metrics itself
+        return 0
+    dimensions = _load_dimensions(args)
+    _explore_dimensions(args, dimensions)
+    results = calculate_metrics(args, dimensions["articles"])
+    report_metrics(results, args.output)
+    if not args.no_persist:
+        persist_metrics(args, results)
+    return 0
+
+def run_pipeline_graph(args) -> Dict[str, "pd.Series"]:
+    """
+    Runs the pipeline graph, logs the per-task timings and the critical path, and
+    returns the metrics.
+    """
+    from pipeline_graph import build_pipeline
+    names = _selected_metrics(args)
+    graph = build_pipeline(
+        args.db, names, chunksize=args.chunksize, compact=args.compact,
+        explore_rows=args.explore_rows if args.explore else None, persist=not args.no_persist,
+    )
+    frame_cache = None
+    if args.cache_dir:
+        from cache import FrameCache
+        frame_cache = FrameCache(args.cache_dir)
+    run = graph.run(executor=args.executor, max_workers=args.workers, cache=frame_cache)
+    path, seconds = run.critical_path()
+    logging.info("Pipeline finished in %.3fs; task timings:\n%s", run.seconds, run.report())
+    logging.info("Critical path (%.3fs): %s", seconds, " -> ".join(path))
+    return {name: run.outputs[name] for name in names}
+
+
+def cmd_indexes(args) -> int:
+    from connections import connect
+    from schema import ensure_indexes, explain_metric_queries, find_table_scans
+    conn = connect(args.db)
+    try:
+        for name, action in ensure_indexes(conn).items():
+            print(f"{name}: {action}")
+        plans = explain_metric_queries(conn)
+    finally:
+        conn.close()
+    for name, plan in plans.items():
+        print(f"{name}:")
+        for step in plan:
+            print(f"  {step}")
+    print("Table scans:", find_table_scans(plans) or "none")
+    return 0
+
+def cmd_cube(args) -> int:
+    from cube import materialize_cube
+    print(f"{materialize_cube(args.db, chunksize=args.chunksize)} cells written.")
+    return 0
+
+def cmd_partitions(args) -> int:
+    import partitioning
+    if args.action == "migrate":
+        print(partitioning.migrate_to_partitions(args.db, keep_source=not args.drop_source))
+    elif args.action == "compact":
+        print(partitioning.compact_partitions(args.db, args.before))
+    elif args.action == "archive":
+        print(partitioning.archive_partitions(args.db, args.archive_path, args.before))
+    else:
+        import sqlite3
+        conn = sqlite3.connect(args.db)
+        try:
+            print(partitioning.list_partitions(conn, include_archived=True))
+        finally:
+            conn.close()
+    return 0
+
+def cmd_generate(args) -> int:
+    from synthetic_data import generate_database
+    print(generate_database(args.db, int(args.rows), args.articles, args.branches, args.seed))
+    return 0
+
+
+def _metric_list(value: str) -> List[str]:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = set(names) - set(METRIC_NAMES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown metrics {sorted(unknown)}; choose from {', '.join(METRIC_NAMES)}")
+    return names
+
+def build_parser() -> argparse.ArgumentParser:
+    base = argparse.ArgumentParser(add_help=False)
+    base.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite database (default: %(default)s)")
+    base.add_argument("--log-file", default=DEFAULT_LOG_FILE, help="log file (default: %(default)s)")
+    base.add_argument(
+        "--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="DEBUG also logs the full metric tables (default: %(default)s)",
+    )
+    base.add_argument("--log-json", action="store_true", help="write the log file as JSON lines")
+    base.add_argument("--log-max-bytes", type=int, help="rotate the log file at this size")
+    base.add_argument("--log-rotate-when", help="rotate the log file on a schedule, e.g. midnight")
+    base.add_argument(
+        "--instrument", action="store_true",
+        help="time every loading, processing and analysis call and log a summary at the end",
+    )
+    base.add_argument("--instrument-memory", action="store_true", help="also track peak memory (slower)")
+    base.add_argument("--instrument-profile", action="store_true", help="also log a cProfile listing per stage")
+    base.add_argument("--instrument-json", help="write the stage records to this JSON file")
+
+    common = argparse.ArgumentParser(add_help=False, parents=[base])
+    common.add_argument("--chunksize", type=int, default=100_000, help="sales rows per chunk")
+    common.add_argument("--compact", action="store_true", help="use the memory-compact frame representation")
+    common.add_argument(
+        "--cache-dir",
+        help="serve dimension tables (and, for run, unchanged stages) from this on-disk cache; run installs "
+             "triggers so in-place UPDATEs are noticed, without them any write to the database file invalidates it",
+    )
+    common.add_argument("--explore", action="store_true", help="profile the data while it is loaded")
+    common.add_argument("--explore-rows", type=int, default=1_000_000, help="row budget for profiling sales")
+
+    metric_options = argparse.ArgumentParser(add_help=False)
+    metric_options.add_argument(
+        "--metrics", type=_metric_list, help=f"comma-separated subset of: {', '.join(METRIC_NAMES)}"
+    )
+    metric_options.add_argument(
+        "--backend", default="pandas", choices=BACKENDS,
+        help="pandas streams chunks; sqlite aggregates in the database; parallel shards over "
+             "worker processes; approximate returns sketch estimates (default: %(default)s)",
+    )
+    metric_options.add_argument(
+        "--workers", type=int, help="worker processes for the parallel backend, or pool size for run"
+    )
+
+    parser = argparse.ArgumentParser(prog="main.py", description="Retail sales pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("load", parents=[common], help="load the tables and report row counts")
+    load.add_argument("--output", help="directory to write the loaded tables to as CSV")
+    load.set_defaults(handler=cmd_load)
+    process = commands.add_parser("process", parents=[common], help="merge and enrich the sales")
+    process.add_argument("--output", help="CSV file to write the processed sales to")
+    process.set_defaults(handler=cmd_process)
+    metrics = commands.add_parser("metrics", parents=[common, metric_options], help="calculate the business metrics")
+    metrics.add_argument("--output", help="directory to write one CSV per metric to")
+    metrics.set_defaults(handler=cmd_metrics)
+    persist = commands.add_parser("persist", parents=[common, metric_options], help="calculate and save the metrics")
+    persist.add_argument("--incremental", action="store_true", help="fold in only the sales added since the last run")
+    persist.set_defaults(handler=cmd_persist)
+    run = commands.add_parser("run", parents=[common, metric_options], help="run the whole pipeline")
+    run.add_argument("--output", help="directory to write one CSV per metric to")
+    run.add_argument("--no-persist", action="store_true", help="do not save the metrics to the database")
+    run.add_argument(
+        "--executor", default="thread", choices=["thread", "process"],
+        help="pool running independent pipeline stages with the pandas backend (default: %(default)s)",
+    )
+    run.set_defaults(handler=cmd_run)
+
+    # maintenance commands
+    indexes = commands.add_parser("indexes", parents=[base], help="create or migrate the indexes and show the query plans")
+    indexes.set_defaults(handler=cmd_indexes)
+    cube = commands.add_parser("cube", parents=[common], help="materialize the (branch, article, month) cube")
+    cube.set_defaults(handler=cmd_cube)
+    partitions = commands.add_parser("partitions", parents=[base], help="monthly partitioning of the sales table")
+    partitions.add_argument("action", choices=["migrate", "compact", "archive", "list"])
+    partitions.add_argument("--before", help="first month to keep (compact/archive), e.g. 2023-06-01")
+    partitions.add_argument("--archive-path", default="data/retail_sales_archive.db")
+    partitions.add_argument("--drop-source", action="store_true", help="drop the original table after migrating")
+    partitions.set_defaults(handler=cmd_partitions)
+    generate = commands.add_parser("generate", parents=[base], help="write a synthetic database (replaces --db)")
+    generate.add_argument("--rows", type=float, default=1e5, help="sales rows, e.g. 1e6")
+    generate.add_argument("--articles", type=int)
+    generate.add_argument("--branches", type=int)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.set_defaults(handler=cmd_generate)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in ("persist", "run") and args.backend == "approximate" and not getattr(args, "no_persist", False):
+        parser.error("approximate results are estimates and cannot be saved as metrics; use --no-persist or the metrics command")
+    if args.command == "partitions" and args.action in ("compact", "archive") and not args.before:
+        parser.error("--before is required for compact and archive")
+    if args.command == "generate" and args.db == DEFAULT_DB_PATH:
+        parser.error(f"generate replaces the database at --db; pass a path other than {DEFAULT_DB_PATH}")
+    from pipeline import enable_copy_on_write
+    enable_copy_on_write()  # process-wide, so set once here rather than per pipeline run
+    setup_logging(
+        log_file=args.log_file,
+        level=getattr(logging, args.log_level),
+        json_lines=args.log_json,
+        max_bytes=args.log_max_bytes,
+        rotate_when=args.log_rotate_when,
+    )
+    if not (args.instrument or args.instrument_memory or args.instrument_profile or args.instrument_json):
+        return args.handler(args)
+    import instrumentation
+    instrumentation.enable(track_memory=args.instrument_memory, profile=args.instrument_profile)
+    try:
+        return args.handler(args)
+    finally:
+        instrumentation.disable()
+        report_instrumentation(args, instrumentation.REGISTRY)
+
+def report_instrumentation(args, registry):
+    """
+    Logs the per-stage summary (and cProfile listings), writes the JSON file if asked for,
+    and appends the records to pipeline_runs for the commands that write to the database.
+    """
+    logging.info("Stage summary of run %s:\n%s", registry.run_id, registry.summary().to_string())
+    for stage in registry.profiles:
+        logging.info("Profile of %s:\n%s", stage, registry.profile_report(stage))
+    if args.instrument_json:
+        registry.to_json(args.instrument_json)
+    if args.command == "persist" or (args.command == "run" and not args.no_persist):
+        from connections import connect
+        conn = connect(args.db)
+        try:
+            registry.save(conn)
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
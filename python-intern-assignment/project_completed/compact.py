@@ -0,0 +1,53 @@
+import logging
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns holding money; they are rounded to a fixed number of decimals before downcasting
+MONEY_COLUMNS = ("price", "total_amount")
+
+
+def _money_to_float32(series: pd.Series, decimals: int) -> pd.Series:
+    """
+    Rounds money to `decimals` places and stores it as float32 when every value still
+    rounds back to the same amount, otherwise keeps float64.
+    """
+    rounded = series.round(decimals)
+    as_float32 = rounded.astype(np.float32)
+    round_trip = as_float32.astype(np.float64).round(decimals)
+    if ((round_trip == rounded) | rounded.isna()).all():
+        return as_float32
+    return rounded
+
+
+def compact_frame(
+    df: pd.DataFrame,
+    money_columns: Iterable[str] = MONEY_COLUMNS,
+    money_decimals: int = 2,
+    max_category_ratio: float = 0.5,
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Returns a memory-compact copy of the frame and the bytes saved per column:
+    repeated strings become `category`, integers are downcast to the smallest type that
+    holds them and money is kept at `money_decimals` places in float32 where that is exact.
+    Text columns with more than `max_category_ratio` distinct values per row are left alone.
+    """
+    compacted = {}
+    saved = {}
+    for column in df.columns:
+        series = df[column]
+        before = series.memory_usage(index=False, deep=True)
+        if column in money_columns and series.dtype.kind == "f":
+            series = _money_to_float32(series, money_decimals)
+        elif series.dtype.kind in "iu":
+            # signed on purpose: ids and quantities stay safe to subtract and to join with int64 keys
+            series = pd.to_numeric(series, downcast="integer")
+        elif series.dtype == object and len(series):
+            if series.nunique(dropna=True) <= max_category_ratio * len(series):
+                series = series.astype("category")
+        compacted[column] = series
+        saved[column] = int(before - series.memory_usage(index=False, deep=True))
+    result = pd.DataFrame(compacted, index=df.index)
+    logging.info("Compacted frame: saved %s bytes (%s).", sum(saved.values()), saved)
+    return result, saved
@@ -0,0 +1,149 @@
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+# Read-tuned defaults: memory-map up to 256 MB of the file and keep a 64 MB page cache per connection
+DEFAULT_PRAGMAS = {
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative means KiB
+    "temp_store": "MEMORY",
+}
+
+
+def enable_wal(db_path: str) -> str:
+    """
+    Switches the database to WAL journaling so readers never block each other or the writer.
+    The setting is stored in the database file, so this only has to succeed once.
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.warning("Could not enable WAL for '%s': %s", db_path, e)
+        return "unknown"
+    if mode.lower() != "wal":
+        logging.warning("Could not enable WAL for '%s', journal mode is '%s'.", db_path, mode)
+    return mode
+
+
+@contextmanager
+def write_transaction(conn: sqlite3.Connection, name: str = "write") -> Iterator[sqlite3.Connection]:
+    """
+    Runs the block in its own write transaction (BEGIN IMMEDIATE, committed at the end).
+    If the caller already has a transaction open, the block runs in a SAVEPOINT inside it
+    instead: it is undone on error, and committing stays up to the caller.
+    """
+    if conn.in_transaction:
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except Exception:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        conn.execute(f"RELEASE {name}")
+        return
+    conn.execute("BEGIN IMMEDIATE")  # explicit, so DDL statements run inside it too
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def connect(db_path: str, read_only: bool = False, pragmas: Optional[Dict[str, object]] = None) -> sqlite3.Connection:
+    """
+    Opens a connection with the tuning pragmas applied. Read-only connections are opened
+    through a `mode=ro` URI so they can never take a write lock.
+    """
+    if read_only:
+        uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+    for name, value in (DEFAULT_PRAGMAS if pragmas is None else pragmas).items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of SQLite connections to one database file.
+    Connections are opened lazily up to `size` and handed out one caller at a time:
+
+        with pool.connection() as conn:
+            save_metrics_to_db(conn, ...)
+    """
+
+    def __init__(self, db_path: str, size: int = 4, read_only: bool = False,
+                 wal: bool = True, pragmas: Optional[Dict[str, object]] = None):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.db_path = db_path
+        self.size = size
+        self.read_only = read_only
+        self.pragmas = pragmas
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        if wal:
+            enable_wal(db_path)
+
+    def _acquire(self, timeout: Optional[float]) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return connect(self.db_path, self.read_only, self.pragmas)
+                except Exception:
+                    self._opened -= 1
+                    raise
+        return self._idle.get(timeout=timeout)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[sqlite3.Connection]:
+        """
+        Borrows a connection for the duration of the `with` block. Uncommitted work is rolled back on return.
+        """
+        conn = self._acquire(timeout)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def close(self):
+        """
+        Closes every idle connection; connections still borrowed are closed when they come back.
+        """
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
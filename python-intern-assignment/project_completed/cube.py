@@ -0,0 +1,179 @@
+import logging
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from aggregation import Metric, combine_metric_results, compute_metrics, sort_by_value
+from data_loading import load_table_from_db, load_table_in_chunks
+from joins import DimensionIndex, join_dimension
+from persistence import MetricTable, write_metric_tables
+from processing import process_sales_chunks
+
+# Base grain of the cube and the additive measures stored per cell
+CUBE_KEYS = ("branch_id", "article_id", "year_month")
+CUBE_TABLE = MetricTable(
+    "metrics_cube", "cube",
+    (("branch_id", "INTEGER"), ("article_id", "INTEGER"), ("year_month", "INTEGER")),
+    (("revenue", "REAL"), ("quantity", "INTEGER"), ("transactions", "INTEGER"), ("revenue_sq", "REAL")),
+)
+CUBE_MEASURES = [
+    Metric("revenue", CUBE_KEYS, "total_amount"),
+    Metric("quantity", CUBE_KEYS, "quantity"),
+    Metric("transactions", CUBE_KEYS, "total_amount", "count"),  # transactions with a known amount
+    Metric("revenue_sq", CUBE_KEYS, "revenue_sq"),
+]
+
+# Attributes a cube query can group or filter on, and the dimension table holding them
+BRANCH_ATTRIBUTES = ("branch_name", "city")
+ARTICLE_ATTRIBUTES = ("article_name", "category")
+CALENDAR_ATTRIBUTES = ("year", "month")
+
+
+def _cube_input(sales_with_price: pd.DataFrame) -> pd.DataFrame:
+    df = sales_with_price.copy(deep=False)
+    if "year_month" not in df.columns:
+        df["year_month"] = df["year"] * 100 + df["month"]
+    df["revenue_sq"] = df["total_amount"] ** 2
+    return df
+
+
+def _cube_frame(totals: Optional[Dict[str, pd.Series]]) -> pd.DataFrame:
+    if totals is None:
+        return pd.DataFrame(columns=list(CUBE_KEYS) + [metric.name for metric in CUBE_MEASURES])
+    return pd.DataFrame({metric.name: totals[metric.name] for metric in CUBE_MEASURES}).reset_index()
+
+
+def build_cube(sales_with_price: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates processed sales to one row per (branch_id, article_id, year_month) with
+    revenue, quantity, transaction count and the sum of squared revenue. Every measure is
+    additive, so coarser roll-ups (and averages and variances) follow from these cells.
+    """
+    return _cube_frame(compute_metrics(_cube_input(sales_with_price), CUBE_MEASURES, finalize=False))
+
+
+def build_cube_from_chunks(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Builds the cube from processed sales chunks, keeping only the cells between chunks.
+    """
+    totals = None
+    for chunk in chunks:
+        partials = compute_metrics(_cube_input(chunk), CUBE_MEASURES, finalize=False)
+        totals = combine_metric_results(CUBE_MEASURES, totals, partials)
+    return _cube_frame(totals)
+
+
+def save_cube(conn: sqlite3.Connection, cells: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """
+    Replaces the metrics_cube table with the given cells in one transaction.
+    """
+    return write_metric_tables(conn, {CUBE_TABLE.metric: cells}, [CUBE_TABLE], reset_watermark=False)
+
+
+def materialize_cube(db_path: str, chunksize: int = 100_000) -> int:
+    """
+    Streams sales once, builds the cube and stores it. Returns the number of cells.
+    """
+    df_articles = load_table_from_db(db_path, "articles")
+    chunks = load_table_in_chunks(
+        db_path, "sales", chunksize=chunksize, columns=["branch_id", "article_id", "quantity", "sale_date"]
+    )
+    cells = build_cube_from_chunks(process_sales_chunks(chunks, df_articles))
+    conn = sqlite3.connect(db_path)
+    try:
+        save_cube(conn, cells)
+    finally:
+        conn.close()
+    logging.info("Materialized cube with %s cells.", len(cells))
+    return len(cells)
+
+
+class Cube:
+    """
+    Query interface over the cube cells. Groups and filters may use the cube keys, branch
+    attributes (branch_name, city), article attributes (article_name, category) and the
+    calendar (year, month). Queries read only the cells and the small dimension tables.
+    """
+
+    def __init__(self, cells: pd.DataFrame, df_articles: pd.DataFrame, df_branches: pd.DataFrame):
+        self.cells = cells
+        self.df_articles = df_articles
+        self.df_branches = df_branches
+        self._article_index = DimensionIndex(df_articles, "article_id")
+        self._branch_index = DimensionIndex(df_branches, "branch_id")
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection) -> "Cube":
+        """
+        Loads the materialized cube and the dimension tables.
+        """
+        cells = pd.read_sql_query(f"SELECT * FROM {CUBE_TABLE.table}", conn)
+        return cls(
+            cells,
+            load_table_from_db(None, "articles", conn=conn),
+            load_table_from_db(None, "branches", conn=conn),
+        )
+
+    def _with_attributes(self, columns: Iterable[str]) -> pd.DataFrame:
+        columns = set(columns)
+        unknown = columns - set(CUBE_KEYS) - set(BRANCH_ATTRIBUTES) - set(ARTICLE_ATTRIBUTES) - set(CALENDAR_ATTRIBUTES)
+        if unknown:
+            raise ValueError(f"Unknown cube attributes: {sorted(unknown)}")
+        cells = self.cells
+        branch_columns = [c for c in BRANCH_ATTRIBUTES if c in columns]
+        if branch_columns:
+            cells, _ = join_dimension(cells, self._branch_index, branch_columns)
+        article_columns = [c for c in ARTICLE_ATTRIBUTES if c in columns]
+        if article_columns:
+            cells, _ = join_dimension(cells, self._article_index, article_columns)
+        if columns & set(CALENDAR_ATTRIBUTES):
+            cells = cells.assign(year=cells["year_month"] // 100, month=cells["year_month"] % 100)
+        return cells
+
+    def roll_up(self, by: List[str], where: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+        """
+        Aggregates the cells to the `by` attributes, after keeping only the cells that match
+        `where` (attribute -> value or list of values). Returns revenue, quantity,
+        transactions, the average revenue per transaction and its sample variance.
+        """
+        where = where or {}
+        cells = self._with_attributes(list(by) + list(where))
+        for column, wanted in where.items():
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            cells = cells[cells[column].isin(values)]
+        measures = ["revenue", "quantity", "transactions", "revenue_sq"]
+        if by:
+            result = cells.groupby(list(by), observed=True, sort=True)[measures].sum()
+        else:
+            result = cells[measures].sum().to_frame().T
+        count = result["transactions"].astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result["avg_revenue"] = result["revenue"] / count
+            result["revenue_var"] = (result["revenue_sq"] - result["revenue"] ** 2 / count) / (count - 1)
+        return result.drop(columns="revenue_sq")
+
+    def business_metrics(self) -> Dict[str, pd.Series]:
+        """
+        Answers the business metrics of `analysis.calculate_all_metrics` from the cube.
+        """
+        monthly = self.roll_up(["year", "month"])["revenue"].rename("total_amount")
+        return {
+            "branch_sales": self.roll_up(["branch_id"])["revenue"].rename("total_amount"),
+            "top_articles": sort_by_value(self.roll_up(["article_name"])["quantity"]),
+            "monthly_revenue": monthly,
+            "category_revenue": self.roll_up(["category"])["revenue"].rename("total_amount"),
+        }
+
+    def sales_performance_by_city(self) -> pd.DataFrame:
+        """
+        Same columns as `analysis.sales_performance_by_city`, computed from the cube.
+        """
+        cells = self._with_attributes(["city"])
+        result = self.roll_up(["city"])
+        result["num_branches"] = cells.groupby("city", observed=True)["branch_id"].nunique()
+        result = result.reset_index().rename(
+            columns={"revenue": "total_revenue", "avg_revenue": "avg_transaction_value"}
+        )
+        columns = ["city", "num_branches", "total_revenue", "avg_transaction_value"]
+        return result[columns].sort_values("total_revenue", ascending=False, ignore_index=True)
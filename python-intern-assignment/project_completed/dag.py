@@ -0,0 +1,271 @@
+import functools
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from cache import FrameCache
+from utils import log_queue, worker_logging
+
+EXECUTORS = ("thread", "process")
+_SERIES_PREFIX = "series:"
+
+
+class Task(NamedTuple):
+    """
+    One node of a task graph. `func` is called with the values of `inputs` (output names of
+    other tasks) as positional arguments and returns the value of its output, named after
+    the task, or, when `outputs` is given, a tuple with one value per name in `outputs`.
+    With `cache=True` the outputs are stored and reused while the task's fingerprint is
+    unchanged; only DataFrame and Series outputs can be cached. The fingerprint combines
+    the function, the fingerprints of the inputs and `fingerprint()`, which source tasks use
+    to describe external state (e.g. a table's change marker). Only the task function's own
+    code is fingerprinted, so clear the cache after changing a function it calls.
+    """
+    name: str
+    func: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    outputs: Optional[Tuple[str, ...]] = None
+    cache: bool = False
+    fingerprint: Optional[Callable[[], Any]] = None
+
+    @property
+    def output_names(self) -> Tuple[str, ...]:
+        return tuple(self.outputs) if self.outputs else (self.name,)
+
+
+class TaskRun(NamedTuple):
+    name: str
+    started: float  # seconds since the start of the graph run
+    seconds: float
+    cached: bool
+
+
+def _callable_identity(func: Callable) -> str:
+    """
+    Identifies a function by name, bytecode and bound arguments, so editing a task's code
+    or its parameters changes its fingerprint.
+    """
+    if isinstance(func, functools.partial):
+        bound = json.dumps([list(func.args), func.keywords], default=repr, sort_keys=True)
+        return f"{_callable_identity(func.func)}({bound})"
+    func = getattr(func, "__wrapped__", func)
+    code = getattr(func, "__code__", None)
+    code_hash = hashlib.sha256(_code_bytes(code)).hexdigest()[:16] if code else ""
+    return f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}:{code_hash}"
+
+def _code_bytes(code) -> bytes:
+    # nested code objects (comprehensions, lambdas) repr with their address, so recurse instead
+    consts = [_code_bytes(const) if hasattr(const, "co_code") else repr(const).encode() for const in code.co_consts]
+    return code.co_code + b"\0".join(consts)
+
+
+def _to_frame(value: Any) -> Optional[pd.DataFrame]:
+    if isinstance(value, pd.DataFrame):
+        return value
+    if isinstance(value, pd.Series):
+        return value.to_frame(_SERIES_PREFIX + json.dumps(value.name, default=str))
+    return None
+
+
+def _from_frame(df: pd.DataFrame) -> Any:
+    if len(df.columns) == 1 and str(df.columns[0]).startswith(_SERIES_PREFIX):
+        return df.iloc[:, 0].rename(json.loads(df.columns[0][len(_SERIES_PREFIX):]))
+    return df
+
+
+class TaskGraph:
+    """
+    Runs a graph of tasks: every task whose inputs are available is submitted to a thread
+    or process pool, so independent tasks run concurrently. With a FrameCache, cacheable
+    tasks whose fingerprint has not changed are skipped and their stored outputs are used.
+    Process pools need picklable (module-level) task functions.
+    """
+
+    def __init__(self, tasks: List[Task]):
+        self.tasks = {task.name: task for task in tasks}
+        if len(self.tasks) != len(tasks):
+            raise ValueError("Task names must be unique")
+        self.producers: Dict[str, str] = {}
+        for task in tasks:
+            for output in task.output_names:
+                if output in self.producers:
+                    raise ValueError(f"Output '{output}' is produced by both {self.producers[output]} and {task.name}")
+                self.producers[output] = task.name
+        for task in tasks:
+            missing = [name for name in task.inputs if name not in self.producers]
+            if missing:
+                raise ValueError(f"Task '{task.name}' needs outputs nobody produces: {missing}")
+        self.order = self._topological_order()
+
+    def dependencies(self, name: str) -> List[str]:
+        return list(dict.fromkeys(self.producers[output] for output in self.tasks[name].inputs))
+
+    def _topological_order(self) -> List[str]:
+        order, state = [], {}
+
+        def visit(name: str, path: Tuple[str, ...]):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Task graph has a cycle: {' -> '.join(path + (name,))}")
+            state[name] = "visiting"
+            for dependency in self.dependencies(name):
+                visit(dependency, path + (name,))
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.tasks:
+            visit(name, ())
+        return order
+
+    def _needed(self, targets: Optional[List[str]]) -> List[str]:
+        if not targets:
+            return list(self.order)
+        needed, stack = set(), [self.producers.get(target, target) for target in targets]
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.dependencies(name))
+        return [name for name in self.order if name in needed]
+
+    def _task_key(self, task: Task, fingerprints: Dict[str, str]) -> str:
+        external = task.fingerprint() if task.fingerprint else None
+        return FrameCache.make_key(
+            "task", task.name, _callable_identity(task.func), [fingerprints[name] for name in task.inputs], external
+        )
+
+    def run(
+        self,
+        targets: Optional[List[str]] = None,
+        executor: str = "thread",
+        max_workers: Optional[int] = None,
+        cache: Optional[FrameCache] = None,
+    ) -> "GraphRun":
+        """
+        Runs the tasks needed for `targets` (default: all). Returns the outputs of every
+        task that ran or came from the cache, with per-task timings.
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTORS}")
+        pending = self._needed(targets)
+        values: Dict[str, Any] = {}
+        fingerprints: Dict[str, str] = {}
+        runs: Dict[str, TaskRun] = {}
+        keys: Dict[str, str] = {}
+        started = time.perf_counter()
+        if executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            pool = ProcessPoolExecutor(
+                max_workers, initializer=worker_logging, initargs=(log_queue(), logging.getLogger().level)
+            )
+        with pool:
+            running: Dict[Future, Tuple[str, float]] = {}
+            while pending or running:
+                for name in [n for n in pending if all(dep in runs for dep in self.dependencies(n))]:
+                    pending.remove(name)
+                    task = self.tasks[name]
+                    keys[name] = self._task_key(task, fingerprints)
+                    cached = self._from_cache(task, keys[name], cache)
+                    if cached is not None:
+                        self._store(task, cached, keys[name], values, fingerprints)
+                        runs[name] = TaskRun(name, time.perf_counter() - started, 0.0, True)
+                        logging.info("Task '%s' unchanged; using cached outputs.", name)
+                        continue
+                    arguments = [values[output] for output in task.inputs]
+                    running[pool.submit(task.func, *arguments)] = (name, time.perf_counter())
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, task_started = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logging.error("Task '%s' failed: %s", name, e)
+                        for other in running:
+                            other.cancel()
+                        raise
+                    task = self.tasks[name]
+                    outputs = result if task.outputs else (result,)
+                    self._store(task, outputs, keys[name], values, fingerprints)
+                    if task.cache and cache is not None:
+                        self._to_cache(task, outputs, keys[name], cache)
+                    finished = time.perf_counter()
+                    runs[name] = TaskRun(name, task_started - started, finished - task_started, False)
+                    logging.info("Task '%s' done in %.3fs.", name, finished - task_started)
+        return GraphRun(self, values, runs, time.perf_counter() - started)
+
+    @staticmethod
+    def _store(task: Task, outputs, key: str, values: Dict[str, Any], fingerprints: Dict[str, str]):
+        if len(outputs) != len(task.output_names):
+            raise ValueError(f"Task '{task.name}' returned {len(outputs)} values for outputs {task.output_names}")
+        for output, value in zip(task.output_names, outputs):
+            values[output] = value
+            fingerprints[output] = FrameCache.make_key(key, output)
+
+    @staticmethod
+    def _from_cache(task: Task, key: str, cache: Optional[FrameCache]) -> Optional[tuple]:
+        if not task.cache or cache is None:
+            return None
+        outputs = []
+        for output in task.output_names:
+            df = cache.get(FrameCache.make_key(key, output))
+            if df is None:
+                return None
+            outputs.append(_from_frame(df))
+        return tuple(outputs)
+
+    @staticmethod
+    def _to_cache(task: Task, outputs, key: str, cache: FrameCache):
+        frames = [_to_frame(value) for value in outputs]
+        if any(frame is None for frame in frames):
+            logging.warning("Task '%s' has outputs that are not frames or series; not cached.", task.name)
+            return
+        for output, frame in zip(task.output_names, frames):
+            cache._try_put(FrameCache.make_key(key, output), frame, f"{task.name}:{output}", [])
+
+
+class GraphRun(NamedTuple):
+    graph: TaskGraph
+    outputs: Dict[str, Any]
+    runs: Dict[str, TaskRun]
+    seconds: float
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """
+        The chain of dependent tasks with the largest total run time: the lower bound on
+        the wall time of this run however many workers are added.
+        """
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in self.graph.order:
+            if name not in self.runs:
+                continue
+            dependencies = [dep for dep in self.graph.dependencies(name) if dep in finish]
+            slowest = max(dependencies, key=lambda dep: finish[dep], default=None)
+            previous[name] = slowest
+            finish[name] = self.runs[name].seconds + (finish[slowest] if slowest else 0.0)
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=finish.get)
+        total, path = finish[name], []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], total
+
+    def report(self) -> pd.DataFrame:
+        """
+        Per-task start offset, run time, whether it came from the cache and whether it is
+        on the critical path, in start order.
+        """
+        path, _ = self.critical_path()
+        df = pd.DataFrame(list(self.runs.values()), columns=list(TaskRun._fields)).set_index("name")
+        df["critical"] = df.index.isin(path)
+        return df.sort_values("started")
@@ -1,22 +1,273 @@
+import re
 import sqlite3
 import pandas as pd
 import logging
-from utils import setup_logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from compact import compact_frame
+from connections import ConnectionPool
+from instrumentation import instrumented
+from partitioning import prune_partitions
 
-setup_logging(log_file="loading.log")
+# Explicit dtypes per table so pandas does not have to infer them on every chunk
+TABLE_DTYPES = {
+    "sales": {
+        "transaction_id": "int64",
+        "branch_id": "int64",
+        "article_id": "int64",
+        "quantity": "int64",
+        "sale_date": "object",
+    },
+    "articles": {
+        "article_id": "int64",
+        "article_name": "object",
+        "category": "object",
+        "price": "float64",
+    },
+    "branches": {
+        "branch_id": "int64",
+        "branch_name": "object",
+        "city": "object",
+    },
+}
 
-def load_table_from_db(db_path:str,table_name:str):
+# Rows read first when streaming with a byte budget, to measure the row width before the
+# budget decides the chunk size
+PROBE_ROWS = 100
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+DateLike = Union[str, date, datetime]
+
+def _check_identifier(name: str) -> str:
+    """
+    Makes sure a table or column name is a plain identifier before it is put into SQL.
+    """
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return name
+
+def _to_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+@instrumented
+def build_select_query(
+    table_name: str,
+    columns: Optional[List[str]] = None,
+    start_date: Optional[DateLike] = None,
+    end_date: Optional[DateLike] = None,
+    branch_ids: Optional[Iterable[int]] = None,
+    article_ids: Optional[Iterable[int]] = None,
+    after_transaction_id: Optional[int] = None,
+    max_transaction_id: Optional[int] = None,
+    null_column: Optional[str] = None,
+    partitions: Optional[List[str]] = None,
+) -> Tuple[str, list]:
+    """
+    Builds a parameterized SELECT for the requested columns and filters.
+    The date range is inclusive on both ends and is written as a half-open range on
+    sale_date so SQLite can serve it from an index on that column. The transaction id
+    bounds select the range (after_transaction_id, max_transaction_id]; `null_column` keeps
+    only the rows where that column is NULL.
+    With `partitions` (monthly tables of a partitioned table), the same SELECT is run
+    on each of them and combined with UNION ALL.
+    """
+    select = ", ".join(_check_identifier(col) for col in columns) if columns else "*"
+    query = f"SELECT {select} FROM {_check_identifier(table_name)}"
+    conditions = []
+    params = []
+    if start_date is not None:
+        conditions.append("sale_date >= ?")
+        params.append(_to_date(start_date).isoformat())
+    if end_date is not None:
+        conditions.append("sale_date < ?")
+        params.append((_to_date(end_date) + timedelta(days=1)).isoformat())
+    for column, ids in (("branch_id", branch_ids), ("article_id", article_ids)):
+        if ids is None:
+            continue
+        ids = sorted(set(int(i) for i in ids))
+        if not ids:
+            conditions.append("0")  # an empty id set matches nothing
+            continue
+        conditions.append(f"{column} IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+    if after_transaction_id is not None:
+        conditions.append("transaction_id > ?")
+        params.append(int(after_transaction_id))
+    if max_transaction_id is not None:
+        conditions.append("transaction_id <= ?")
+        params.append(int(max_transaction_id))
+    if null_column is not None:
+        conditions.append(f"{_check_identifier(null_column)} IS NULL")
+    if partitions is not None:
+        if not partitions:
+            return query + " WHERE 0", []  # no partition overlaps the date range
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        selects = [f"SELECT {select} FROM {_check_identifier(partition)}{where}" for partition in partitions]
+        return " UNION ALL ".join(selects), params * len(partitions)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params
+
+def _pruned_select_query(
+    conn: sqlite3.Connection,
+    table_name: str,
+    columns: Optional[List[str]],
+    start_date: Optional[DateLike],
+    end_date: Optional[DateLike],
+    *filters,
+) -> Tuple[str, list]:
+    """
+    build_select_query, reading only the monthly partitions that overlap the date range
+    when the table is partitioned (see partitioning.py).
+    """
+    partitions = None
+    if start_date is not None or end_date is not None:
+        partitions = prune_partitions(conn, table_name, start_date, end_date)
+    return build_select_query(table_name, columns, start_date, end_date, *filters, partitions=partitions)
+
+@instrumented
+def load_table_from_db(
+    db_path: str,
+    table_name: str,
+    columns: Optional[List[str]] = None,
+    start_date: Optional[DateLike] = None,
+    end_date: Optional[DateLike] = None,
+    branch_ids: Optional[Iterable[int]] = None,
+    article_ids: Optional[Iterable[int]] = None,
+    after_transaction_id: Optional[int] = None,
+    max_transaction_id: Optional[int] = None,
+    null_column: Optional[str] = None,
+    conn: Optional[sqlite3.Connection] = None,
+    compact: bool = False,
+):
+    """
+    Loads a table into a DataFrame. Only the requested columns and the rows matching
+    the date range and id filters are read from the database; for a partitioned table
+    only the months in the date range are read. If `conn` is given
+    (e.g. borrowed from a ConnectionPool) it is used and left open. With `compact=True`
+    the frame is shrunk with `compact.compact_frame`.
+    """
     try:
-        logging.info(f"Loading table '{table_name}' from database.")
-        # Connect to the SQLite database
-        conn = sqlite3.connect(db_path)
-        # Read the specified table into a DataFrame
-        query = f"SELECT * FROM {table_name}" # we can use f-string to format the table name for example "articles" or "sales" in our case
-        df = pd.read_sql_query(query, conn)
-        # Close the database connection
-        conn.close()
-        logging.info(f"Loaded {len(df)} records from table '{table_name}'.")
+        logging.info("Loading table '%s' from database.", table_name)
+        # Connect to the SQLite database unless a connection was passed in, and close it again
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(db_path)
+        try:
+            query, params = _pruned_select_query(
+                conn, table_name, columns, start_date, end_date, branch_ids, article_ids,
+                after_transaction_id, max_transaction_id, null_column
+            )
+            df = pd.read_sql_query(query, conn, params=params)
+        finally:
+            if own_conn:
+                conn.close()
+        logging.info("Loaded %s records from table '%s'.", len(df), table_name)
+        if compact:
+            df, _ = compact_frame(df)
         return df
     except Exception as e:
-        logging.error(f"Error occurred while loading table '{table_name}': {e}")
-        return pd.DataFrame()  # Return an empty DataFrame on error
\ No newline at end of file
+        logging.error("Error occurred while loading table '%s': %s", table_name, e)
+        return pd.DataFrame()  # Return an empty DataFrame on error
+
+@instrumented
+def load_tables_parallel(
+    db_path: str,
+    tables: Union[List[str], Dict[str, dict]],
+    pool: Optional[ConnectionPool] = None,
+    max_workers: Optional[int] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Loads several tables concurrently, one thread and one connection per table, so the
+    total time is roughly that of the slowest table. `tables` is a list of names or a
+    dict of name -> keyword arguments for `load_table_from_db` (columns, filters).
+    Without a pool, a temporary pool of read-only WAL connections is used.
+    """
+    if not isinstance(tables, dict):
+        tables = {name: {} for name in tables}
+    if not tables:
+        return {}
+    own_pool = pool is None
+    if own_pool:
+        pool = ConnectionPool(db_path, size=len(tables), read_only=True)
+
+    def load(name: str) -> pd.DataFrame:
+        with pool.connection() as conn:
+            return load_table_from_db(db_path, name, conn=conn, **tables[name])
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or len(tables)) as executor:
+            futures = {name: executor.submit(load, name) for name in tables}
+            return {name: future.result() for name, future in futures.items()}
+    finally:
+        if own_pool:
+            pool.close()
+
+@instrumented
+def load_table_in_chunks(
+    db_path: str,
+    table_name: str,
+    chunksize: int = 100_000,
+    max_bytes: Optional[int] = None,
+    dtypes: Optional[Dict[str, str]] = None,
+    columns: Optional[List[str]] = None,
+    start_date: Optional[DateLike] = None,
+    end_date: Optional[DateLike] = None,
+    branch_ids: Optional[Iterable[int]] = None,
+    article_ids: Optional[Iterable[int]] = None,
+    after_transaction_id: Optional[int] = None,
+    max_transaction_id: Optional[int] = None,
+    null_column: Optional[str] = None,
+    compact: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Streams a table from the database as DataFrame chunks of at most `chunksize` rows.
+    If `max_bytes` is given, a first chunk of at most PROBE_ROWS rows measures the row
+    width, and the chunk size is adjusted after every chunk so that each chunk stays within
+    that memory budget. Only one chunk is held in memory at a time.
+    Columns, filters and `compact` work the same way as in `load_table_from_db`.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be a positive number of rows")
+    if dtypes is None:
+        dtypes = TABLE_DTYPES.get(table_name, {})
+    logging.info("Streaming table '%s' from database.", table_name)
+    conn = sqlite3.connect(db_path)
+    try:
+        query, params = _pruned_select_query(
+            conn, table_name, columns, start_date, end_date, branch_ids, article_ids,
+            after_transaction_id, max_transaction_id, null_column
+        )
+        cursor = conn.execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col in columns}
+        rows_per_chunk = chunksize if max_bytes is None else min(chunksize, PROBE_ROWS)
+        total = 0
+        while True:
+            rows = cursor.fetchmany(rows_per_chunk)
+            if not rows:
+                break
+            chunk = pd.DataFrame.from_records(rows, columns=columns)
+            # int64 cannot hold NULL: columns with NULLs keep the inferred float64 (NaN), as
+            # load_table_from_db returns them, instead of failing the whole stream
+            chunk = chunk.astype({col: dtype for col, dtype in dtypes.items() if not chunk[col].isna().any()})
+            if compact:
+                chunk, _ = compact_frame(chunk)
+            total += len(chunk)
+            if max_bytes is not None:
+                # Re-estimate the row width from the chunk we just built
+                row_bytes = max(1, -(-chunk.memory_usage(deep=True).sum() // len(chunk)))  # rounded up
+                rows_per_chunk = max(1, min(chunksize, int(max_bytes // row_bytes)))
+            yield chunk
+        logging.info("Streamed %s records from table '%s'.", total, table_name)
+    except Exception as e:
+        logging.error("Error occurred while streaming table '%s': %s", table_name, e)
+        raise  # a silently truncated stream would give wrong totals downstream
+    finally:
+        conn.close()
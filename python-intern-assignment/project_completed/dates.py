@@ -0,0 +1,99 @@
+import logging
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+# Formats tried, in order, when no explicit format is given
+DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y/%m/%d",
+    "%d.%m.%Y",
+    "%m/%d/%Y",  # before day-first, so ambiguous slash dates keep pd.to_datetime's month-first meaning
+    "%d/%m/%Y",
+)
+
+
+def detect_date_format(values: Iterable[str], sample_size: int = 1000) -> Optional[str]:
+    """
+    Returns the first format in DATE_FORMATS that parses every value of a sample, or None.
+    """
+    sample = pd.Series(values, dtype=object).dropna()
+    sample = sample.iloc[:sample_size] if len(sample) > sample_size else sample
+    if sample.empty:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            pd.to_datetime(sample, format=date_format)
+            return date_format
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _parse_unique(uniques: pd.Index, date_format: Optional[str]) -> np.ndarray:
+    if date_format is None:
+        date_format = detect_date_format(uniques)
+        if date_format is None:
+            logging.warning("Could not detect a fixed date format; letting pandas infer it per value.")
+            return pd.to_datetime(uniques, format="mixed").to_numpy()
+    return pd.to_datetime(uniques, format=date_format).to_numpy()
+
+
+def parse_dates(dates: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """
+    Parses a column of date strings with an explicit (or detected) fixed format. Every
+    distinct string is parsed once and the results are mapped back to the rows.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    codes, uniques = pd.factorize(dates)
+    parsed = _parse_unique(uniques, date_format)
+    return pd.Series(take(parsed, codes, allow_fill=True), index=dates.index, name=dates.name)
+
+
+def calendar_keys(dates: pd.Series) -> pd.DataFrame:
+    """
+    Derives year, month, a yyyymm key and the ISO week from datetimes in one vectorized
+    step on the underlying day numbers. Columns are int32, or float64 if any date is missing.
+    """
+    values = dates.to_numpy(dtype="datetime64[ns]")
+    missing = np.isnat(values)
+    days = values.astype("datetime64[D]").astype(np.int64)
+    months_since_epoch = values.astype("datetime64[M]").astype(np.int64)
+    year = months_since_epoch // 12 + 1970
+    month = months_since_epoch % 12 + 1
+    # ISO week: the week belongs to the year of its Thursday (1970-01-01 was a Thursday)
+    weekday = (days + 3) % 7  # Monday = 0
+    thursday = days - weekday + 3
+    thursday_year = thursday.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64)
+    jan_first = thursday_year.astype("datetime64[Y]").astype("datetime64[D]").astype(np.int64)
+    iso_week = (thursday - jan_first) // 7 + 1
+    columns = {"year": year, "month": month, "year_month": year * 100 + month, "iso_week": iso_week}
+    if missing.any():
+        columns = {name: np.where(missing, np.nan, column) for name, column in columns.items()}
+    else:
+        columns = {name: column.astype(np.int32) for name, column in columns.items()}
+    return pd.DataFrame(columns, index=dates.index)
+
+
+def derive_date_columns(dates: pd.Series, date_format: Optional[str] = None) -> pd.DataFrame:
+    """
+    Returns the parsed dates plus their calendar keys (sale_date, year, month, year_month,
+    iso_week). Parsing and key derivation run on the distinct strings only.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        keys = calendar_keys(dates)
+        keys.insert(0, dates.name, dates)
+        return keys
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.Series(_parse_unique(uniques, date_format), name=dates.name)
+    distinct = calendar_keys(parsed)
+    distinct.insert(0, dates.name, parsed)
+    return pd.DataFrame(
+        {column: take(distinct[column].to_numpy(), codes, allow_fill=True) for column in distinct.columns},
+        index=dates.index,
+    )
@@ -0,0 +1,168 @@
+import logging
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Union
+
+import pandas as pd
+
+from analysis import METRIC_COLUMNS, calculate_metrics_from_chunks, required_sales_columns
+from data_loading import load_table_from_db, load_table_in_chunks
+from persistence import (
+    METRIC_TABLES, WATERMARK_TABLE, MetricTable, create_table_sql, metric_rows
+)
+from processing import process_sales_chunks
+
+# Per-article totals are maintained by upserts; the ranked metrics_top_articles table is
+# rebuilt from them after every refresh instead of from the raw rows
+ARTICLE_TOTALS = MetricTable(
+    "metrics_article_quantity", "top_articles",
+    (("article_name", "TEXT"),), (("total_quantity", "INTEGER"),)
+)
+TOP_ARTICLES = next(spec for spec in METRIC_TABLES if spec.ranked)
+
+# Metric tables maintained by upserts
+INCREMENTAL_TABLES = [ARTICLE_TOTALS if spec.ranked else spec for spec in METRIC_TABLES]
+
+
+def _has_primary_key(conn: sqlite3.Connection, table: str, keys) -> bool:
+    info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    pk_columns = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5] > 0]
+    return pk_columns == list(keys)
+
+
+def get_watermark(conn: sqlite3.Connection, watermark_column: str = "transaction_id") -> Optional[Union[int, str]]:
+    """
+    Returns the last processed transaction_id (an int) or sale_date (an ISO date string), or
+    None if metrics were never built incrementally.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (WATERMARK_TABLE,)
+    ).fetchone()
+    if not exists:
+        return None
+    row = conn.execute(
+        f"SELECT last_value FROM {WATERMARK_TABLE} WHERE watermark_column = ?", (watermark_column,)
+    ).fetchone()
+    if row is None:
+        return None
+    # stored as TEXT; give it the type the sales column has
+    return int(row[0]) if watermark_column == "transaction_id" else row[0]
+
+
+def _set_watermark(conn: sqlite3.Connection, watermark_column: str, value):
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            watermark_column TEXT PRIMARY KEY,
+            last_value TEXT,
+            updated_at TEXT
+        )"""
+    )
+    conn.execute(f"DELETE FROM {WATERMARK_TABLE}")  # only one watermark is valid at a time
+    conn.execute(
+        f"INSERT INTO {WATERMARK_TABLE} VALUES (?, ?, ?)",
+        (watermark_column, str(value), datetime.now().isoformat(timespec="seconds")),
+    )
+
+
+def _upsert_partial_sums(conn: sqlite3.Connection, spec: MetricTable, partial: pd.Series):
+    keys = ", ".join(spec.key_names)
+    updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in spec.value_names)
+    conn.executemany(
+        f"INSERT INTO {spec.table} ({', '.join(spec.columns)}) "
+        f"VALUES ({', '.join('?' * len(spec.columns))}) "
+        f"ON CONFLICT ({keys}) DO UPDATE SET {updates}",
+        metric_rows(spec, partial),
+    )
+
+
+def _rebuild_top_articles(conn: sqlite3.Connection):
+    """
+    Rebuilds the ranked top-articles table from the maintained per-article totals.
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {TOP_ARTICLES.table}")
+    conn.execute(create_table_sql(TOP_ARTICLES))
+    conn.execute(
+        f"""INSERT INTO {TOP_ARTICLES.table} (rank, article_name, total_quantity)
+        SELECT ROW_NUMBER() OVER (ORDER BY total_quantity DESC, article_name),
+               article_name, total_quantity
+        FROM {ARTICLE_TOTALS.table}"""
+    )
+
+
+def refresh_metrics_incremental(
+    db_path: str,
+    watermark_column: str = "transaction_id",
+    chunksize: int = 100_000,
+) -> Dict[str, object]:
+    """
+    Folds the sales rows added since the last run into the metric tables.
+    The watermark is the last processed transaction_id (or sale_date, in which case only
+    complete days should be loaded). Without a watermark, or if the metric tables were
+    written without keys, the tables are rebuilt from all sales. Metric upserts and the
+    new watermark are committed in one transaction, so a failed run can simply be retried.
+    """
+    if watermark_column not in ("transaction_id", "sale_date"):
+        raise ValueError("watermark_column must be 'transaction_id' or 'sale_date'")
+    conn = sqlite3.connect(db_path)
+    try:
+        watermark = get_watermark(conn, watermark_column)
+        full_rebuild = watermark is None or not all(
+            _has_primary_key(conn, spec.table, spec.key_names) for spec in INCREMENTAL_TABLES
+        )
+        filters = {}
+        if full_rebuild:
+            watermark = None
+        elif watermark_column == "transaction_id":
+            filters["after_transaction_id"] = watermark
+        else:
+            filters["start_date"] = date.fromisoformat(watermark) + timedelta(days=1)
+
+        # Fix the upper bound first so rows inserted while we run are left for the next run
+        where, params = "", []
+        if watermark is not None:
+            where, params = (
+                ("WHERE transaction_id > ?", [watermark]) if watermark_column == "transaction_id"
+                else ("WHERE sale_date >= ?", [filters["start_date"].isoformat()])
+            )
+        new_rows, high_water = conn.execute(
+            f"SELECT COUNT(*), MAX({watermark_column}) FROM sales {where}", params
+        ).fetchone()
+        if not new_rows and not full_rebuild:
+            logging.info("No new sales since watermark %s; metrics are up to date.", watermark)
+            return {"rows_processed": 0, "watermark": watermark, "full_rebuild": False}
+        if watermark_column == "transaction_id":
+            filters["max_transaction_id"] = high_water
+        elif high_water is not None:
+            filters["end_date"] = high_water
+
+        logging.info(
+            "%s metrics from %s sales rows (watermark %s -> %s).",
+            "Rebuilding" if full_rebuild else "Refreshing", new_rows, watermark, high_water,
+        )
+        df_articles = load_table_from_db(db_path, "articles")
+        sales_chunks = load_table_in_chunks(
+            db_path, "sales", chunksize=chunksize,
+            columns=required_sales_columns(METRIC_COLUMNS), **filters
+        )
+        partials = calculate_metrics_from_chunks(process_sales_chunks(sales_chunks, df_articles))
+
+        # one transaction for all metric tables and the watermark (BEGIN is explicit
+        # because sqlite3 would otherwise run the DDL statements outside of it)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for spec in INCREMENTAL_TABLES:
+                if full_rebuild:
+                    conn.execute(f"DROP TABLE IF EXISTS {spec.table}")
+                    conn.execute(create_table_sql(spec))
+                _upsert_partial_sums(conn, spec, partials[spec.metric])
+            _rebuild_top_articles(conn)
+            if high_water is not None:
+                _set_watermark(conn, watermark_column, high_water)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logging.info("Incremental refresh done; watermark is now %s.", high_water)
+        return {"rows_processed": new_rows, "watermark": high_water, "full_rebuild": full_rebuild}
+    finally:
+        conn.close()
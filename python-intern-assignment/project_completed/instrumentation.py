@@ -0,0 +1,310 @@
+import cProfile
+import functools
+import inspect
+import io
+import json
+import logging
+import pstats
+import sqlite3
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import pandas as pd
+from pipeline import frame_bytes
+
+RUNS_TABLE = "pipeline_runs"
+
+# Checked on every instrumented call; while False a call costs one extra function frame
+_enabled = False
+_track_memory = False
+_profile = False
+
+
+class StageRecord(NamedTuple):
+    """
+    Measurements of one call of an instrumented function or block. Times include nested
+    instrumented calls; for generators they cover only the time spent producing chunks.
+    `peak_memory_delta` (bytes above the allocations at the start, from tracemalloc) is
+    None unless memory tracking is on.
+    """
+    run_id: str
+    stage: str
+    started_at: str
+    wall_seconds: float
+    cpu_seconds: float
+    rows_in: Optional[int]
+    rows_out: Optional[int]
+    bytes_out: Optional[int]
+    peak_memory_delta: Optional[int]
+
+
+class Registry:
+    """
+    In-process collection of the StageRecords of one run, with JSON, summary-table and
+    SQLite outputs. Records from worker processes stay in those processes.
+    """
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records: List[StageRecord] = []
+        self.profiles: Dict[str, pstats.Stats] = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: StageRecord):
+        with self._lock:
+            self.records.append(record)
+
+    def add_profile(self, stage: str, profiler: cProfile.Profile):
+        with self._lock:
+            if stage in self.profiles:
+                self.profiles[stage].add(profiler)
+            else:
+                self.profiles[stage] = pstats.Stats(profiler)
+
+    def clear(self):
+        with self._lock:
+            self.run_id = uuid.uuid4().hex[:12]
+            self.records = []
+            self.profiles = {}
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """
+        Returns the records as a JSON document, and writes it to `path` if given.
+        """
+        document = json.dumps(
+            {"run_id": self.run_id, "records": [record._asdict() for record in self.records]}, indent=2
+        )
+        if path:
+            with open(path, "w") as f:
+                f.write(document)
+        return document
+
+    def summary(self) -> pd.DataFrame:
+        """
+        One row per stage: calls, total wall and CPU time, rows in and out, the largest
+        output and memory peak, and the wall time relative to the slowest stage (usually
+        the outermost one, since times include nested stages).
+        """
+        columns = list(StageRecord._fields)[1:]
+        df = pd.DataFrame(self.records, columns=list(StageRecord._fields))
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        grouped = df.groupby("stage", sort=False)
+        summary = grouped.agg(
+            calls=("wall_seconds", "size"),
+            wall_seconds=("wall_seconds", "sum"),
+            cpu_seconds=("cpu_seconds", "sum"),
+            max_bytes_out=("bytes_out", "max"),
+            max_peak_memory_delta=("peak_memory_delta", "max"),
+        )
+        # stages that never saw a frame keep NaN rather than a misleading 0
+        for column in ("rows_out", "rows_in"):
+            summary.insert(3, column, grouped[column].sum(min_count=1))
+        summary["wall_share"] = summary["wall_seconds"] / summary["wall_seconds"].max()
+        return summary.sort_values("wall_seconds", ascending=False)
+
+    def profile_report(self, stage: str, limit: int = 20) -> str:
+        """
+        The cumulative-time cProfile listing of a stage (requires `enable(profile=True)`).
+        """
+        stream = io.StringIO()
+        stats = self.profiles[stage]
+        stats.stream = stream
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+    def save(self, conn: sqlite3.Connection) -> int:
+        """
+        Appends the records to the pipeline_runs table, for tracking stage times across runs.
+        """
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {RUNS_TABLE} (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                started_at TEXT NOT NULL,
+                wall_seconds REAL NOT NULL,
+                cpu_seconds REAL NOT NULL,
+                rows_in INTEGER,
+                rows_out INTEGER,
+                bytes_out INTEGER,
+                peak_memory_delta INTEGER
+            )
+        """)
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {RUNS_TABLE} VALUES ({', '.join('?' * len(StageRecord._fields))})",
+                [tuple(record) for record in self.records],
+            )
+        logging.info("Saved %s stage records of run %s.", len(self.records), self.run_id)
+        return len(self.records)
+
+
+REGISTRY = Registry()
+
+
+def enable(track_memory: bool = False, profile: bool = False):
+    """
+    Turns instrumentation on. `track_memory` starts tracemalloc for peak-memory deltas
+    (slows allocation-heavy code noticeably); `profile` keeps a cProfile of every
+    outermost stage.
+    """
+    global _enabled, _track_memory, _profile
+    _enabled, _track_memory, _profile = True, track_memory, profile
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    global _enabled, _track_memory, _profile
+    if _track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _enabled, _track_memory, _profile = False, False, False
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _rows(value: Any) -> Optional[int]:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, dict):
+        counts = [_rows(item) for item in value.values()]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    return None
+
+def _rows_in(args, kwargs) -> Optional[int]:
+    counts = [_rows(value) for value in list(args) + list(kwargs.values())]
+    counts = [count for count in counts if count is not None]
+    return sum(counts) if counts else None
+
+
+_local = threading.local()
+
+
+class _Measurement:
+    """
+    Accumulates wall time, CPU time and peak memory over one or more spans (a generator
+    is measured once per chunk it produces). Open spans form a per-thread stack so a
+    nested span's tracemalloc peak is carried over to the spans around it.
+    """
+
+    def __init__(self, stage: str, rows_in: Optional[int] = None):
+        self.stage = stage
+        self.started_at = datetime.now().isoformat(timespec="milliseconds")
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.bytes_out: Optional[int] = None
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak: Optional[int] = None
+        self._inner_peak = 0
+
+    @contextmanager
+    def span(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        tracing = _track_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._inner_peak = max(stack[-1]._inner_peak, peak)
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile() if _profile and not stack else None
+        stack.append(self)
+        if profiler is not None:
+            profiler.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            self.wall += time.perf_counter() - wall
+            self.cpu += time.process_time() - cpu
+            if profiler is not None:
+                profiler.disable()
+                REGISTRY.add_profile(self.stage, profiler)
+            stack.pop()
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], self._inner_peak)
+                self.peak = max(self.peak or 0, peak - current)
+                if stack:
+                    stack[-1]._inner_peak = max(stack[-1]._inner_peak, peak)
+
+    def add_output(self, value: Any):
+        rows = _rows(value)
+        if rows is not None:
+            self.rows_out = (self.rows_out or 0) + rows
+            self.bytes_out = max(self.bytes_out or 0, frame_bytes(value))
+
+    def finish(self):
+        REGISTRY.add(StageRecord(
+            REGISTRY.run_id, self.stage, self.started_at, self.wall, self.cpu,
+            self.rows_in, self.rows_out, self.bytes_out, self.peak,
+        ))
+
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None) -> Iterator[_Measurement]:
+    """
+    Measures a block of code as stage `name`; call `.add_output(frame)` on the yielded
+    object to record what the block produced. Does nothing while instrumentation is off.
+    """
+    if not _enabled:
+        yield _Measurement(name, rows_in)
+        return
+    measurement = _Measurement(name, rows_in)
+    try:
+        with measurement.span():
+            yield measurement
+    finally:
+        measurement.finish()
+
+
+def _measured_generator(measurement: _Measurement, generator: Iterator) -> Iterator:
+    try:
+        while True:
+            with measurement.span():
+                try:
+                    chunk = next(generator)
+                except StopIteration:
+                    return
+            measurement.add_output(chunk)
+            yield chunk
+    finally:
+        generator.close()
+        measurement.finish()
+
+
+def instrumented(func: Optional[Callable] = None, *, name: Optional[str] = None) -> Callable:
+    """
+    Decorator recording a StageRecord per call while instrumentation is enabled. Rows in
+    are the rows of the DataFrame/Series arguments; rows and bytes out come from the
+    returned frame, series or dict of them. Generator functions are measured chunk by
+    chunk while they are consumed and recorded when they are exhausted or closed.
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name)
+    stage_name = name or f"{func.__module__}.{func.__qualname__}"
+    generator_function = inspect.isgeneratorfunction(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        measurement = _Measurement(stage_name, _rows_in(args, kwargs))
+        if generator_function:
+            return _measured_generator(measurement, func(*args, **kwargs))
+        try:
+            with measurement.span():
+                result = func(*args, **kwargs)
+            measurement.add_output(result)
+            return result
+        finally:
+            measurement.finish()
+
+    return wrapper
@@ -0,0 +1,114 @@
+import logging
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+# Use a dense positional array when the key range is at most this many times the row count
+DENSE_RANGE_FACTOR = 4
+
+
+class JoinReport(NamedTuple):
+    """
+    Foreign keys of the fact rows that had no match in the dimension table.
+    """
+    unmatched_rows: int
+    unmatched_keys: np.ndarray
+
+
+class DimensionIndex:
+    """
+    A reusable lookup index over a dimension table with unique keys, for star-schema joins.
+    Compact integer keys use a dense array (key - min -> row position); other numeric keys
+    use a sorted array and searchsorted; text keys use a pandas Index hash table.
+    Build it once per dimension table and reuse it for every fact frame or chunk.
+    """
+
+    def __init__(self, dimension: pd.DataFrame, key: str):
+        keys = dimension[key]
+        if keys.duplicated().any():
+            raise ValueError(f"Dimension key '{key}' is not unique")
+        self.dimension = dimension
+        self.key = key
+        values = keys.to_numpy()
+        self.kind = "hash"
+        if values.dtype.kind in "iu" and len(values):
+            low, high = int(values.min()), int(values.max())
+            if high - low + 1 <= max(DENSE_RANGE_FACTOR * len(values), 1024):
+                self.kind = "dense"
+                self._low = low
+                self._lookup = np.full(high - low + 1, -1, dtype=np.intp)
+                self._lookup[values.astype(np.int64) - low] = np.arange(len(values))
+        if self.kind == "hash" and values.dtype.kind in "iuf":
+            self.kind = "sorted"
+            self._order = np.argsort(values, kind="stable")
+            self._sorted = values[self._order]
+        elif self.kind == "hash":
+            self._index = pd.Index(values)
+
+    def positions(self, foreign_keys: pd.Series) -> np.ndarray:
+        """
+        Returns the dimension row position for every foreign key, or -1 where there is no match.
+        """
+        if self.kind == "hash":
+            return self._index.get_indexer(foreign_keys)
+        values = foreign_keys.to_numpy()
+        if values.dtype.kind not in "iuf":
+            values = pd.to_numeric(foreign_keys, errors="coerce").to_numpy(dtype=np.float64)
+        if values.dtype.kind == "f":
+            usable = ~np.isnan(values) & (values == np.round(values))
+        else:
+            usable = np.ones(len(values), dtype=bool)
+        result = np.full(len(values), -1, dtype=np.intp)
+        if self.kind == "dense":
+            offsets = np.where(usable, values, self._low).astype(np.int64) - self._low
+            in_range = usable & (offsets >= 0) & (offsets < len(self._lookup))
+            result[in_range] = self._lookup[offsets[in_range]]
+        else:
+            found = np.searchsorted(self._sorted, values[usable])
+            found = np.minimum(found, max(len(self._sorted) - 1, 0))
+            hit = len(self._sorted) > 0
+            matched = (self._sorted[found] == values[usable]) if hit else np.zeros(len(found), dtype=bool)
+            result[np.flatnonzero(usable)[matched]] = self._order[found[matched]]
+        return result
+
+    def gather(self, positions: np.ndarray, column: str):
+        """
+        Takes one attribute column at the given positions; -1 positions become missing values.
+        """
+        values = self.dimension[column].array
+        if isinstance(values, pd.arrays.NumpyExtensionArray):
+            return take(values.to_numpy(), positions, allow_fill=True)
+        return values.take(positions, allow_fill=True)
+
+
+def join_dimension(
+    fact: pd.DataFrame,
+    index: DimensionIndex,
+    columns: Optional[List[str]] = None,
+    fact_key: Optional[str] = None,
+) -> Tuple[pd.DataFrame, JoinReport]:
+    """
+    Left-joins dimension attributes onto a fact frame through a DimensionIndex.
+    Only the requested attribute columns are gathered; the fact columns are shared with
+    the input frame rather than copied. Returns the joined frame and the unmatched keys.
+    """
+    fact_key = fact_key or index.key
+    if columns is None:
+        columns = [column for column in index.dimension.columns if column != index.key]
+    clashes = [column for column in columns if column in fact.columns]
+    if clashes:
+        raise ValueError(f"Columns {clashes} exist in both the fact and the dimension frame")
+    positions = index.positions(fact[fact_key])
+    joined = fact.copy(deep=False)
+    for column in columns:
+        joined[column] = index.gather(positions, column)
+    missing = positions < 0
+    report = JoinReport(int(missing.sum()), pd.unique(fact[fact_key].to_numpy()[missing]))
+    if report.unmatched_rows:
+        logging.warning(
+            "%s rows have %s values missing from the dimension table: %s",
+            report.unmatched_rows, index.key, report.unmatched_keys[:10].tolist(),
+        )
+    return joined, report
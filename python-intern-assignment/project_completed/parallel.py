@@ -0,0 +1,122 @@
+import logging
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from aggregation import combine_metric_results
+from analysis import BUSINESS_METRICS, finish_metrics, partial_metrics_from_chunks, required_sales_columns
+from data_loading import load_table_from_db, load_table_in_chunks
+from processing import process_sales_chunks
+from utils import log_queue, worker_logging
+
+SHARD_KEYS = ("transaction_id", "branch_id")
+
+
+class Shard(NamedTuple):
+    """
+    One slice of the sales table: a transaction_id range (after, max], a set of branches,
+    or the rows whose shard key `null_key` is NULL (which no range or id set matches).
+    """
+    after_transaction_id: Optional[int] = None
+    max_transaction_id: Optional[int] = None
+    branch_ids: Optional[Tuple[int, ...]] = None
+    null_key: Optional[str] = None
+
+
+def plan_shards(db_path: str, shards: int, shard_key: str = "transaction_id") -> List[Shard]:
+    """
+    Splits the sales table into at most `shards` slices. transaction_id shards are equal-width
+    id ranges; branch_id shards spread whole branches so that every shard gets about the
+    same number of rows (largest branch first, each to the least loaded shard). Rows with a
+    NULL shard key get one extra shard of their own.
+    """
+    if shard_key not in SHARD_KEYS:
+        raise ValueError(f"Unknown shard key: {shard_key}. Use one of {SHARD_KEYS}")
+    if shards < 1:
+        raise ValueError("shards must be a positive number")
+    conn = sqlite3.connect(db_path)
+    try:
+        has_nulls = conn.execute(f"SELECT EXISTS (SELECT 1 FROM sales WHERE {shard_key} IS NULL)").fetchone()[0]
+        null_shard = [Shard(null_key=shard_key)] if has_nulls else []
+        if shard_key == "transaction_id":
+            low, high = conn.execute("SELECT MIN(transaction_id), MAX(transaction_id) FROM sales").fetchone()
+            if low is None:
+                return null_shard
+            width = -(-(high - low + 1) // shards)  # ceiling division
+            return [
+                Shard(after_transaction_id=start - 1, max_transaction_id=min(start + width - 1, high))
+                for start in range(low, high + 1, width)
+            ] + null_shard
+        counts = conn.execute(
+            "SELECT branch_id, COUNT(*) FROM sales WHERE branch_id IS NOT NULL "
+            "GROUP BY branch_id ORDER BY COUNT(*) DESC, branch_id"
+        ).fetchall()
+    finally:
+        conn.close()
+    buckets: List[List[int]] = [[] for _ in range(min(shards, len(counts)))]
+    loads = [0] * len(buckets)
+    for branch_id, count in counts:
+        target = loads.index(min(loads))
+        buckets[target].append(branch_id)
+        loads[target] += count
+    return [Shard(branch_ids=tuple(sorted(bucket))) for bucket in buckets] + null_shard
+
+
+def aggregate_shard(
+    db_path: str,
+    shard: Shard,
+    metric_names: List[str],
+    chunksize: int = 100_000,
+) -> Optional[Dict[str, pd.Series]]:
+    """
+    Loads one shard of sales, joins the articles, derives the date columns and returns
+    the partial (unordered) metric totals, or None if the shard is empty. Runs in a worker.
+    """
+    metrics = [metric for metric in BUSINESS_METRICS if metric.name in metric_names]
+    df_articles = load_table_from_db(db_path, "articles")
+    chunks = load_table_in_chunks(
+        db_path, "sales", chunksize=chunksize, columns=required_sales_columns(metric_names),
+        branch_ids=shard.branch_ids, after_transaction_id=shard.after_transaction_id,
+        max_transaction_id=shard.max_transaction_id, null_column=shard.null_key,
+    )
+    return partial_metrics_from_chunks(process_sales_chunks(chunks, df_articles), metrics)
+
+
+def calculate_metrics_parallel(
+    db_path: str,
+    workers: Optional[int] = None,
+    shard_key: str = "transaction_id",
+    shards: Optional[int] = None,
+    metric_names: Optional[List[str]] = None,
+    chunksize: int = 100_000,
+) -> Dict[str, pd.Series]:
+    """
+    Calculates the business metrics with one worker process per shard of the sales table.
+    Workers send back only their per-group totals, which are combined in shard order, so
+    the result (including the full ordering of top articles) matches a single-process run.
+    With `workers=1` the shards are processed in this process, one after another.
+    """
+    workers = workers or os.cpu_count() or 1
+    metric_names = metric_names or [metric.name for metric in BUSINESS_METRICS]
+    metrics = [metric for metric in BUSINESS_METRICS if metric.name in metric_names]
+    plan = plan_shards(db_path, shards or workers, shard_key)
+    logging.info("Aggregating %s %s shards with %s worker(s).", len(plan), shard_key, workers)
+    args = (repeat(db_path), plan, repeat(metric_names), repeat(chunksize))
+    if workers == 1 or len(plan) <= 1:
+        partials = list(map(aggregate_shard, *args))
+    else:
+        # workers log through the parent's queue listener instead of writing files themselves
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(plan)),
+            initializer=worker_logging,
+            initargs=(log_queue(), logging.getLogger().level),
+        ) as executor:
+            partials = list(executor.map(aggregate_shard, *args))  # results arrive in shard order
+    totals = None
+    for partial in partials:
+        if partial is not None:
+            totals = combine_metric_results(metrics, totals, partial)
+    return finish_metrics(totals, metrics)
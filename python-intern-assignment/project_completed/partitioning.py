@@ -0,0 +1,318 @@
+import logging
+import sqlite3
+from datetime import date
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+from connections import write_transaction
+from dates import parse_dates
+
+DateLike = Union[str, date, pd.Timestamp]
+
+# Registry of the monthly partitions of every partitioned fact table
+PARTITION_TABLE = "fact_partitions"
+
+# Month of a text date as a yyyymm integer; NULL for missing or non-ISO dates
+MONTH_EXPR = "CAST(strftime('%Y%m', sale_date) AS INTEGER)"
+
+# Indexes created on every partition (the same columns schema.INDEXES puts on sales).
+# They use their own "px_" prefix, which schema.ensure_indexes does not manage.
+PARTITION_INDEXES = {
+    "date": ("sale_date", "branch_id", "article_id", "quantity"),
+    "article": ("article_id", "quantity"),
+    "branch": ("branch_id", "article_id", "quantity"),
+    "transaction": ("transaction_id",),
+}
+
+
+def _month_key(value: DateLike) -> int:
+    timestamp = pd.Timestamp(value)
+    return timestamp.year * 100 + timestamp.month
+
+
+def _template(table_name: str) -> str:
+    return f"{table_name}_template"
+
+
+def partition_name(table_name: str, year_month: Optional[int]) -> str:
+    return f"{table_name}_{year_month}" if year_month is not None else f"{table_name}_undated"
+
+
+def is_partitioned(conn: sqlite3.Connection, table_name: str) -> bool:
+    has_registry = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (PARTITION_TABLE,)
+    ).fetchone()
+    if not has_registry:
+        return False
+    return conn.execute(
+        f"SELECT 1 FROM {PARTITION_TABLE} WHERE source_table = ? LIMIT 1", (table_name,)
+    ).fetchone() is not None
+
+
+def list_partitions(conn: sqlite3.Connection, table_name: str = "sales", include_archived: bool = False) -> pd.DataFrame:
+    """
+    Returns the registry rows of a partitioned table, oldest month first.
+    """
+    query = f"SELECT * FROM {PARTITION_TABLE} WHERE source_table = ?"
+    if not include_archived:
+        query += " AND location = 'main'"
+    return pd.read_sql_query(query + " ORDER BY year_month IS NULL, year_month", conn, params=(table_name,))
+
+
+def prune_partitions(
+    conn: sqlite3.Connection,
+    table_name: str,
+    start_date: Optional[DateLike] = None,
+    end_date: Optional[DateLike] = None,
+) -> Optional[List[str]]:
+    """
+    Returns the partitions of `table_name` whose month overlaps the inclusive date range,
+    or None if the table is not partitioned. The undated partition is only read when no
+    range is given, because a date filter never matches its rows.
+    """
+    if not is_partitioned(conn, table_name):
+        return None
+    conditions = ["source_table = ?", "location = 'main'"]
+    params: List[object] = [table_name]
+    if start_date is not None or end_date is not None:
+        conditions.append("year_month IS NOT NULL")
+    if start_date is not None:
+        conditions.append("year_month >= ?")
+        params.append(_month_key(start_date))
+    if end_date is not None:
+        conditions.append("year_month <= ?")
+        params.append(_month_key(end_date))
+    rows = conn.execute(
+        f"SELECT partition_table FROM {PARTITION_TABLE} WHERE {' AND '.join(conditions)} "
+        "ORDER BY year_month IS NULL, year_month",
+        params,
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _create_registry(conn: sqlite3.Connection):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PARTITION_TABLE} (
+            partition_table TEXT PRIMARY KEY,
+            source_table TEXT NOT NULL,
+            year_month INTEGER,
+            first_date TEXT,
+            last_date TEXT,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            location TEXT NOT NULL DEFAULT 'main',
+            compacted INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+
+def _create_like(conn: sqlite3.Connection, source: str, target: str, schema: str = "main"):
+    columns = conn.execute(f"PRAGMA table_info({source})").fetchall()
+    definitions = ", ".join(f"{name} {col_type}".strip() for _, name, col_type, *_ in columns)
+    conn.execute(f"CREATE TABLE {schema}.{target} ({definitions})")
+
+
+def _create_partition_indexes(conn: sqlite3.Connection, partition: str):
+    for suffix, columns in PARTITION_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS px_{partition}_{suffix} ON {partition} ({', '.join(columns)})")
+
+
+def _update_stats(conn: sqlite3.Connection, partition: str):
+    count, first, last = conn.execute(f"SELECT COUNT(*), MIN(sale_date), MAX(sale_date) FROM {partition}").fetchone()
+    conn.execute(
+        f"UPDATE {PARTITION_TABLE} SET row_count = ?, first_date = ?, last_date = ? WHERE partition_table = ?",
+        (count, first, last, partition),
+    )
+
+
+def _add_partition(conn: sqlite3.Connection, table_name: str, year_month: Optional[int]) -> str:
+    partition = partition_name(table_name, year_month)
+    _create_like(conn, _template(table_name), partition)
+    _create_partition_indexes(conn, partition)
+    conn.execute(
+        f"INSERT INTO {PARTITION_TABLE} (partition_table, source_table, year_month) VALUES (?, ?, ?)",
+        (partition, table_name, year_month),
+    )
+    return partition
+
+
+def _rebuild_view(conn: sqlite3.Connection, table_name: str):
+    """
+    Points the `table_name` view at the partitions stored in the main database.
+    """
+    partitions = prune_partitions(conn, table_name) or [_template(table_name)]
+    conn.execute(f"DROP VIEW IF EXISTS {table_name}")
+    union = " UNION ALL ".join(f"SELECT * FROM {partition}" for partition in partitions)
+    conn.execute(f"CREATE VIEW {table_name} AS {union}")
+
+
+def migrate_to_partitions(db_path: str, table_name: str = "sales", keep_source: bool = True) -> Dict[str, int]:
+    """
+    Splits an existing fact table into one table per month (plus one for rows without a
+    usable date), registers them and replaces the table with a UNION ALL view of the same
+    name, so existing queries keep working. The original table is kept as
+    `<table>_unpartitioned` unless `keep_source=False`. Returns the rows per partition.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        if is_partitioned(conn, table_name):
+            raise ValueError(f"Table '{table_name}' is already partitioned")
+        conn.execute("BEGIN IMMEDIATE")
+        _create_registry(conn)
+        _create_like(conn, table_name, _template(table_name))
+        months = [row[0] for row in conn.execute(f"SELECT DISTINCT {MONTH_EXPR} FROM {table_name}")]
+        counts = {}
+        for year_month in sorted(months, key=lambda month: (month is None, month)):
+            partition = _add_partition(conn, table_name, year_month)
+            if year_month is None:
+                condition, params = f"{MONTH_EXPR} IS NULL", ()
+            else:
+                # the text range uses the sale_date index; the month check keeps malformed dates out
+                start = f"{year_month // 100:04d}-{year_month % 100:02d}-01"
+                following = year_month + 1 if year_month % 100 < 12 else (year_month // 100 + 1) * 100 + 1
+                end = f"{following // 100:04d}-{following % 100:02d}-01"
+                condition = f"sale_date >= ? AND sale_date < ? AND {MONTH_EXPR} = ?"
+                params = (start, end, year_month)
+            conn.execute(
+                f"INSERT INTO {partition} SELECT * FROM {table_name} WHERE {condition} "
+                "ORDER BY sale_date, transaction_id",
+                params,
+            )
+            _update_stats(conn, partition)
+            counts[partition] = conn.execute(f"SELECT COUNT(*) FROM {partition}").fetchone()[0]
+        total = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        if sum(counts.values()) != total:
+            raise ValueError(f"Partitions hold {sum(counts.values())} rows but '{table_name}' has {total}")
+        if keep_source:
+            conn.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}_unpartitioned")
+        else:
+            conn.execute(f"DROP TABLE {table_name}")
+        _rebuild_view(conn, table_name)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logging.error("Error occurred while partitioning '%s': %s", table_name, e)
+        raise
+    finally:
+        conn.close()
+    logging.info("Partitioned '%s' into %s monthly tables (%s rows).", table_name, len(counts), sum(counts.values()))
+    return counts
+
+
+def append_rows(conn: sqlite3.Connection, df: pd.DataFrame, table_name: str = "sales") -> Dict[str, int]:
+    """
+    Inserts new fact rows into their monthly partitions, creating partitions for new months,
+    in one transaction (a savepoint inside the caller's, if one is open). Returns the rows inserted per partition.
+    """
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({_template(table_name)})")]
+    dates = parse_dates(df["sale_date"])
+    months = (dates.dt.year * 100 + dates.dt.month).astype("Int64")
+    existing = set(prune_partitions(conn, table_name) or [])
+    inserted = {}
+    with write_transaction(conn, "append_rows"):
+        created = False
+        for year_month, rows in df.groupby(months, dropna=False, sort=True):
+            year_month = None if pd.isna(year_month) else int(year_month)
+            partition = partition_name(table_name, year_month)
+            if partition not in existing:
+                _add_partition(conn, table_name, year_month)
+                created = True
+            values = rows.reindex(columns=columns)
+            values = values.astype(object).where(values.notna(), None)  # plain Python values and NULLs
+            conn.executemany(
+                f"INSERT INTO {partition} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                list(zip(*(values[column].tolist() for column in columns))),
+            )
+            _update_stats(conn, partition)
+            inserted[partition] = len(rows)
+        if created:
+            _rebuild_view(conn, table_name)
+    return inserted
+
+
+def _old_partitions(conn: sqlite3.Connection, table_name: str, before: DateLike) -> List[str]:
+    rows = conn.execute(
+        f"SELECT partition_table FROM {PARTITION_TABLE} "
+        "WHERE source_table = ? AND location = 'main' AND year_month < ? ORDER BY year_month",
+        (table_name, _month_key(before)),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def compact_partitions(db_path: str, before: DateLike, table_name: str = "sales", vacuum: bool = True) -> List[str]:
+    """
+    Rewrites every partition for months before `before` in (sale_date, transaction_id)
+    order, so date-range reads touch contiguous pages, and marks it compacted. VACUUM then
+    returns the freed pages to the file system. Returns the compacted partitions.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        partitions = [
+            partition for partition in _old_partitions(conn, table_name, before)
+            if not conn.execute(
+                f"SELECT compacted FROM {PARTITION_TABLE} WHERE partition_table = ?", (partition,)
+            ).fetchone()[0]
+        ]
+        conn.execute(f"DROP VIEW IF EXISTS {table_name}")
+        for partition in partitions:
+            staging = f"{partition}__compact"
+            _create_like(conn, partition, staging)
+            conn.execute(f"INSERT INTO {staging} SELECT * FROM {partition} ORDER BY sale_date, transaction_id")
+            conn.execute(f"DROP TABLE {partition}")
+            conn.execute(f"ALTER TABLE {staging} RENAME TO {partition}")
+            _create_partition_indexes(conn, partition)
+            conn.execute(f"UPDATE {PARTITION_TABLE} SET compacted = 1 WHERE partition_table = ?", (partition,))
+        _rebuild_view(conn, table_name)
+        conn.commit()
+        if vacuum and partitions:
+            conn.execute("VACUUM")
+    except Exception as e:
+        conn.rollback()
+        logging.error("Error occurred while compacting partitions of '%s': %s", table_name, e)
+        raise
+    finally:
+        conn.close()
+    logging.info("Compacted %s partitions of '%s'.", len(partitions), table_name)
+    return partitions
+
+
+def archive_partitions(
+    db_path: str,
+    archive_path: str,
+    before: DateLike,
+    table_name: str = "sales",
+    vacuum: bool = True,
+) -> List[str]:
+    """
+    Moves every partition for months before `before` into the SQLite file `archive_path`
+    and drops it from the `table_name` view. Archived partitions stay listed in the registry
+    (location = archive path) and can be read with `load_table_from_db(archive_path, partition)`.
+    Returns the archived partitions.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        partitions = _old_partitions(conn, table_name, before)
+        conn.execute(f"DROP VIEW IF EXISTS {table_name}")
+        for partition in partitions:
+            conn.execute(f"DROP TABLE IF EXISTS archive.{partition}")
+            _create_like(conn, partition, partition, schema="archive")
+            conn.execute(f"INSERT INTO archive.{partition} SELECT * FROM main.{partition}")
+            conn.execute(f"DROP TABLE main.{partition}")
+            conn.execute(
+                f"UPDATE {PARTITION_TABLE} SET location = ? WHERE partition_table = ?", (archive_path, partition)
+            )
+        _rebuild_view(conn, table_name)
+        conn.commit()
+        conn.execute("DETACH DATABASE archive")
+        if vacuum and partitions:
+            conn.execute("VACUUM")
+    except Exception as e:
+        conn.rollback()
+        logging.error("Error occurred while archiving partitions of '%s': %s", table_name, e)
+        raise
+    finally:
+        conn.close()
+    logging.info("Archived %s partitions of '%s' to %s.", len(partitions), table_name, archive_path)
+    return partitions
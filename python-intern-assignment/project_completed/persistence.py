@@ -0,0 +1,114 @@
+import logging
+import sqlite3
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import pandas as pd
+from connections import write_transaction
+
+WATERMARK_TABLE = "metrics_watermark"
+
+
+class MetricTable(NamedTuple):
+    """
+    Schema of one metrics table: (column, SQL type) pairs for the keys and values.
+    `ranked` tables get a 1-based `rank` column taken from the order of the input rows.
+    """
+    table: str
+    metric: str
+    keys: Tuple[Tuple[str, str], ...]
+    values: Tuple[Tuple[str, str], ...]
+    ranked: bool = False
+
+    @property
+    def key_names(self) -> List[str]:
+        return [name for name, _ in self.keys]
+
+    @property
+    def value_names(self) -> List[str]:
+        return [name for name, _ in self.values]
+
+    @property
+    def columns(self) -> List[str]:
+        return (["rank"] if self.ranked else []) + self.key_names + self.value_names
+
+
+METRIC_TABLES = [
+    MetricTable("metrics_sales_by_branch", "branch_sales",
+                (("branch_id", "INTEGER"),), (("total_sales", "REAL"),)),
+    MetricTable("metrics_top_articles", "top_articles",
+                (("article_name", "TEXT"),), (("total_quantity", "INTEGER"),), ranked=True),
+    MetricTable("metrics_monthly_revenue", "monthly_revenue",
+                (("year", "INTEGER"), ("month", "INTEGER")), (("revenue", "REAL"),)),
+    MetricTable("metrics_category_revenue", "category_revenue",
+                (("category", "TEXT"),), (("revenue", "REAL"),)),
+]
+
+
+def create_table_sql(spec: MetricTable, table_name: Optional[str] = None) -> str:
+    columns = [f"{name} {sql_type} NOT NULL" for name, sql_type in spec.keys + spec.values]
+    if spec.ranked:
+        columns.insert(0, "rank INTEGER NOT NULL UNIQUE")
+    columns.append(f"PRIMARY KEY ({', '.join(spec.key_names)})")
+    return f"CREATE TABLE {table_name or spec.table} ({', '.join(columns)})"
+
+
+def metric_rows(spec: MetricTable, metric: Union[pd.Series, pd.DataFrame]) -> List[tuple]:
+    """
+    Turns a metric Series (keys in the index) or a DataFrame (keys then values, by position)
+    into rows for the table. Rows with missing keys are dropped, as pandas groupby does.
+    """
+    df = metric.reset_index() if isinstance(metric, pd.Series) else metric.reset_index(drop=True)
+    expected = len(spec.keys) + len(spec.values)
+    if len(df.columns) != expected:
+        raise ValueError(
+            f"{spec.metric} has {len(df.columns)} columns, expected {expected} "
+            f"({', '.join(spec.key_names + spec.value_names)})"
+        )
+    df = df.set_axis(spec.key_names + spec.value_names, axis=1)
+    df = df.dropna(subset=spec.key_names)
+    if spec.ranked:
+        df.insert(0, "rank", range(1, len(df) + 1))
+    # tolist() converts numpy scalars to plain Python values that sqlite3 can bind
+    return list(zip(*(df[column].tolist() for column in spec.columns)))
+
+
+def write_metric_tables(
+    conn: sqlite3.Connection,
+    metrics: Dict[str, Union[pd.Series, pd.DataFrame]],
+    tables: List[MetricTable] = METRIC_TABLES,
+    reset_watermark: bool = True,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Writes every metric into its typed table in one transaction (a savepoint, if the
+    caller has one open, which the caller then commits). Each table is filled as a
+    staging copy with executemany and then swapped in, so readers only ever see the old
+    or the new complete set of metrics. A full write also clears the incremental
+    watermark (unless `reset_watermark=False`, for tables the incremental refresh does
+    not maintain), because the tables no longer match what the watermark describes.
+    Returns rows written and seconds spent per table.
+    """
+    prepared = [(spec, metric_rows(spec, metrics[spec.metric])) for spec in tables if spec.metric in metrics]
+    report = {}
+    with write_transaction(conn, "write_metric_tables"):
+        for spec, rows in prepared:
+            started = time.perf_counter()
+            staging = f"{spec.table}__staging"
+            conn.execute(f"DROP TABLE IF EXISTS {staging}")
+            conn.execute(create_table_sql(spec, staging))
+            conn.executemany(
+                f"INSERT INTO {staging} ({', '.join(spec.columns)}) "
+                f"VALUES ({', '.join('?' * len(spec.columns))})",
+                rows,
+            )
+            conn.execute(f"DROP TABLE IF EXISTS {spec.table}")
+            conn.execute(f"ALTER TABLE {staging} RENAME TO {spec.table}")
+            report[spec.table] = {"rows": len(rows), "seconds": time.perf_counter() - started}
+        has_watermark = reset_watermark and conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (WATERMARK_TABLE,)
+        ).fetchone()
+        if has_watermark:
+            conn.execute(f"DELETE FROM {WATERMARK_TABLE}")
+    for table, stats in report.items():
+        logging.info("Wrote %s rows to %s in %.4fs.", stats['rows'], table, stats['seconds'])
+    return report
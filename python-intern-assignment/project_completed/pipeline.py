@@ -0,0 +1,139 @@
+import logging
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import pandas as pd
+
+
+class Stage(NamedTuple):
+    """
+    One processing step. A stage that `consumes` its input is handed the frame itself and
+    may modify it in place; any other stage gets a copy-on-write view, so the caller's
+    frame is never changed behind its back.
+    """
+    name: str
+    func: Callable[[Any], Any]
+    consumes: bool = False
+
+
+class StageReport(NamedTuple):
+    name: str
+    seconds: float
+    traced_peak_bytes: int  # peak Python/NumPy allocations while the stage ran (tracemalloc)
+    peak_rss_bytes: int  # process peak RSS after the stage (never goes down)
+    output_bytes: int  # deep size of the frame or series the stage produced
+
+
+def frame_bytes(value: Any) -> int:
+    """
+    Deep memory size of a frame, a series or a dict of them (0 for anything else).
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sum(frame_bytes(item) for item in value.values())
+    return 0
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+def enable_copy_on_write():
+    """
+    Turns on pandas copy-on-write for the rest of the process. The option is process-global,
+    so it is set once (by the entry point, or the first pipeline run) and never switched back:
+    toggling it per run would race with pipelines running on other threads, and frames
+    created under copy-on-write would later be used without it.
+    """
+    if not pd.options.mode.copy_on_write:
+        pd.set_option("mode.copy_on_write", True)
+
+
+class Pipeline:
+    """
+    Runs stages one after another and owns the intermediate results: each stage's input is
+    released as soon as the stage returns, so only the current frame stays alive. Stages run
+    with pandas copy-on-write enabled (see `enable_copy_on_write`). With `track_memory=True` a StageReport per stage is
+    collected in `reports`.
+    """
+
+    def __init__(self, stages: List[Stage], track_memory: bool = False):
+        self.stages = list(stages)
+        self.track_memory = track_memory
+        self.reports: List[StageReport] = []
+
+    def run(self, data: Any = None) -> Any:
+        """
+        Runs the pipeline. To let the pipeline own the fact table, start with a stage that
+        loads it (and pass no data) rather than passing in a frame the caller keeps.
+        """
+        self.reports = []
+        enable_copy_on_write()
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            current = data
+            del data  # the pipeline holds the only reference from here on
+            for stage in self.stages:
+                current = self._run_stage(stage, current)
+            return current
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+    def _run_stage(self, stage: Stage, current: Any) -> Any:
+        if not stage.consumes and isinstance(current, (pd.DataFrame, pd.Series)):
+            current = current.copy(deep=False)  # lazy under copy-on-write; copied only if written
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        result = stage.func(current)
+        del current  # release the input before the next stage runs
+        if self.track_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            report = StageReport(
+                stage.name, time.perf_counter() - started, max(peak - baseline, 0),
+                _peak_rss_bytes(), frame_bytes(result),
+            )
+            self.reports.append(report)
+            logging.info(
+                "Stage '%s': %.3fs, traced peak %s bytes, output %s bytes.",
+                stage.name, report.seconds, report.traced_peak_bytes, report.output_bytes,
+            )
+        return result
+
+    def format_report(self) -> str:
+        """
+        Returns the stage reports as a plain-text table.
+        """
+        lines = [f"{'stage':<20}{'seconds':>10}{'traced peak MB':>16}{'peak RSS MB':>13}{'output MB':>11}"]
+        for report in self.reports:
+            lines.append(
+                f"{report.name:<20}{report.seconds:>10.3f}{report.traced_peak_bytes / 1e6:>16.2f}"
+                f"{report.peak_rss_bytes / 1e6:>13.1f}{report.output_bytes / 1e6:>11.2f}"
+            )
+        return "\n".join(lines)
+
+
+def peak_memory_ratio(reports: List[StageReport], fact_stage: Optional[str] = None) -> float:
+    """
+    Returns the peak memory of the stages after `fact_stage` (default: the first stage) in
+    copies of that stage's output: the fact table itself plus the most any later stage
+    allocated on top of it. About 1.0 means the stages worked without copying the table.
+    """
+    names = [report.name for report in reports]
+    if not reports or (fact_stage is not None and fact_stage not in names):
+        return 0.0
+    position = names.index(fact_stage) if fact_stage is not None else 0
+    base = max(reports[position].output_bytes, 1)
+    extra = max((report.traced_peak_bytes for report in reports[position + 1:]), default=0)
+    return (base + extra) / base
@@ -0,0 +1,121 @@
+import functools
+import logging
+from typing import TYPE_CHECKING, List, Optional
+
+from cli import METRIC_NAMES
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from dag import TaskGraph
+
+# The pipeline as a task graph: the two dimension loads run side by side, the sales table
+# is streamed once into partial totals for every metric, each metric is then finished on
+# its own, and the finished metrics are written together. Task functions live at module
+# level so the graph also runs on a process pool; pandas is imported inside them, as in
+# cli.py, so importing this module stays cheap.
+
+
+def load_dimension(db_path: str, table: str) -> "pd.DataFrame":
+    from data_loading import load_table_from_db
+    return load_table_from_db(db_path, table)
+
+def explore_dimension(table: str, df: "pd.DataFrame"):
+    from analysis import explore_dataframe
+    return explore_dataframe(df, table.capitalize())
+
+def sales_totals(
+    db_path: str,
+    metric_names: List[str],
+    chunksize: int,
+    compact: bool,
+    explore_rows: Optional[int],
+    df_articles: "pd.DataFrame",
+) -> tuple:
+    """
+    Streams the sales table once and returns the unordered per-group totals of each metric,
+    in the order of `metric_names`. `explore_rows` also profiles up to that many sales rows.
+    """
+    import pandas as pd
+    from analysis import BUSINESS_METRICS, partial_metrics_from_chunks, required_sales_columns
+    from data_loading import load_table_in_chunks
+    from processing import process_sales_chunks
+    chunks = load_table_in_chunks(
+        db_path, "sales", chunksize=chunksize, columns=required_sales_columns(metric_names), compact=compact
+    )
+    profile = None
+    if explore_rows:
+        from profiling import StreamingProfile, profiled_chunks
+        profile = StreamingProfile("Sales", sample_size=1_000, max_rows=explore_rows)
+        chunks = profiled_chunks(chunks, profile)
+    metrics = [metric for metric in BUSINESS_METRICS if metric.name in metric_names]
+    totals = partial_metrics_from_chunks(process_sales_chunks(chunks, df_articles, compact=compact), metrics)
+    if profile is not None:
+        result = profile.result()
+        logging.info(
+            "%s profile (%s rows, complete=%s):\n%s",
+            result.name, result.rows_profiled, result.complete, result.columns,
+        )
+    return tuple(totals[name] if totals else pd.Series(dtype=float) for name in metric_names)
+
+def finish_metric(name: str, totals: "pd.Series") -> "pd.Series":
+    from analysis import BUSINESS_METRICS, finish_metrics
+    metric = next(metric for metric in BUSINESS_METRICS if metric.name == name)
+    return finish_metrics({name: totals} if len(totals) else None, [metric])[name]
+
+def persist_metrics(db_path: str, metric_names: List[str], *results: "pd.Series"):
+    """
+    Writes the finished metrics in one transaction (SQLite has a single writer, so one
+    task per table would only queue up on the write lock).
+    """
+    from connections import connect
+    from persistence import write_metric_tables
+    conn = connect(db_path)
+    try:
+        return write_metric_tables(conn, dict(zip(metric_names, results)))
+    finally:
+        conn.close()
+
+def build_pipeline(
+    db_path: str,
+    metric_names: Optional[List[str]] = None,
+    chunksize: int = 100_000,
+    compact: bool = False,
+    explore_rows: Optional[int] = None,
+    persist: bool = True,
+) -> "TaskGraph":
+    """
+    Returns the pipeline graph. Loads and metrics are cacheable: the loads are keyed on the
+    change marker of their table, so a rerun against unchanged tables skips straight to
+    persisting. Profiling and persisting always run.
+    """
+    from cache import FrameCache
+    from dag import Task, TaskGraph
+    metric_names = list(metric_names or METRIC_NAMES)
+    marker = functools.partial(FrameCache.table_marker, db_path)
+    tasks = [
+        Task(table, functools.partial(load_dimension, db_path, table), cache=True,
+             fingerprint=functools.partial(marker, table))
+        for table in ("branches", "articles")
+    ]
+    if explore_rows:
+        tasks += [
+            Task(f"explore_{table}", functools.partial(explore_dimension, table), inputs=(table,))
+            for table in ("branches", "articles")
+        ]
+    tasks.append(Task(
+        "sales_totals",
+        functools.partial(sales_totals, db_path, metric_names, chunksize, compact, explore_rows),
+        inputs=("articles",),
+        outputs=tuple(f"{name}_totals" for name in metric_names),
+        cache=not explore_rows,  # a cache hit would skip the sales profile
+        fingerprint=functools.partial(marker, "sales"),
+    ))
+    tasks += [
+        Task(name, functools.partial(finish_metric, name), inputs=(f"{name}_totals",), cache=True)
+        for name in metric_names
+    ]
+    if persist:
+        tasks.append(Task(
+            "persist", functools.partial(persist_metrics, db_path, metric_names), inputs=tuple(metric_names)
+        ))
+    return TaskGraph(tasks)
@@ -1,29 +1,131 @@
 import pandas as pd
 import logging
-from utils import setup_logging
-setup_logging(log_file="processing.log")
+from typing import Iterable, Iterator, List, Optional
+from dates import derive_date_columns
+from instrumentation import instrumented
+from joins import DimensionIndex, join_dimension
+from pipeline import Pipeline, Stage
 
-def merge_sales_with_articles(df_sales: pd.DataFrame, df_articles: pd.DataFrame) -> pd.DataFrame:
+# Raw sales columns each processed column is derived from (article columns come in through article_id)
+DERIVED_COLUMN_SOURCES = {
+    "total_amount": ["quantity", "article_id"],
+    "price": ["article_id"],
+    "article_name": ["article_id"],
+    "category": ["article_id"],
+    "sale_date": ["sale_date"],
+    "month": ["sale_date"],
+    "year": ["sale_date"],
+    "year_month": ["sale_date"],
+    "iso_week": ["sale_date"],
+}
+
+def _build_index(dimension: pd.DataFrame, key: str) -> Optional[DimensionIndex]:
+    try:
+        return DimensionIndex(dimension, key)
+    except (KeyError, ValueError) as e:
+        logging.warning("Cannot index dimension on '%s', using a hash merge instead: %s", key, e)
+        return None
+
+def _shared_columns(fact: pd.DataFrame, dimension: pd.DataFrame, key: str) -> List[str]:
+    return [column for column in dimension.columns if column != key and column in fact.columns]
+
+@instrumented
+def merge_sales_with_articles(
+    df_sales: pd.DataFrame,
+    df_articles: pd.DataFrame,
+    article_index: Optional[DimensionIndex] = None,
+) -> pd.DataFrame:
     """
     Merges sales DataFrame with articles DataFrame to include article details in sales data.
+    Article columns are gathered through a DimensionIndex (pass one in to reuse it across
+    chunks); a regular merge is only used when article_id is not unique in df_articles or
+    when both frames have another column of the same name (the merge suffixes those).
     """
     try:
         logging.info("Merging sales with articles.")
-        return df_sales.merge(df_articles, on='article_id', how='left')
+        index = article_index or _build_index(df_articles, "article_id")
+        if index is None or _shared_columns(df_sales, df_articles, "article_id"):
+            return df_sales.merge(df_articles, on='article_id', how='left')
+        merged, _ = join_dimension(df_sales, index)
+        return merged
     except Exception as e:
-        logging.error(f"Error occurred while merging sales with articles: {e}")
+        logging.error("Error occurred while merging sales with articles: %s", e)
         return pd.DataFrame()  # Return an empty DataFrame on error
 
-def add_total_and_date_columns(sales_with_price: pd.DataFrame) -> pd.DataFrame:
+@instrumented
+def add_branch_details(
+    df_sales: pd.DataFrame,
+    df_branches: pd.DataFrame,
+    branch_index: Optional[DimensionIndex] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Adds branch attributes (e.g. city) to the sales DataFrame through a branch_id lookup.
+    """
+    try:
+        index = branch_index or _build_index(df_branches, "branch_id")
+        if index is None:
+            branch_columns = ["branch_id"] + (columns or [c for c in df_branches.columns if c != "branch_id"])
+            return df_sales.merge(df_branches[branch_columns], on="branch_id", how="left")
+        joined, _ = join_dimension(df_sales, index, columns)
+        return joined
+    except Exception as e:
+        logging.error("Error occurred while adding branch details: %s", e)
+        return df_sales
+
+@instrumented
+def add_total_and_date_columns(sales_with_price: pd.DataFrame, compact: bool = False, date_format: str = None) -> pd.DataFrame:
     """
-    Adds total amount and date-related columns to the sales DataFrame.
+    Adds total amount and date-related columns (year, month, a yyyymm `year_month` key and
+    `iso_week`) to the sales DataFrame. Dates are parsed with `date_format`, or a detected
+    fixed format, once per distinct value.
+    With `compact=True` the date columns use the smallest integer types.
     """
     try:
-        sales_with_price["total_amount"] = sales_with_price["quantity"] * sales_with_price["price"]
-        sales_with_price["sale_date"] = pd.to_datetime(sales_with_price["sale_date"])
-        sales_with_price["month"] = sales_with_price["sale_date"].dt.month
-        sales_with_price["year"] = sales_with_price["sale_date"].dt.year
+        price = sales_with_price["price"]
+        if price.dtype == "float32":
+            price = price.astype("float64")  # totals are summed, so keep them at full precision
+        sales_with_price["total_amount"] = sales_with_price["quantity"] * price
+        if "sale_date" not in sales_with_price.columns:
+            return sales_with_price  # date columns were not loaded for this projection
+        date_columns = derive_date_columns(sales_with_price["sale_date"], date_format)
+        if compact and date_columns["year"].dtype.kind == "i":
+            date_columns = date_columns.astype(
+                {"year": "int16", "month": "int8", "year_month": "int32", "iso_week": "int8"}
+            )
+        for column in date_columns.columns:
+            sales_with_price[column] = date_columns[column]
         return sales_with_price
     except Exception as e:
-        logging.error(f"Error occurred while adding total and date columns: {e}")
-        return sales_with_price
\ No newline at end of file
+        logging.error("Error occurred while adding total and date columns: %s", e)
+        return sales_with_price
+
+@instrumented
+def build_processing_pipeline(
+    df_articles: pd.DataFrame,
+    compact: bool = False,
+    article_index: Optional[DimensionIndex] = None,
+    track_memory: bool = False,
+) -> Pipeline:
+    """
+    Returns the sales processing stages (article lookup, then totals and date columns) as a
+    Pipeline. Both stages consume their input: the merged frame shares the raw sales columns
+    and the augmented frame is built on the merged one, so only one copy of the fact data is alive.
+    """
+    index = article_index or _build_index(df_articles, "article_id")
+    return Pipeline(
+        [
+            Stage("merge_articles", lambda sales: merge_sales_with_articles(sales, df_articles, index), consumes=True),
+            Stage("totals_and_dates", lambda merged: add_total_and_date_columns(merged, compact=compact), consumes=True),
+        ],
+        track_memory=track_memory,
+    )
+
+@instrumented
+def process_sales_chunks(sales_chunks: Iterable[pd.DataFrame], df_articles: pd.DataFrame, compact: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Merges and augments streamed sales chunks one at a time, so the full sales table is never held in memory.
+    """
+    pipeline = build_processing_pipeline(df_articles, compact=compact)  # article index built once, reused for every chunk
+    for chunk in sales_chunks:
+        yield pipeline.run(chunk)
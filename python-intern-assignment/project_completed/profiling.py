@@ -0,0 +1,195 @@
+import logging
+import time
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from sketches import HyperLogLog
+
+
+class DataProfile(NamedTuple):
+    """
+    Structured result of profiling a frame or a stream of chunks. `columns` has one row per
+    column; `complete` is False when the row or time budget stopped profiling early.
+    """
+    name: str
+    rows_profiled: int
+    complete: bool
+    seconds: float
+    columns: pd.DataFrame
+    sample: Optional[pd.DataFrame]
+
+
+class _ColumnStats:
+    """
+    Single-pass statistics for one column. Chunks are combined with the parallel form of
+    Welford's algorithm, so the mean and variance are as accurate as a two-pass computation.
+    """
+
+    def __init__(self, dtype):
+        self.dtype = str(dtype)
+        self.count = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.numeric = pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        self.ordered = self.numeric or pd.api.types.is_datetime64_any_dtype(dtype)
+        self.distinct = HyperLogLog(precision=10)
+
+    def update(self, series: pd.Series):
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+        self.distinct.add(values.to_numpy())
+        if self.ordered:
+            low, high = values.min(), values.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if self.numeric:
+            array = values.to_numpy(dtype=np.float64)
+            count, mean = len(array), float(array.mean())
+            m2 = float(((array - mean) ** 2).sum())
+            total = self.count + count
+            delta = mean - self.mean
+            self.mean += delta * count / total
+            self.m2 += m2 + delta * delta * self.count * count / total
+        self.count += len(values)
+
+    def as_row(self) -> Dict[str, object]:
+        rows = self.count + self.nulls
+        return {
+            "dtype": self.dtype,
+            "count": self.count,
+            "nulls": self.nulls,
+            "null_fraction": self.nulls / rows if rows else np.nan,
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": self.mean if self.numeric and self.count else np.nan,
+            "std": np.sqrt(self.m2 / (self.count - 1)) if self.numeric and self.count > 1 else np.nan,
+            "approx_distinct": round(self.distinct.estimate()) if self.count else 0,
+            "distinct_rel_error": self.distinct.relative_error,
+        }
+
+
+class StreamingProfile:
+    """
+    Profiles chunks as they go by: counts, nulls, min/max, mean/std and approximate
+    cardinality per column, plus an optional uniform reservoir sample of `sample_size` rows.
+    Profiling stops (and the result is marked incomplete) once `max_rows` rows or
+    `max_seconds` of profiling time have been spent.
+    """
+
+    def __init__(
+        self,
+        name: str = "DataFrame",
+        sample_size: int = 0,
+        max_rows: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+        seed: int = 0,
+    ):
+        self.name = name
+        self.sample_size = sample_size
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.rows = 0
+        self.seconds = 0.0
+        self.complete = True
+        self._columns: Dict[str, _ColumnStats] = {}
+        self._rng = np.random.default_rng(seed)
+        self._sample: Optional[pd.DataFrame] = None
+        self._sample_keys = np.empty(0)
+
+    def _budget_left(self) -> Optional[int]:
+        if self.max_seconds is not None and self.seconds >= self.max_seconds:
+            return 0
+        if self.max_rows is not None:
+            return max(self.max_rows - self.rows, 0)
+        return None
+
+    def update(self, chunk: pd.DataFrame) -> bool:
+        """
+        Adds a chunk to the profile. Returns False once the budget is used up.
+        """
+        left = self._budget_left()
+        if left == 0:
+            self.complete = False
+            return False
+        started = time.perf_counter()
+        if left is not None and len(chunk) > left:
+            chunk = chunk.iloc[:left]
+            self.complete = False
+        for column in chunk.columns:
+            if column not in self._columns:
+                self._columns[column] = _ColumnStats(chunk[column].dtype)
+            self._columns[column].update(chunk[column])
+        if self.sample_size:
+            self._update_sample(chunk)
+        self.rows += len(chunk)
+        self.seconds += time.perf_counter() - started
+        return self.complete
+
+    def _update_sample(self, chunk: pd.DataFrame):
+        """
+        Bottom-k reservoir: every row gets a random key and the rows with the smallest keys
+        are kept, which is a uniform sample of everything seen so far.
+        """
+        keys = self._rng.random(len(chunk))
+        if len(self._sample_keys) >= self.sample_size:
+            wanted = keys < self._sample_keys.max()  # only rows that can enter the reservoir
+            chunk, keys = chunk[wanted], keys[wanted]
+        sample = chunk if self._sample is None else pd.concat([self._sample, chunk])
+        keys = np.concatenate([self._sample_keys, keys])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size - 1)[: self.sample_size]
+            sample, keys = sample.iloc[keep], keys[keep]
+        self._sample, self._sample_keys = sample, keys
+
+    def result(self) -> DataProfile:
+        columns = pd.DataFrame.from_dict(
+            {name: stats.as_row() for name, stats in self._columns.items()}, orient="index"
+        )
+        return DataProfile(self.name, self.rows, self.complete, self.seconds, columns, self._sample)
+
+
+def profiled_chunks(chunks: Iterable[pd.DataFrame], profile: StreamingProfile) -> Iterator[pd.DataFrame]:
+    """
+    Passes chunks through unchanged while feeding them to `profile`, so profiling happens
+    alongside loading instead of as extra passes over the data.
+    """
+    for chunk in chunks:
+        if profile.complete:
+            profile.update(chunk)
+        yield chunk
+
+
+def profile_dataframe(
+    df: pd.DataFrame,
+    name: str = "DataFrame",
+    sample_size: int = 0,
+    max_rows: Optional[int] = None,
+    max_seconds: Optional[float] = None,
+    chunksize: int = 100_000,
+    seed: int = 0,
+) -> DataProfile:
+    """
+    Profiles an in-memory frame. With `max_rows` smaller than the frame, a uniform random
+    sample of that many rows is profiled instead of the first rows.
+    """
+    sampled = max_rows is not None and len(df) > max_rows
+    if sampled:
+        df = df.sample(n=max_rows, random_state=seed)
+    profile = StreamingProfile(name, sample_size, max_seconds=max_seconds, seed=seed)
+    for start in range(0, len(df), chunksize):
+        if not profile.update(df.iloc[start:start + chunksize]):
+            break
+    result = profile.result()
+    if sampled:
+        result = result._replace(complete=False)
+    logging.info(
+        "Profiled %s rows of %s in %.3fs%s.",
+        result.rows_profiled, name, result.seconds, "" if result.complete else " (budget reached)",
+    )
+    return result
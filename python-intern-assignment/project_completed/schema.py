@@ -0,0 +1,137 @@
+import logging
+import re
+import sqlite3
+from typing import Dict, List, NamedTuple, Tuple
+
+from analysis import METRIC_QUERIES
+
+# Version of INDEXES; bump it whenever INDEXES changes. ensure_indexes migrates by comparing
+# each index definition, so this only records (in PRAGMA user_version) which version a
+# database was last migrated to, and logs when an older one is brought up to date
+SCHEMA_VERSION = 1
+
+# Prefixes of the indexes this module owns; anything else in the database is left alone
+MANAGED_PREFIXES = ("ix_", "ux_")
+
+
+class IndexSpec(NamedTuple):
+    name: str
+    table: str
+    columns: Tuple[str, ...]
+    unique: bool = False
+
+
+INDEXES = [
+    # keys on the dimension tables (the tables come from to_sql and have no primary keys)
+    IndexSpec("ux_articles_article_id", "articles", ("article_id",), unique=True),
+    IndexSpec("ux_branches_branch_id", "branches", ("branch_id",), unique=True),
+    # fact table: date window / branch filters and the article join
+    IndexSpec("ix_sales_date_branch", "sales", ("sale_date", "branch_id", "article_id", "quantity")),
+    IndexSpec("ix_sales_article", "sales", ("article_id", "quantity")),
+    IndexSpec("ix_sales_branch", "sales", ("branch_id", "article_id", "quantity")),
+    IndexSpec("ix_sales_transaction", "sales", ("transaction_id",)),
+    # covering indexes for the analysis.py metric queries
+    IndexSpec("ix_articles_id_price", "articles", ("article_id", "price")),
+    IndexSpec("ix_articles_name", "articles", ("article_name", "article_id")),
+    IndexSpec("ix_articles_category", "articles", ("category", "article_id", "price")),
+    IndexSpec("ix_branches_city", "branches", ("city", "branch_id")),
+]
+
+# "SCAN sales" since SQLite 3.36, "SCAN TABLE sales [AS s]" before; index scans
+# ("... USING [COVERING] INDEX ix") do not match
+_TABLE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def _existing_tables(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+
+def _existing_indexes(conn: sqlite3.Connection) -> Dict[str, str]:
+    return {
+        name: sql for name, sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        )
+    }
+
+
+def _create_sql(spec: IndexSpec) -> str:
+    unique = "UNIQUE " if spec.unique else ""
+    return f"CREATE {unique}INDEX {spec.name} ON {spec.table} ({', '.join(spec.columns)})"
+
+
+def ensure_indexes(conn: sqlite3.Connection, analyze: bool = True) -> Dict[str, str]:
+    """
+    Creates or migrates the managed indexes so they match INDEXES. Safe to run repeatedly:
+    existing matching indexes are kept, changed ones are rebuilt and obsolete managed ones dropped.
+    Statistics are refreshed with ANALYZE only when an index changed.
+    Returns what happened to each index ("created", "rebuilt", "kept", "dropped", "skipped").
+    """
+    actions = {}
+    tables = set(_existing_tables(conn))
+    existing = _existing_indexes(conn)
+    wanted = {spec.name for spec in INDEXES}
+    stored_version = schema_version(conn)
+    if stored_version != SCHEMA_VERSION:
+        logging.info("Migrating indexes from schema version %s to %s.", stored_version, SCHEMA_VERSION)
+    with conn:
+        for name in existing:
+            if name.startswith(MANAGED_PREFIXES) and name not in wanted:
+                conn.execute(f"DROP INDEX {name}")
+                actions[name] = "dropped"
+        for spec in INDEXES:
+            if spec.table not in tables:
+                actions[spec.name] = "skipped"
+                continue
+            sql = _create_sql(spec)
+            # the non-unique fallback for duplicate keys (below) also counts as up to date
+            if existing.get(spec.name) in (sql, _create_sql(spec._replace(unique=False))):
+                actions[spec.name] = "kept"
+                continue
+            if spec.name in existing:
+                conn.execute(f"DROP INDEX {spec.name}")
+            try:
+                conn.execute(sql)
+            except sqlite3.IntegrityError:
+                # duplicate keys in a dimension table: keep a plain index so lookups stay fast
+                logging.warning(
+                    "Duplicate keys in %s.%s; creating %s as non-unique.", spec.table, spec.columns, spec.name
+                )
+                conn.execute(_create_sql(spec._replace(unique=False)))
+            actions[spec.name] = "rebuilt" if spec.name in existing else "created"
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    changed = sum(action in ("created", "rebuilt", "dropped") for action in actions.values())
+    if analyze and changed:
+        conn.execute("ANALYZE")
+        conn.commit()
+    logging.info("Index check done: %s changed, schema version %s.", changed, SCHEMA_VERSION)
+    return actions
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def explain_query(conn: sqlite3.Connection, query: str, params=()) -> List[str]:
+    """
+    Returns the EXPLAIN QUERY PLAN steps for a query.
+    """
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def explain_metric_queries(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """
+    Returns the query plan of every metric query in analysis.METRIC_QUERIES.
+    """
+    return {name: explain_query(conn, query) for name, query in METRIC_QUERIES.items()}
+
+
+def find_table_scans(plans: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """
+    Returns, per query, the tables read with a full table scan rather than through an index.
+    """
+    scans = {}
+    for name, steps in plans.items():
+        tables = [match.group(1) for step in steps for match in [_TABLE_SCAN.match(step)] if match]
+        if tables:
+            scans[name] = tables
+    return scans
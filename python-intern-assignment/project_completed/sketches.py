@@ -0,0 +1,417 @@
+import io
+import json
+import logging
+import math
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+SKETCH_TABLE = "metrics_sketches"
+
+
+def _hash64(values) -> np.ndarray:
+    """
+    Deterministic 64-bit hashes (the same in every process), so sketches built in
+    different runs or workers can be merged. Integral floats hash like the same int64, as
+    an id column comes back as float64 from a chunk that has NULLs in it.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iub":
+        values = values.astype(np.int64)
+    elif values.dtype.kind in "mM":
+        values = values.view(np.int64)
+    elif values.dtype.kind == "f":
+        hashes = pd.util.hash_array(values, categorize=False)
+        with np.errstate(invalid="ignore"):
+            integral = (np.abs(values) < 2.0 ** 63) & (values == np.trunc(values))
+        hashes[integral] = pd.util.hash_array(values[integral].astype(np.int64), categorize=False)
+        return hashes
+    else:
+        values = values.astype(object)
+    return pd.util.hash_array(values, categorize=False)
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """
+    Number of significant bits of each uint64 (0 for 0), exact for the full 64-bit range.
+    """
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, np.frexp(high)[1] + 32, np.frexp(low)[1]).astype(np.int64)
+
+
+def _pack(kind: str, params: Dict[str, float], arrays: Dict[str, np.ndarray]) -> bytes:
+    buffer = io.BytesIO()
+    params = np.array([[name, repr(value)] for name, value in params.items()], dtype=str)
+    np.savez(buffer, kind=np.array(kind), params=params, **arrays)
+    return buffer.getvalue()
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch with 2**precision registers (4 KiB at the default 12).
+    The relative standard error is 1.04 / sqrt(2**precision), about 1.6% by default.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values) -> "HyperLogLog":
+        values = np.asarray(values)
+        hashes = _hash64(values[~pd.isna(values)])  # NULL is not a distinct value, as in COUNT(DISTINCT)
+        if not len(hashes):
+            return self
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - _bit_length(rest) + 1  # position of the first 1-bit
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return float(raw)
+
+    def to_bytes(self) -> bytes:
+        return _pack("hll", {"precision": self.precision}, {"registers": self.registers})
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (KLL): a stack of compactors whose capacities shrink by 2/3
+    per level below the top. Each compaction sorts a full level and promotes every other
+    item to the next level with twice the weight. Memory is about 3k items; the normalized
+    rank error is about 2.3 / k**0.97 (1.3% at k=200) with 99% confidence.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compact(self, level: int):
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0))  # a new top level also shrinks the capacities below it
+        items = np.sort(self.levels[level])
+        keep = items[-1:] if len(items) % 2 else items[:0]  # an odd item stays on this level
+        pairs = items[: len(items) - len(keep)]
+        self.levels[level] = keep
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], pairs[self._rng.integers(0, 2)::2]])
+
+    def _compress(self):
+        while True:
+            full = [level for level, items in enumerate(self.levels) if len(items) > self._capacity(level)]
+            if not full:
+                return
+            self._compact(full[0])
+
+    def add(self, values) -> "KLLSketch":
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    @property
+    def rank_error(self) -> float:
+        return 2.296 / self.k ** 0.9723
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantile(self, q: float) -> float:
+        if not self.n:
+            return float("nan")
+        values, cumulative = self._weighted()
+        position = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return float(values[min(position, len(values) - 1)])
+
+    def rank(self, value: float) -> float:
+        """
+        Estimated fraction of the added values that are <= value.
+        """
+        if not self.n:
+            return float("nan")
+        values, cumulative = self._weighted()
+        position = np.searchsorted(values, value, side="right")
+        return float(cumulative[position - 1] / cumulative[-1]) if position else 0.0
+
+    def to_bytes(self) -> bytes:
+        arrays = {f"level_{i}": items for i, items in enumerate(self.levels)}
+        return _pack("kll", {"k": self.k, "n": self.n}, arrays)
+
+
+class CountMinSketch:
+    """
+    Frequency sketch: estimates never undercount and overcount by at most `epsilon` times
+    the total weight with probability 1 - `delta`. Keeps the `max_candidates` keys with the
+    largest estimates so heavy hitters can be listed.
+    """
+
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01, max_candidates: int = 100, seed: int = 0):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = int(math.ceil(math.e / epsilon))
+        self.depth = int(math.ceil(math.log(1 / delta)))
+        self.max_candidates = max_candidates
+        self.seed = seed
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.total = 0
+        self.candidates: Dict[object, None] = {}
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2 ** 63, self.depth, dtype=np.uint64) | np.uint64(1)
+        self._offsets = rng.integers(0, 2 ** 63, self.depth, dtype=np.uint64)
+
+    def _columns(self, keys) -> np.ndarray:
+        hashes = _hash64(keys)
+        with np.errstate(over="ignore"):
+            mixed = hashes[None, :] * self._multipliers[:, None] + self._offsets[:, None]
+        return ((mixed >> np.uint64(32)) % np.uint64(self.width)).astype(np.intp)
+
+    def add(self, keys, weights=None) -> "CountMinSketch":
+        keys = np.asarray(keys)
+        weights = np.ones(len(keys), dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+        columns = self._columns(keys)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], weights)
+        self.total += int(weights.sum())
+        self._update_candidates(pd.unique(keys))
+        return self
+
+    def _update_candidates(self, new_keys):
+        keys = list(self.candidates) + [key for key in new_keys if key not in self.candidates]
+        if not keys:
+            return
+        estimates = self.estimate(keys)
+        keep = np.argsort(-estimates, kind="stable")[: self.max_candidates]
+        self.candidates = {keys[i]: None for i in sorted(keep)}
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        if (other.width, other.depth, other.seed) != (self.width, self.depth, self.seed):
+            raise ValueError("Cannot merge Count-Min sketches with different shapes or seeds")
+        self.table += other.table
+        self.total += other.total
+        self._update_candidates(list(other.candidates))
+        return self
+
+    @property
+    def max_overcount(self) -> float:
+        return self.epsilon * self.total
+
+    def estimate(self, keys) -> np.ndarray:
+        columns = self._columns(np.asarray(keys))
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def heavy_hitters(self, fraction: float = 0.01) -> pd.Series:
+        """
+        Candidate keys whose estimated weight is at least `fraction` of the total, largest first.
+        """
+        keys = list(self.candidates)
+        estimates = pd.Series(self.estimate(keys) if keys else [], index=keys, dtype=np.int64)
+        return estimates[estimates >= fraction * self.total].sort_values(ascending=False, kind="stable")
+
+    def to_bytes(self) -> bytes:
+        params = {"epsilon": self.epsilon, "delta": self.delta, "max_candidates": self.max_candidates,
+                  "seed": self.seed, "total": self.total}
+        candidates = np.array([str(key) for key in self.candidates], dtype=str)  # keys come back as text
+        return _pack("cms", params, {"table": self.table, "candidates": candidates})
+
+
+def sketch_from_bytes(payload: bytes):
+    """
+    Restores a HyperLogLog, KLLSketch or CountMinSketch written with `to_bytes()`.
+    """
+    data = np.load(io.BytesIO(payload))
+    kind = str(data["kind"])
+    params = {name: float(value) for name, value in data["params"]}
+    if kind == "hll":
+        sketch = HyperLogLog(int(params["precision"]))
+        sketch.registers = data["registers"].copy()
+    elif kind == "kll":
+        sketch = KLLSketch(int(params["k"]))
+        sketch.n = int(params["n"])
+        sketch.levels = [data[f"level_{i}"].copy() for i in range(len(data.files) - 2)]
+    elif kind == "cms":
+        sketch = CountMinSketch(params["epsilon"], params["delta"], int(params["max_candidates"]), int(params["seed"]))
+        sketch.table = data["table"].copy()
+        sketch.total = int(params["total"])
+        sketch.candidates = {str(key): None for key in data["candidates"].tolist()}
+    else:
+        raise ValueError(f"Unknown sketch kind: {kind}")
+    return sketch
+
+
+#sketches of the processed sales data
+
+def build_sketches(sales_with_price: pd.DataFrame, sketches: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+    """
+    Adds a processed sales frame (or chunk) to the approximate-analytics sketches:
+    distinct articles per branch, distinct transactions, transaction value quantiles
+    (overall and per branch) and article quantities for heavy hitters. Sketches are kept as
+    {name: {group: sketch}} (group None for overall) and updated in place when passed in.
+    """
+    sketches = sketches if sketches is not None else {}
+    by_branch = sales_with_price.groupby("branch_id", observed=True).indices
+    for branch, positions in by_branch.items():
+        rows = sales_with_price.iloc[positions]
+        sketches.setdefault("distinct_articles", {}).setdefault(branch, HyperLogLog()).add(rows["article_id"])
+        sketches.setdefault("transaction_value", {}).setdefault(branch, KLLSketch()).add(rows["total_amount"])
+    sketches.setdefault("distinct_transactions", {}).setdefault(None, HyperLogLog()).add(
+        sales_with_price["transaction_id"]
+    )
+    sketches.setdefault("transaction_value", {}).setdefault(None, KLLSketch()).add(sales_with_price["total_amount"])
+    articles = sales_with_price.dropna(subset=["article_name"])
+    sketches.setdefault("article_quantity", {}).setdefault(None, CountMinSketch()).add(
+        articles["article_name"].astype(str).to_numpy(), articles["quantity"].to_numpy()
+    )
+    return sketches
+
+
+def merge_sketches(left: Dict[str, dict], right: Dict[str, dict]) -> Dict[str, dict]:
+    """
+    Merges two sketch sets (e.g. from two days, shards or chunks) into `left`.
+    """
+    for name, groups in right.items():
+        for group, sketch in groups.items():
+            target = left.setdefault(name, {})
+            if group in target:
+                target[group].merge(sketch)
+            else:
+                target[group] = sketch
+    return left
+
+
+def summarize_sketches(sketches: Dict[str, dict], quantiles=(0.5, 0.95), heavy_hitter_fraction: float = 0.01) -> Dict[str, pd.DataFrame]:
+    """
+    Turns a sketch set into result tables, each with its error bound: distinct counts with a
+    one-standard-error range, quantiles with the normalized rank error and heavy hitters
+    with the maximum overcount.
+    """
+    results = {}
+    if "distinct_articles" in sketches:
+        rows = {
+            branch: (sketch.estimate(), sketch.estimate() * sketch.relative_error)
+            for branch, sketch in sketches["distinct_articles"].items()
+        }
+        results["distinct_articles_by_branch"] = pd.DataFrame.from_dict(
+            rows, orient="index", columns=["estimate", "std_error"]
+        ).rename_axis("branch_id").sort_index()
+    if "distinct_transactions" in sketches:
+        sketch = sketches["distinct_transactions"][None]
+        results["distinct_transactions"] = pd.DataFrame(
+            {"estimate": [sketch.estimate()], "std_error": [sketch.estimate() * sketch.relative_error]}
+        )
+    if "transaction_value" in sketches:
+        rows = []
+        for group, sketch in sketches["transaction_value"].items():
+            rows.extend((group, q, sketch.quantile(q), sketch.rank_error) for q in quantiles)
+        frame = pd.DataFrame(rows, columns=["branch_id", "quantile", "value", "rank_error"])
+        results["transaction_value_quantiles"] = frame.sort_values(
+            ["branch_id", "quantile"], na_position="first", ignore_index=True
+        )
+    if "article_quantity" in sketches:
+        sketch = sketches["article_quantity"][None]
+        hitters = sketch.heavy_hitters(heavy_hitter_fraction)
+        results["heavy_hitter_articles"] = pd.DataFrame(
+            {"estimate": hitters, "max_overcount": sketch.max_overcount}
+        ).rename_axis("article_name")
+    return results
+
+
+def approximate_metrics(chunks: Iterable[pd.DataFrame], **summary_options) -> Dict[str, pd.DataFrame]:
+    """
+    Approximate-analytics mode: builds the sketches over processed sales chunks and
+    returns the summarized results with their error bounds.
+    """
+    sketches: Dict[str, dict] = {}
+    for chunk in chunks:
+        build_sketches(chunk, sketches)
+    return summarize_sketches(sketches, **summary_options)
+
+
+#storage in the metrics database
+
+def save_sketches(conn: sqlite3.Connection, sketches: Dict[str, dict], scope: str):
+    """
+    Stores every sketch under `scope` (e.g. a day or a shard), replacing earlier ones.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SKETCH_TABLE} (
+            name TEXT NOT NULL,
+            group_key TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (name, group_key, scope)
+        )
+    """)
+    now = datetime.now().isoformat(timespec="seconds")
+    rows = [
+        (name, _group_to_text(group), scope, sketch.to_bytes(), now)
+        for name, groups in sketches.items()
+        for group, sketch in groups.items()
+    ]
+    with conn:
+        conn.executemany(f"INSERT OR REPLACE INTO {SKETCH_TABLE} VALUES (?, ?, ?, ?, ?)", rows)
+    logging.info("Saved %s sketches for scope '%s'.", len(rows), scope)
+
+
+def _group_to_text(group) -> str:
+    return json.dumps(group.item() if isinstance(group, np.generic) else group)
+
+
+def _group_from_text(text: str):
+    return json.loads(text)
+
+
+def load_sketches(conn: sqlite3.Connection, scopes: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Loads the stored sketches of the given scopes (default: all) merged into one set.
+    """
+    query = f"SELECT name, group_key, payload FROM {SKETCH_TABLE}"
+    params: list = []
+    if scopes is not None:
+        query += f" WHERE scope IN ({', '.join('?' * len(scopes))})"
+        params = list(scopes)
+    merged: Dict[str, dict] = {}
+    for name, group_key, payload in conn.execute(query + " ORDER BY scope", params):
+        merge_sketches(merged, {name: {_group_from_text(group_key): sketch_from_bytes(payload)}})
+    return merged
@@ -0,0 +1,177 @@
+import logging
+import os
+import sqlite3
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = {
+    # category -> (share of the assortment, median price)
+    "Electronics": (0.2, 250.0),
+    "Accessories": (0.3, 25.0),
+    "Furniture": (0.15, 180.0),
+    "Home": (0.2, 40.0),
+    "Toys": (0.15, 20.0),
+}
+CITIES = ["Brussels", "Antwerp", "Ghent", "Bruges", "Leuven", "Liege", "Namur", "Mechelen", "Hasselt", "Mons"]
+SCHEMA = {
+    "branches": '"branch_id" INTEGER, "branch_name" TEXT, "city" TEXT',
+    "articles": '"article_id" INTEGER, "article_name" TEXT, "category" TEXT, "price" REAL',
+    "sales": '"transaction_id" INTEGER, "branch_id" INTEGER, "article_id" INTEGER, "quantity" INTEGER, "sale_date" TEXT',
+}
+FIRST_BRANCH_ID = 101
+FIRST_ARTICLE_ID = 1001
+FIRST_TRANSACTION_ID = 1
+SALES_BLOCK = 500_000  # sales rows generated (and inserted) per random stream
+
+
+def default_dimensions(sales_rows: int) -> Dict[str, int]:
+    """
+    Dimension sizes that grow slowly with the number of sales, as they do in a real chain.
+    """
+    return {
+        "articles": int(min(50_000, max(50, sales_rows // 200))),
+        "branches": int(min(1_000, max(5, sales_rows // 50_000))),
+    }
+
+
+def generate_branches(n_branches: int, rng: np.random.Generator) -> pd.DataFrame:
+    ids = np.arange(FIRST_BRANCH_ID, FIRST_BRANCH_ID + n_branches)
+    cities = np.array(CITIES)[rng.integers(0, len(CITIES), n_branches)]
+    return pd.DataFrame({
+        "branch_id": ids,
+        "branch_name": [f"{city} Store {i - FIRST_BRANCH_ID + 1}" for city, i in zip(cities, ids)],
+        "city": cities,
+    })
+
+
+def generate_articles(n_articles: int, rng: np.random.Generator) -> pd.DataFrame:
+    names = list(CATEGORIES)
+    shares = np.array([CATEGORIES[name][0] for name in names])
+    category = rng.choice(len(names), size=n_articles, p=shares / shares.sum())
+    median_price = np.array([CATEGORIES[name][1] for name in names])[category]
+    price = np.round(np.round(median_price * rng.lognormal(0.0, 0.6, n_articles)).clip(1) - 0.01, 2)  # x.99 prices
+    ids = np.arange(FIRST_ARTICLE_ID, FIRST_ARTICLE_ID + n_articles)
+    return pd.DataFrame({
+        "article_id": ids,
+        "article_name": [f"Article {i}" for i in ids],
+        "category": np.array(names)[category],
+        "price": price,
+    })
+
+
+def article_weights(n_articles: int, rng: np.random.Generator, exponent: float = 1.1) -> np.ndarray:
+    """
+    Zipfian popularity: the article of rank r sells in proportion to 1 / r^exponent. Ranks
+    are shuffled so popularity does not follow the article id.
+    """
+    weights = 1.0 / np.arange(1, n_articles + 1) ** exponent
+    return rng.permutation(weights / weights.sum())
+
+
+def branch_weights(n_branches: int, rng: np.random.Generator, sigma: float = 0.8) -> np.ndarray:
+    """
+    Uneven branch sizes: lognormal weights, so a few flagship stores take much of the volume.
+    """
+    weights = rng.lognormal(0.0, sigma, n_branches)
+    return weights / weights.sum()
+
+
+def day_weights(days: pd.DatetimeIndex, amplitude: float = 0.3) -> np.ndarray:
+    """
+    Seasonal demand: a yearly wave peaking in late December, a rush in the run-up to
+    Christmas, a summer dip and busier Saturdays.
+    """
+    angle = 2 * np.pi * (days.dayofyear.to_numpy() - 355) / 365.25
+    weights = 1 + amplitude * np.cos(angle)
+    weights *= np.where((days.month == 12) & (days.day >= 10) & (days.day <= 24), 1.6, 1.0)
+    weights *= np.where(days.month.isin([7, 8]), 0.85, 1.0)
+    weights *= np.where(days.dayofweek == 5, 1.4, 1.0)
+    return weights / weights.sum()
+
+
+def generate_sales_chunk(
+    start: int,
+    rows: int,
+    article_ids: np.ndarray,
+    article_p: np.ndarray,
+    branch_ids: np.ndarray,
+    branch_p: np.ndarray,
+    days: np.ndarray,
+    day_p: np.ndarray,
+    seed: int,
+) -> pd.DataFrame:
+    """
+    Generates sales rows [start, start + rows) from a random stream derived from
+    (seed, start), so blocks can be generated independently and in any order.
+    """
+    rng = np.random.default_rng([seed, start])
+    return pd.DataFrame({
+        "transaction_id": np.arange(FIRST_TRANSACTION_ID + start, FIRST_TRANSACTION_ID + start + rows),
+        "branch_id": branch_ids[rng.choice(len(branch_ids), size=rows, p=branch_p)],
+        "article_id": article_ids[rng.choice(len(article_ids), size=rows, p=article_p)],
+        # mostly single items, with occasional bulk purchases
+        "quantity": rng.geometric(0.6, size=rows) + (rng.random(rows) < 0.05) * rng.integers(1, 10, rows),
+        "sale_date": days[rng.choice(len(days), size=rows, p=day_p)],
+    })
+
+
+def generate_database(
+    db_path: str,
+    sales_rows: int,
+    n_articles: Optional[int] = None,
+    n_branches: Optional[int] = None,
+    seed: int = 0,
+    start_date: str = "2023-01-01",
+    n_days: int = 730,
+) -> Dict[str, int]:
+    """
+    Writes a branches/articles/sales database with the same schema as data/retail_sales.db.
+    The output only depends on the arguments, so a given scale and seed always produce the
+    same data. Sales are written in blocks of SALES_BLOCK rows, so memory stays bounded at
+    any scale. An existing file at `db_path` is replaced.
+    Returns the number of rows per table.
+    """
+    sizes = default_dimensions(sales_rows)
+    n_articles = n_articles or sizes["articles"]
+    n_branches = n_branches or sizes["branches"]
+    rng = np.random.default_rng(seed)
+    branches = generate_branches(n_branches, rng)
+    articles = generate_articles(n_articles, rng)
+    article_p = article_weights(n_articles, rng)
+    branch_p = branch_weights(n_branches, rng)
+    calendar = pd.date_range(start_date, periods=n_days, freq="D")
+    day_p = day_weights(calendar)
+    days = calendar.strftime("%Y-%m-%d").to_numpy()
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        # a throwaway file being bulk loaded: no journal and no fsync
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        for table, columns in SCHEMA.items():
+            conn.execute(f'CREATE TABLE "{table}" ({columns})')
+        with conn:
+            for table, df in (("branches", branches), ("articles", articles)):
+                conn.executemany(
+                    f"INSERT INTO {table} VALUES ({', '.join('?' * len(df.columns))})",
+                    df.itertuples(index=False, name=None),
+                )
+        for offset in range(0, sales_rows, SALES_BLOCK):
+            rows = min(SALES_BLOCK, sales_rows - offset)
+            chunk = generate_sales_chunk(
+                offset, rows, articles["article_id"].to_numpy(), article_p,
+                branches["branch_id"].to_numpy(), branch_p, days, day_p, seed,
+            )
+            with conn:
+                conn.executemany(
+                    "INSERT INTO sales VALUES (?, ?, ?, ?, ?)",
+                    zip(*(chunk[column].tolist() for column in chunk.columns)),
+                )
+            logging.info("Generated %s of %s sales rows.", offset + rows, sales_rows)
+    finally:
+        conn.close()
+    return {"branches": n_branches, "articles": n_articles, "sales": sales_rows}
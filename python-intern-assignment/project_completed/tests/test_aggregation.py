@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from aggregation import Metric, compute_metrics, combine_metric_results, finalize_metric_results
+
+
+@pytest.fixture
+def sales_with_price():
+    return pd.DataFrame({
+        "branch_id": [2, 1, 2, 3, 1, 2],
+        "category": ["X", "Y", None, "X", "Y", "X"],
+        "year": [2023, 2023, 2024, 2023, 2024, 2023],
+        "month": [2, 1, 1, 2, 1, 1],
+        "quantity": [1, 2, 3, 4, 5, 6],
+        "total_amount": [10.5, 20.0, np.nan, 40.0, 50.25, 60.0],
+    })
+
+def test_compute_metrics_matches_groupby(sales_with_price):
+    """
+    Tests that every reducer returns the same Series as the equivalent pandas groupby.
+    """
+    metrics = [
+        Metric(f"{reducer}_{value}_{'_'.join(keys)}", keys, value, reducer)
+        for reducer in ("sum", "count", "min", "max", "mean")
+        for keys in (("branch_id",), ("category",), ("year", "month"))
+        for value in ("quantity", "total_amount")
+    ]
+    results = compute_metrics(sales_with_price, metrics)
+    for metric in metrics:
+        expected = sales_with_price.groupby(list(metric.keys))[metric.value].agg(metric.reducer)
+        pd.testing.assert_series_equal(results[metric.name], expected, check_dtype=False)
+
+def test_all_nan_groups_match_groupby():
+    df = pd.DataFrame({"branch_id": [1, 1, 2, 2], "total_amount": [np.nan, np.nan, 3.0, np.nan]})
+    for reducer in ("min", "max"):
+        result = compute_metrics(df, [Metric("m", ("branch_id",), "total_amount", reducer)])["m"]
+        pd.testing.assert_series_equal(result, df.groupby("branch_id")["total_amount"].agg(reducer), check_names=False)
+
+def test_integer_sums_keep_int_dtype(sales_with_price):
+    result = compute_metrics(sales_with_price, [Metric("q", ("branch_id",), "quantity")])["q"]
+    assert result.dtype == np.int64
+    assert result.loc[2] == 10
+
+def test_order_sorts_by_value(sales_with_price):
+    result = compute_metrics(sales_with_price, [Metric("top", ("branch_id",), "quantity", order="desc")])["top"]
+    assert list(result.index) == [2, 1, 3]
+
+def test_combine_metric_results_matches_single_pass(sales_with_price):
+    metrics = [
+        Metric("sum", ("year", "month"), "total_amount"),
+        Metric("max", ("category",), "quantity", "max"),
+        Metric("top", ("branch_id",), "quantity", order="desc"),
+    ]
+    totals = None
+    for chunk in (sales_with_price.iloc[:3], sales_with_price.iloc[3:]):
+        totals = combine_metric_results(metrics, totals, compute_metrics(chunk, metrics, finalize=False))
+    combined = finalize_metric_results(metrics, totals)
+    expected = compute_metrics(sales_with_price, metrics)
+    for metric in metrics:
+        pd.testing.assert_series_equal(combined[metric.name], expected[metric.name])
+
+def test_mean_cannot_be_combined(sales_with_price):
+    metrics = [Metric("avg", ("branch_id",), "quantity", "mean")]
+    partial = compute_metrics(sales_with_price, metrics, finalize=False)
+    with pytest.raises(ValueError):
+        combine_metric_results(metrics, partial, partial)
@@ -1,5 +1,6 @@
 import pandas as pd
-from analysis import sales_per_branch, get_top_articles, calculate_monthly_revenue, calculate_category_revenue,get_total_sales_per_branch,get_revenue_per_category,top5_selling_articles,monthly_sales_trend,sales_performance_by_city, save_metrics_to_db
+from analysis import BUSINESS_METRICS, sales_per_branch, get_top_articles, calculate_monthly_revenue, calculate_category_revenue,get_total_sales_per_branch,get_revenue_per_category,top5_selling_articles,monthly_sales_trend,sales_performance_by_city, save_metrics_to_db, calculate_metrics_from_chunks, required_sales_columns, calculate_all_metrics, calculate_business_metrics, calculate_metrics_sql
+from processing import merge_sales_with_articles, add_total_and_date_columns
 import pytest
 import sqlite3
 
@@ -74,6 +75,24 @@ def test_get_top_articles():
     assert result.index[1] == "B"
     assert result.iloc[1] == 10
 
+def test_top_articles_ties_match_sql():
+    """
+    Tied articles are ranked by name in the pandas paths, as `ORDER BY quantity DESC, a.article_name` does in SQL.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, category TEXT, price REAL)")
+    conn.execute("CREATE TABLE sales (transaction_id INTEGER, branch_id INTEGER, article_id INTEGER, quantity INTEGER, sale_date TEXT)")
+    names = [f"Article {i:02d}" for i in reversed(range(40))]  # enough rows for an unstable sort to reorder ties
+    quantities = [3 if i % 3 else 1 for i in range(40)]
+    conn.executemany("INSERT INTO articles VALUES (?, ?, 'X', 1.0)", list(enumerate(names)))
+    conn.executemany("INSERT INTO sales VALUES (?, 1, ?, ?, '2023-01-01')", [(i, i, q) for i, q in enumerate(quantities)])
+    expected = calculate_metrics_sql(conn, ["top_articles"])["top_articles"]
+    conn.close()
+    assert list(expected.index) == sorted(names, key=lambda name: (-quantities[names.index(name)], name))
+    sales_with_price = pd.DataFrame({"article_name": names, "quantity": quantities})
+    assert list(get_top_articles(sales_with_price).index) == list(expected.index)
+    assert list(calculate_all_metrics(sales_with_price, BUSINESS_METRICS[1:2])["top_articles"].index) == list(expected.index)
+
 def test_calculate_monthly_revenue():
     """
     Tests the calculation of monthly revenue.
@@ -156,6 +175,103 @@ def test_save_metrics_to_db(mock_conn):
     category_revenue = pd.DataFrame({"category": ["Category X"], "revenue": [200]})
 
     save_metrics_to_db(mock_conn, branch_sales, top_articles, monthly_revenue, category_revenue)
-   
 
-    
\ No newline at end of file
+
+def test_calculate_metrics_from_chunks():
+    """
+    Tests that combining per-chunk partial results matches the single-frame metrics.
+    """
+    sales_with_price = pd.DataFrame({
+        "branch_id": [1, 2, 1, 2, 3],
+        "article_name": ["A", "B", "A", "C", "B"],
+        "category": ["X", "Y", "X", "Y", "Y"],
+        "quantity": [1, 2, 3, 4, 5],
+        "total_amount": [10.0, 20.0, 30.0, 40.0, 50.0],
+        "year": [2023, 2023, 2023, 2024, 2024],
+        "month": [1, 1, 2, 1, 1],
+    })
+    chunks = [sales_with_price.iloc[:2], sales_with_price.iloc[2:4], sales_with_price.iloc[4:]]
+    result = calculate_metrics_from_chunks(chunks)
+
+    pd.testing.assert_series_equal(result["branch_sales"], sales_per_branch(sales_with_price))
+    pd.testing.assert_series_equal(result["monthly_revenue"], calculate_monthly_revenue(sales_with_price))
+    pd.testing.assert_series_equal(result["category_revenue"], calculate_category_revenue(sales_with_price))
+    assert result["top_articles"].to_dict() == get_top_articles(sales_with_price).to_dict()
+    assert result["top_articles"].index[0] == "B"
+
+
+def test_required_sales_columns():
+    """
+    Tests that metrics map back to the raw sales columns the loader has to read.
+    """
+    assert required_sales_columns(["branch_sales"]) == ["article_id", "branch_id", "quantity"]
+    assert required_sales_columns(["monthly_revenue"]) == ["article_id", "quantity", "sale_date"]
+    assert "transaction_id" not in required_sales_columns(["branch_sales", "top_articles", "monthly_revenue", "category_revenue"])
+
+
+def test_calculate_all_metrics():
+    """
+    Tests that the single-pass metrics match the individual metric functions.
+    """
+    sales_with_price = pd.DataFrame({
+        "branch_id": [1, 2, 1],
+        "article_name": ["A", "B", "A"],
+        "category": ["X", "Y", "X"],
+        "quantity": [1, 5, 3],
+        "total_amount": [10.0, 50.0, 30.0],
+        "year": [2023, 2023, 2024],
+        "month": [1, 2, 1],
+    })
+    result = calculate_all_metrics(sales_with_price)
+    pd.testing.assert_series_equal(result["branch_sales"], sales_per_branch(sales_with_price))
+    pd.testing.assert_series_equal(result["top_articles"], get_top_articles(sales_with_price))
+    pd.testing.assert_series_equal(result["monthly_revenue"], calculate_monthly_revenue(sales_with_price))
+    pd.testing.assert_series_equal(result["category_revenue"], calculate_category_revenue(sales_with_price))
+
+
+@pytest.fixture
+def retail_conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, category TEXT, price REAL)")
+    conn.execute("""
+        CREATE TABLE sales (
+            transaction_id INTEGER, branch_id INTEGER, article_id INTEGER,
+            quantity INTEGER, sale_date TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?)", [
+        (1, "Laptop", "Electronics", 899.99),
+        (2, "Mouse", "Accessories", 29.99),
+        (3, "Desk", "Furniture", 149.5),
+    ])
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (1, 101, 1, 1, "2025-06-17"),
+        (2, 102, 2, 3, "2025-06-30"),
+        (3, 101, 3, 2, "2025-07-01"),
+        (4, 103, 2, 7, "2025-12-14"),
+        (5, 102, 1, 2, "2024-12-31"),
+        (6, 101, 99, 4, "2025-07-02"),  # unknown article
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+def test_metric_backends_parity(retail_conn):
+    """
+    Tests that the pandas and sqlite backends return identical metrics.
+    """
+    sales = pd.read_sql_query("SELECT * FROM sales", retail_conn)
+    articles = pd.read_sql_query("SELECT * FROM articles", retail_conn)
+    processed = add_total_and_date_columns(merge_sales_with_articles(sales, articles))
+
+    from_pandas = calculate_business_metrics("pandas", sales_with_price=processed)
+    from_sqlite = calculate_business_metrics("sqlite", conn=retail_conn)
+    assert from_pandas.keys() == from_sqlite.keys()
+    for name in from_pandas:
+        # pandas derives year/month as int32, SQLite returns int64 keys; the values must match exactly
+        pd.testing.assert_series_equal(from_sqlite[name], from_pandas[name], check_index_type=False)
+
+def test_calculate_business_metrics_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        calculate_business_metrics("spark", sales_with_price=pd.DataFrame())
+
@@ -0,0 +1,23 @@
+from benchmarks.run import compare_to_baseline, run_suite
+
+
+def test_compare_to_baseline_flags_slowdowns_and_memory_growth():
+    baseline = {
+        "merge@1000": {"rows_per_second": 1000.0, "peak_rss_mb": 100.0},
+        "dates@1000": {"rows_per_second": 1000.0, "peak_rss_mb": 100.0},
+    }
+    results = {
+        "merge@1000": {"rows_per_second": 650.0, "peak_rss_mb": 100.0},
+        "dates@1000": {"rows_per_second": 800.0, "peak_rss_mb": 140.0},
+        "persist@1000": {"rows_per_second": 1.0, "peak_rss_mb": 999.0},  # no baseline: not compared
+    }
+    regressions = compare_to_baseline(results, baseline, threshold=0.3)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("merge@1000: throughput")
+    assert regressions[1].startswith("dates@1000: peak RSS")
+
+def test_run_suite_in_process(tmp_path):
+    results = run_suite([2_000], ["load_chunks", "metric_branch_sales", "persist"], str(tmp_path), isolate=False)
+    assert set(results) == {"load_chunks@2000", "metric_branch_sales@2000", "persist@2000"}
+    assert results["load_chunks@2000"]["rows"] == 2_000
+    assert all(result["peak_rss_mb"] > 0 for result in results.values())
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import cache
+from cache import FrameCache, ensure_change_tracking
+
+
+@pytest.fixture
+def tmp_dir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+@pytest.fixture
+def db_path(tmp_dir):
+    path = os.path.join(tmp_dir, "test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, price REAL)")
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?)", [(1, "A", 10.0), (2, None, 5.5)])
+    conn.commit()
+    conn.close()
+    return path
+
+def test_round_trip_keeps_dtypes_and_index(tmp_dir):
+    df = pd.DataFrame({
+        "id": np.arange(3, dtype=np.int32),
+        "amount": [1.5, np.nan, 3.0],
+        "name": ["a", None, "a"],
+        "when": pd.to_datetime(["2023-01-01", "2023-02-01", "2023-03-01"]),
+        "flag": [True, False, True],
+        "kind": pd.Categorical(["x", "y", "x"]),
+    })
+    series = df.groupby(["name", "kind"], observed=True)["amount"].sum()
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"))
+    frame_cache.put("frame", df)
+    frame_cache.put("series", series.to_frame())
+    pd.testing.assert_frame_equal(frame_cache.get("frame"), df)
+    pd.testing.assert_frame_equal(frame_cache.get("series"), series.to_frame(), check_index_type=False)
+
+def test_numeric_columns_are_memory_mapped(tmp_dir):
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"))
+    frame_cache.put("key", pd.DataFrame({"x": np.arange(1000.0)}))
+    loaded = frame_cache.get("key")
+    base = loaded["x"].to_numpy()
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+    loaded.loc[0, "x"] = -1.0  # copy-on-write mapping: the cached file is not changed
+    assert frame_cache.get("key").loc[0, "x"] == 0.0
+
+def test_load_table_skips_sqlite_when_warm(db_path, tmp_dir, monkeypatch):
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"))
+    cold = frame_cache.load_table(db_path, "articles", columns=["article_id", "article_name"])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("table should have been served from the cache")
+    monkeypatch.setattr(cache, "load_table_from_db", fail)
+    warm = FrameCache(os.path.join(tmp_dir, "cache")).load_table(
+        db_path, "articles", columns=["article_id", "article_name"]
+    )
+    pd.testing.assert_frame_equal(warm, cold)
+
+def test_changed_table_misses_cache(db_path, tmp_dir):
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"))
+    assert len(frame_cache.load_table(db_path, "articles")) == 2
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO articles VALUES (3, 'C', 1.0)")
+    conn.commit()
+    conn.close()
+    assert len(frame_cache.load_table(db_path, "articles")) == 3
+
+def test_tracked_marker_ignores_other_tables_but_not_own_changes(db_path):
+    conn = sqlite3.connect(db_path)
+    assert ensure_change_tracking(conn) == ["articles"]
+    before = FrameCache.table_marker(db_path, "articles")
+    conn.execute("CREATE TABLE metrics (value REAL)")
+    conn.execute("INSERT INTO metrics VALUES (1.0)")
+    conn.commit()
+    assert FrameCache.table_marker(db_path, "articles") == before
+    conn.execute("UPDATE articles SET price = 12.0 WHERE article_id = 1")
+    conn.commit()
+    updated = FrameCache.table_marker(db_path, "articles")
+    assert updated != before
+    conn.execute("ALTER TABLE articles ADD COLUMN category TEXT")
+    conn.close()
+    assert FrameCache.table_marker(db_path, "articles") != updated
+
+def test_in_place_update_misses_cache_without_tracking(db_path, tmp_dir):
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"))
+    assert frame_cache.load_table(db_path, "articles")["price"].tolist() == [10.0, 5.5]
+    time.sleep(0.01)  # make sure the file's mtime moves
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE articles SET price = 12.0 WHERE article_id = 1")
+    conn.commit()
+    conn.close()
+    assert frame_cache.load_table(db_path, "articles")["price"].tolist() == [12.0, 5.5]
+
+def test_cached_frame_and_invalidate(db_path, tmp_dir):
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"))
+    calls = []
+
+    def build():
+        calls.append(1)
+        return pd.DataFrame({"total": [15.5]})
+    for _ in range(2):
+        frame_cache.cached_frame("totals", db_path, ["articles"], build)
+    assert len(calls) == 1
+    assert frame_cache.invalidate("articles") == 1
+    frame_cache.cached_frame("totals", db_path, ["articles"], build)
+    assert len(calls) == 2
+
+def test_lru_eviction(tmp_dir):
+    df = pd.DataFrame({"x": np.arange(1000.0)})
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"), max_bytes=20_000)
+    frame_cache.put("a", df)
+    frame_cache.put("b", df)
+    frame_cache.get("a")  # "a" is now the most recently used
+    frame_cache.put("c", df)
+    assert frame_cache.get("b") is None
+    assert frame_cache.get("a") is not None
+    assert frame_cache.get("c") is not None
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+import cli
+from cli import build_parser, main
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def no_log_files(monkeypatch):
+    monkeypatch.setattr(cli, "setup_logging", lambda **kwargs: None)
+
+@pytest.fixture
+def db_path():
+    with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as tmp:
+        path = tmp.name
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE branches (branch_id INTEGER, branch_name TEXT, city TEXT)")
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, category TEXT, price REAL)")
+    conn.execute("""
+        CREATE TABLE sales (
+            transaction_id INTEGER, branch_id INTEGER, article_id INTEGER,
+            quantity INTEGER, sale_date TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO branches VALUES (?, ?, ?)", [(1, "North", "Berlin"), (2, "South", "Munich")])
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?)", [
+        (1, "Article A", "X", 10.0),
+        (2, "Article B", "Y", 5.5),
+    ])
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (i, i % 2 + 1, i % 2 + 1, i % 3 + 1, f"2023-{i % 12 + 1:02d}-01") for i in range(1, 61)
+    ])
+    conn.commit()
+    conn.close()
+    yield path
+    os.remove(path)
+
+def test_import_and_help_do_not_load_pandas_or_log_files(tmp_path):
+    code = (
+        "import sys, cli\n"
+        "try:\n    cli.main(['--help'])\nexcept SystemExit:\n    pass\n"
+        "import data_loading, processing, analysis, logging\n"
+        "print(logging.getLogger().handlers)\n"
+    )
+    check = "import sys, cli; cli.build_parser(); print('pandas' in sys.modules)"
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    help_run = subprocess.run([sys.executable, "-c", check], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert help_run.stdout.strip() == "False"
+    import_run = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert import_run.stdout.strip().endswith("[]")
+    assert not list(tmp_path.glob("*.log"))
+
+def test_metric_selection_is_validated():
+    parser = build_parser()
+    args = parser.parse_args(["metrics", "--metrics", "branch_sales,monthly_revenue"])
+    assert args.metrics == ["branch_sales", "monthly_revenue"]
+    with pytest.raises(SystemExit):
+        parser.parse_args(["metrics", "--metrics", "profit"])
+    with pytest.raises(SystemExit):
+        parser.parse_args(["load", "--backend", "sqlite"])
+
+@pytest.mark.parametrize("backend", ["pandas", "sqlite", "parallel"])
+def test_metrics_backends_write_the_same_output(db_path, tmp_path, backend):
+    output = tmp_path / backend
+    assert main(["metrics", "--db", db_path, "--backend", backend, "--workers", "1", "--output", str(output)]) == 0
+    branch_sales = pd.read_csv(output / "branch_sales.csv", index_col=0)
+    assert branch_sales["total_amount"].tolist() == pytest.approx([600.0, 330.0])
+    assert sorted(os.listdir(output)) == sorted(f"{name}.csv" for name in (
+        "branch_sales", "top_articles", "monthly_revenue", "category_revenue"
+    ))
+
+def test_run_persists_selected_metrics(db_path, tmp_path, capsys):
+    assert main(["run", "--db", db_path, "--metrics", "category_revenue", "--explore"]) == 0
+    assert "category_revenue" in capsys.readouterr().out
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    assert "metrics_category_revenue" in tables and "metrics_branch_sales" not in tables
+    with pytest.raises(SystemExit):
+        main(["persist", "--db", db_path, "--backend", "approximate"])
+
+def test_process_writes_processed_sales(db_path, tmp_path):
+    output = tmp_path / "processed.csv"
+    assert main(["process", "--db", db_path, "--chunksize", "25", "--output", str(output)]) == 0
+    processed = pd.read_csv(output)
+    assert len(processed) == 60 and "total_amount" in processed.columns
+
+def test_maintenance_commands(db_path, tmp_path, capsys):
+    assert main(["indexes", "--db", db_path]) == 0
+    assert "Table scans:" in capsys.readouterr().out
+    assert main(["partitions", "migrate", "--db", db_path]) == 0
+    assert main(["partitions", "list", "--db", db_path]) == 0
+    assert "sales_202312" in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        main(["partitions", "compact", "--db", db_path])  # --before is required
+    generated = str(tmp_path / "synthetic.db")
+    assert main(["generate", "--db", generated, "--rows", "1e3", "--seed", "1"]) == 0
+    conn = sqlite3.connect(generated)
+    assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 1000
+    conn.close()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from analysis import calculate_all_metrics
+from compact import compact_frame
+from processing import add_total_and_date_columns, merge_sales_with_articles
+
+
+def _sales(n=200):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "transaction_id": np.arange(n, dtype=np.int64),
+        "branch_id": rng.integers(101, 105, n),
+        "article_id": rng.integers(1, 4, n),
+        "quantity": rng.integers(1, 6, n),
+        "sale_date": rng.choice(["2025-06-17", "2025-07-01", "2025-12-14"], n).astype(object),
+    })
+
+ARTICLES = pd.DataFrame({
+    "article_id": [1, 2, 3],
+    "article_name": ["Laptop Pro", "Wireless Mouse", "Desk"],
+    "category": ["Electronics", "Accessories", "Furniture"],
+    "price": [899.99, 29.99, 149.5],
+})
+
+def test_compact_frame_downcasts_and_reports_savings():
+    compacted, saved = compact_frame(_sales().merge(ARTICLES, on="article_id"))
+    assert compacted["quantity"].dtype == np.int8
+    assert compacted["branch_id"].dtype == np.int8
+    assert compacted["transaction_id"].dtype == np.int16
+    assert compacted["article_name"].dtype == "category"
+    assert compacted["price"].dtype == np.float32
+    assert all(value > 0 for value in saved.values())
+
+def test_money_stays_float64_when_float32_is_not_exact():
+    df = pd.DataFrame({"price": [123456789.01, 1.0]})
+    compacted, _ = compact_frame(df)
+    assert compacted["price"].dtype == np.float64
+
+def test_unique_text_is_not_made_categorical():
+    compacted, _ = compact_frame(pd.DataFrame({"name": ["a", "b", "c"]}))
+    assert compacted["name"].dtype == object
+
+def test_compact_pipeline_gives_the_same_metrics():
+    sales = _sales()
+    regular = add_total_and_date_columns(merge_sales_with_articles(sales, ARTICLES))
+    compact_sales, _ = compact_frame(sales)
+    compact_articles, _ = compact_frame(ARTICLES, max_category_ratio=1.0)
+    compacted = add_total_and_date_columns(
+        merge_sales_with_articles(compact_sales, compact_articles), compact=True
+    )
+    assert compacted["month"].dtype == np.int8
+    assert compacted["total_amount"].dtype == np.float64
+    expected = calculate_all_metrics(regular)
+    result = calculate_all_metrics(compacted)
+    for name in expected:
+        pd.testing.assert_series_equal(result[name], expected[name], check_index_type=False, check_dtype=False)
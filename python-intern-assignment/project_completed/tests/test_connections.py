@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+from connections import ConnectionPool, connect, enable_wal
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "test.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE items (id INTEGER, name TEXT)")
+        conn.execute("INSERT INTO items VALUES (1, 'a')")
+        conn.commit()
+        conn.close()
+        yield path
+
+def test_enable_wal(db_path):
+    assert enable_wal(db_path) == "wal"
+    conn = connect(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA mmap_size").fetchone()[0] > 0
+    conn.close()
+
+def test_read_only_connection_rejects_writes(db_path):
+    conn = connect(db_path, read_only=True)
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO items VALUES (2, 'b')")
+    conn.close()
+
+def test_pool_reuses_connections(db_path):
+    with ConnectionPool(db_path, size=2) as pool:
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            assert second is first
+        with pool.connection() as a, pool.connection() as b:
+            assert a is not b
+
+def test_pool_rolls_back_uncommitted_work(db_path):
+    with ConnectionPool(db_path, size=1) as pool:
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items VALUES (2, 'b')")
+        with pool.connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+
+def test_pool_is_shared_across_threads(db_path):
+    counts = []
+    with ConnectionPool(db_path, size=2, read_only=True) as pool:
+        def worker():
+            with pool.connection() as conn:
+                counts.append(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0])
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert pool._opened <= 2
+    assert counts == [1] * 6
+
+def test_pool_blocks_when_exhausted(db_path):
+    import queue
+    with ConnectionPool(db_path, size=1) as pool:
+        with pool.connection():
+            with pytest.raises(queue.Empty):
+                with pool.connection(timeout=0.01):
+                    pass
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+from analysis import calculate_all_metrics
+from cube import Cube, build_cube, build_cube_from_chunks, save_cube
+from processing import merge_sales_with_articles, add_total_and_date_columns
+
+
+@pytest.fixture
+def frames():
+    articles = pd.DataFrame({
+        "article_id": [1, 2, 3],
+        "article_name": ["Laptop", "Mouse", "Desk"],
+        "category": ["Electronics", "Electronics", "Furniture"],
+        "price": [900.0, 25.0, 150.0],
+    })
+    branches = pd.DataFrame({"branch_id": [1, 2, 3], "branch_name": ["A", "B", "C"], "city": ["Berlin", "Berlin", "Hamburg"]})
+    sales = pd.DataFrame({
+        "transaction_id": range(1, 9),
+        "branch_id": [1, 2, 3, 1, 2, 3, 1, 3],
+        "article_id": [1, 2, 3, 2, 2, 1, 3, 2],
+        "quantity": [1, 4, 2, 3, 1, 2, 1, 5],
+        "sale_date": ["2023-01-03", "2023-01-09", "2023-01-21", "2023-02-02",
+                      "2023-02-14", "2023-02-15", "2023-03-01", "2023-03-07"],
+    })
+    processed = add_total_and_date_columns(merge_sales_with_articles(sales, articles))
+    return processed, articles, branches
+
+def test_cube_answers_business_metrics(frames):
+    processed, articles, branches = frames
+    cube = Cube(build_cube(processed), articles, branches)
+    expected = calculate_all_metrics(processed)
+    for name, result in cube.business_metrics().items():
+        pd.testing.assert_series_equal(result, expected[name], check_index_type=False, check_dtype=False)
+
+def test_chunked_cube_matches_single_pass(frames):
+    processed = frames[0]
+    chunked = build_cube_from_chunks([processed.iloc[:3], processed.iloc[3:]])
+    pd.testing.assert_frame_equal(chunked, build_cube(processed))
+
+def test_slice_dice_and_variance(frames):
+    """
+    Tests a filtered roll-up, and that averages and variances match the raw transactions.
+    """
+    processed, articles, branches = frames
+    cube = Cube(build_cube(processed), articles, branches)
+    berlin = cube.roll_up(["category"], where={"city": "Berlin", "month": [1, 2]})
+    assert berlin["revenue"].to_dict() == {"Electronics": 900.0 + 100.0 + 75.0 + 25.0}
+    overall = cube.roll_up([])
+    assert overall["revenue_var"].iloc[0] == pytest.approx(processed["total_amount"].var())
+    assert overall["avg_revenue"].iloc[0] == pytest.approx(processed["total_amount"].mean())
+    with pytest.raises(ValueError):
+        cube.roll_up(["weekday"])
+
+def test_saved_cube_answers_city_performance(frames):
+    processed, articles, branches = frames
+    conn = sqlite3.connect(":memory:")
+    articles.to_sql("articles", conn, index=False)
+    branches.to_sql("branches", conn, index=False)
+    save_cube(conn, build_cube(processed))
+    result = Cube.from_db(conn).sales_performance_by_city()
+    conn.close()
+    assert result["city"].tolist() == ["Hamburg", "Berlin"]  # ordered by revenue
+    assert result["num_branches"].tolist() == [1, 2]
+    by_city = processed.merge(branches, on="branch_id").groupby("city")["total_amount"]
+    assert result.set_index("city")["total_revenue"].to_dict() == by_city.sum().to_dict()
+    assert result.set_index("city")["avg_transaction_value"].to_dict() == pytest.approx(by_city.mean().to_dict())
@@ -0,0 +1,118 @@
+import functools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pytest
+from cache import FrameCache, ensure_change_tracking
+from dag import Task, TaskGraph
+from pipeline_graph import build_pipeline
+
+
+@pytest.fixture
+def tmp_dir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+@pytest.fixture
+def db_path(tmp_dir):
+    path = os.path.join(tmp_dir, "test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE branches (branch_id INTEGER, branch_name TEXT, city TEXT)")
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, category TEXT, price REAL)")
+    conn.execute("CREATE TABLE sales (transaction_id INTEGER, branch_id INTEGER, article_id INTEGER, quantity INTEGER, sale_date TEXT)")
+    conn.executemany("INSERT INTO branches VALUES (?, ?, ?)", [(1, "North", "Berlin"), (2, "South", "Munich")])
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?)", [(1, "Article A", "X", 10.0), (2, "Article B", "Y", 5.5)])
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (i, i % 2 + 1, i % 2 + 1, i % 3 + 1, f"2023-{i % 12 + 1:02d}-01") for i in range(1, 61)
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+def _frame(value: int) -> pd.DataFrame:
+    return pd.DataFrame({"value": [value]})
+
+def _add(calls: list, left: pd.DataFrame, right: pd.DataFrame) -> pd.Series:
+    calls.append("add")
+    return (left["value"] + right["value"]).rename("total")
+
+def test_independent_tasks_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)  # breaks unless both tasks run at the same time
+    wait = lambda: (barrier.wait(), _frame(1))[1]
+    graph = TaskGraph([
+        Task("a", wait),
+        Task("b", wait),
+        Task("sum", functools.partial(_add, []), inputs=("a", "b")),
+    ])
+    run = graph.run(max_workers=2)
+    assert run.outputs["sum"].tolist() == [2]
+    assert run.runs["sum"].started >= max(run.runs[name].started + run.runs[name].seconds for name in "ab")
+
+def test_unchanged_tasks_are_served_from_the_cache(tmp_dir):
+    calls, source = [], {"value": 1}
+    graph = TaskGraph([
+        Task("a", lambda: _frame(source["value"]), cache=True, fingerprint=lambda: source["value"]),
+        Task("b", lambda: _frame(10), cache=True),
+        Task("sum", lambda a, b: _add(calls, a, b), inputs=("a", "b"), cache=True),
+    ])
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"))
+    first = graph.run(cache=frame_cache)
+    second = graph.run(cache=frame_cache)
+    assert calls == ["add"]
+    assert all(run.cached for run in second.runs.values())
+    pd.testing.assert_series_equal(second.outputs["sum"], first.outputs["sum"])
+    source["value"] = 2  # a changed source reruns it and everything downstream
+    third = graph.run(cache=frame_cache)
+    assert calls == ["add", "add"] and third.outputs["sum"].tolist() == [12]
+    assert third.runs["b"].cached and not third.runs["a"].cached
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        TaskGraph([Task("a", len, inputs=("b",)), Task("b", len, inputs=("a",))])
+    with pytest.raises(ValueError, match="nobody produces"):
+        TaskGraph([Task("a", len, inputs=("missing",))])
+    with pytest.raises(ValueError, match="produced by both"):
+        TaskGraph([Task("a", len), Task("b", len, outputs=("a",))])
+
+def test_critical_path_follows_the_slowest_chain():
+    sleep = lambda seconds: (lambda *inputs: time.sleep(seconds))
+    graph = TaskGraph([
+        Task("fast", sleep(0.0)),
+        Task("slow", sleep(0.1)),
+        Task("join", sleep(0.0), inputs=("fast", "slow")),
+        Task("side", sleep(0.0), inputs=("fast",)),
+    ])
+    run = graph.run()
+    path, seconds = run.critical_path()
+    assert path == ["slow", "join"] and seconds >= 0.1
+    assert run.report().loc[["slow", "join"], "critical"].all()
+    assert not run.report().loc["side", "critical"]
+
+def test_failures_propagate():
+    graph = TaskGraph([Task("a", lambda: 1 / 0), Task("b", lambda a: a, inputs=("a",))])
+    with pytest.raises(ZeroDivisionError):
+        graph.run()
+
+def test_pipeline_graph_matches_the_streaming_metrics(db_path, tmp_dir):
+    from analysis import calculate_metrics_from_chunks
+    from data_loading import load_table_from_db, load_table_in_chunks
+    from processing import process_sales_chunks
+    chunks = load_table_in_chunks(db_path, "sales", chunksize=25)
+    expected = calculate_metrics_from_chunks(process_sales_chunks(chunks, load_table_from_db(db_path, "articles")))
+    conn = sqlite3.connect(db_path)
+    ensure_change_tracking(conn)  # as `run` does, so writing the metrics is not a change to sales
+    conn.close()
+    frame_cache = FrameCache(os.path.join(tmp_dir, "cache"))
+    graph = build_pipeline(db_path, chunksize=25)
+    for attempt in range(2):  # the second run comes from the cache, after the metrics were written
+        run = graph.run(cache=frame_cache)
+        for name, result in expected.items():
+            pd.testing.assert_series_equal(run.outputs[name], result, check_names=False)
+    assert run.runs["sales_totals"].cached and not run.runs["persist"].cached
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM metrics_category_revenue").fetchone()[0] == 2
+    conn.close()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dates import calendar_keys, derive_date_columns, detect_date_format, parse_dates
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["2025-06-17", "2025-12-14"], "%Y-%m-%d"),
+    (["2025-06-17 10:30:00"], "%Y-%m-%d %H:%M:%S"),
+    (["17.06.2025", "14.12.2025"], "%d.%m.%Y"),
+    (["01/02/2023", "06/12/2023"], "%m/%d/%Y"),  # ambiguous: month first, like pd.to_datetime
+    (["13/02/2023"], "%d/%m/%Y"),
+    (["not a date"], None),
+])
+def test_detect_date_format(values, expected):
+    assert detect_date_format(values) == expected
+
+def test_parse_dates_matches_pandas():
+    raw = pd.Series(["2025-06-17", "2025-06-17", None, "2024-02-29"] * 3, name="sale_date")
+    parsed = parse_dates(raw)
+    pd.testing.assert_series_equal(parsed, pd.to_datetime(raw))
+
+def test_ambiguous_slash_dates_keep_the_pandas_month():
+    raw = pd.Series(["01/02/2023", "03/04/2023"])
+    pd.testing.assert_series_equal(parse_dates(raw), pd.to_datetime(raw))
+    assert parse_dates(raw).dt.month.tolist() == [1, 3]
+
+def test_parse_dates_with_explicit_format():
+    parsed = parse_dates(pd.Series(["01/02/2025"]), date_format="%d/%m/%Y")
+    assert parsed.iloc[0] == pd.Timestamp("2025-02-01")
+
+def test_calendar_keys_match_dt_accessors():
+    """
+    Tests year, month, yyyymm and ISO week over several year boundaries.
+    """
+    dates = pd.Series(pd.date_range("1999-12-20", "2027-01-10", freq="D"))
+    keys = calendar_keys(dates)
+    iso = dates.dt.isocalendar()
+    assert (keys["year"] == dates.dt.year).all()
+    assert (keys["month"] == dates.dt.month).all()
+    assert (keys["year_month"] == dates.dt.year * 100 + dates.dt.month).all()
+    assert (keys["iso_week"] == iso["week"].astype(int)).all()
+    assert keys["year_month"].dtype == np.int32
+
+def test_derive_date_columns_handles_missing_dates():
+    result = derive_date_columns(pd.Series(["2025-01-05", None, "2025-01-05"], name="sale_date"))
+    assert list(result.columns) == ["sale_date", "year", "month", "year_month", "iso_week"]
+    assert result["year_month"].tolist()[0] == 202501
+    assert result["iso_week"].tolist()[2] == 1
+    assert pd.isna(result.loc[1, "sale_date"]) and pd.isna(result.loc[1, "year"])
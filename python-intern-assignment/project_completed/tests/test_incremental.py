@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+import pytest
+from incremental import get_watermark, refresh_metrics_incremental
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as tmp:
+        path = tmp.name
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, category TEXT, price REAL)")
+    conn.execute("""
+        CREATE TABLE sales (
+            transaction_id INTEGER, branch_id INTEGER, article_id INTEGER,
+            quantity INTEGER, sale_date TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?)", [
+        (1, "Article A", "X", 10.0),
+        (2, "Article B", "Y", 5.0),
+    ])
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (1, 1, 1, 2, "2023-01-01"),
+        (2, 2, 2, 1, "2023-01-02"),
+    ])
+    conn.commit()
+    conn.close()
+    yield path
+    os.remove(path)
+
+def _read(db_path, query):
+    conn = sqlite3.connect(db_path)
+    try:
+        return pd.read_sql_query(query, conn)
+    finally:
+        conn.close()
+
+def test_refresh_folds_only_new_rows(db_path):
+    """
+    Tests that a second run only processes rows after the watermark and adds them to the totals.
+    """
+    first = refresh_metrics_incremental(db_path)
+    assert first == {"rows_processed": 2, "watermark": 2, "full_rebuild": True}
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (3, 1, 2, 10, "2023-02-01"),
+        (4, 3, 1, 1, "2023-02-02"),
+    ])
+    conn.commit()
+    assert get_watermark(conn) == 2
+    conn.close()
+
+    second = refresh_metrics_incremental(db_path)
+    assert second == {"rows_processed": 2, "watermark": 4, "full_rebuild": False}
+
+    branches = _read(db_path, "SELECT * FROM metrics_sales_by_branch ORDER BY branch_id")
+    assert branches["total_sales"].tolist() == [70.0, 5.0, 10.0]
+    monthly = _read(db_path, "SELECT * FROM metrics_monthly_revenue ORDER BY year, month")
+    assert monthly["revenue"].tolist() == [25.0, 60.0]
+    top = _read(db_path, "SELECT * FROM metrics_top_articles")
+    assert top["article_name"].tolist() == ["Article B", "Article A"]
+    assert top["total_quantity"].tolist() == [11, 3]
+
+    third = refresh_metrics_incremental(db_path)
+    assert third == {"rows_processed": 0, "watermark": 4, "full_rebuild": False}
+
+def test_refresh_rebuilds_tables_without_keys(db_path):
+    """
+    Tests that metric tables written by a full save (no primary keys) trigger a rebuild.
+    """
+    refresh_metrics_incremental(db_path)
+    conn = sqlite3.connect(db_path)
+    pd.DataFrame({"branch_id": [1], "total_sales": [999.0]}).to_sql(
+        "metrics_sales_by_branch", conn, if_exists="replace", index=False
+    )
+    conn.close()
+    result = refresh_metrics_incremental(db_path)
+    assert result["full_rebuild"]
+    branches = _read(db_path, "SELECT * FROM metrics_sales_by_branch ORDER BY branch_id")
+    assert branches["total_sales"].tolist() == [20.0, 5.0]
+
+def test_refresh_by_sale_date(db_path):
+    refresh_metrics_incremental(db_path, watermark_column="sale_date")
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO sales VALUES (3, 1, 1, 1, '2023-01-03')")
+    conn.commit()
+    conn.close()
+    result = refresh_metrics_incremental(db_path, watermark_column="sale_date")
+    assert result == {"rows_processed": 1, "watermark": "2023-01-03", "full_rebuild": False}
+    categories = _read(db_path, "SELECT * FROM metrics_category_revenue ORDER BY category")
+    assert categories["revenue"].tolist() == [30.0, 5.0]
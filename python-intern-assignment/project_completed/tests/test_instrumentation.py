@@ -0,0 +1,74 @@
+import json
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+import instrumentation
+from instrumentation import REGISTRY, RUNS_TABLE, instrumented, stage
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    REGISTRY.clear()
+    yield
+    instrumentation.disable()
+    REGISTRY.clear()
+
+@instrumented
+def double(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat([df, df])
+
+@instrumented(name="chunks")
+def chunks(n: int, size: int):
+    for start in range(0, n, size):
+        yield pd.DataFrame({"x": np.arange(start, min(start + size, n))})
+
+@instrumented
+def fail():
+    raise ValueError("boom")
+
+def test_disabled_records_nothing():
+    frame = pd.DataFrame({"x": [1, 2]})
+    assert len(double(frame)) == 4
+    assert sum(len(chunk) for chunk in chunks(10, 3)) == 10
+    assert REGISTRY.records == []
+    assert double.__name__ == "double"
+
+def test_records_rows_bytes_and_generators():
+    instrumentation.enable()
+    double(pd.DataFrame({"x": np.arange(100)}))
+    assert sum(len(chunk) for chunk in chunks(10, 3)) == 10
+    with pytest.raises(ValueError):
+        fail()
+    first, generated, failed = REGISTRY.records
+    assert first.stage.endswith("double") and (first.rows_in, first.rows_out) == (100, 200)
+    assert first.bytes_out >= 200 * 8 and first.cpu_seconds >= 0
+    assert generated.stage == "chunks" and generated.rows_out == 10 and generated.rows_in is None
+    assert failed.rows_out is None and failed.peak_memory_delta is None
+
+def test_nested_peak_memory_reaches_the_outer_stage():
+    instrumentation.enable(track_memory=True)
+    with stage("outer") as outer:
+        with stage("inner"):
+            block = np.ones(2_000_000)  # 16 MB, freed before the outer stage ends
+            del block
+        outer.add_output(pd.Series([1, 2, 3]))
+    inner, outer_record = REGISTRY.records
+    assert inner.peak_memory_delta >= 16_000_000
+    assert outer_record.peak_memory_delta >= inner.peak_memory_delta
+    assert outer_record.rows_out == 3
+
+def test_outputs_json_summary_table_and_profile():
+    instrumentation.enable(profile=True)
+    for _ in range(3):
+        double(pd.DataFrame({"x": [1.0]}))
+    document = json.loads(REGISTRY.to_json())
+    assert document["run_id"] == REGISTRY.run_id and len(document["records"]) == 3
+    summary = REGISTRY.summary()
+    assert summary.iloc[0]["calls"] == 3 and summary.iloc[0]["rows_out"] == 6
+    assert "concat" in REGISTRY.profile_report(summary.index[0])
+    conn = sqlite3.connect(":memory:")
+    REGISTRY.save(conn)
+    REGISTRY.save(conn)
+    assert conn.execute(f"SELECT COUNT(*), COUNT(DISTINCT run_id) FROM {RUNS_TABLE}").fetchone() == (6, 1)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from joins import DimensionIndex, join_dimension
+
+
+@pytest.fixture
+def sales():
+    return pd.DataFrame({
+        "transaction_id": [1, 2, 3, 4, 5],
+        "article_id": [1002, 1001, 1009, 1002, 1003],
+        "quantity": [1, 2, 3, 4, 5],
+    })
+
+@pytest.mark.parametrize("article_ids, expected_kind", [
+    ([1001, 1002, 1003], "dense"),
+    ([1001, 1002, 10 ** 9], "sorted"),
+    (["1001", "1002", "1003"], "hash"),
+])
+def test_join_matches_left_merge(sales, article_ids, expected_kind):
+    """
+    Tests every index kind against a regular left merge, including an unmatched key.
+    """
+    articles = pd.DataFrame({
+        "article_id": article_ids,
+        "article_name": ["Mouse", "Laptop", "Desk"],
+        "price": [29.99, 899.99, 149.5],
+    })
+    if expected_kind == "hash":
+        sales = sales.assign(article_id=sales["article_id"].astype(str))
+    index = DimensionIndex(articles, "article_id")
+    assert index.kind == expected_kind
+    joined, report = join_dimension(sales, index)
+    expected = sales.merge(articles, on="article_id", how="left")
+    pd.testing.assert_frame_equal(joined, expected)
+    assert report.unmatched_rows == (2 if expected_kind == "sorted" else 1)
+
+def test_join_gathers_only_requested_columns_and_shares_fact_data(sales):
+    articles = pd.DataFrame({"article_id": [1001, 1002, 1003], "price": [1.0, 2.0, 3.0], "name": list("abc")})
+    joined, report = join_dimension(sales, DimensionIndex(articles, "article_id"), ["price"])
+    assert list(joined.columns) == ["transaction_id", "article_id", "quantity", "price"]
+    assert np.shares_memory(joined["quantity"].to_numpy(), sales["quantity"].to_numpy())
+    assert "price" not in sales.columns
+    assert report.unmatched_keys.tolist() == [1009]
+
+def test_keeps_integer_attributes_when_all_keys_match():
+    fact = pd.DataFrame({"branch_id": [2, 1, 2]})
+    branches = pd.DataFrame({"branch_id": [1, 2], "size": [10, 20], "city": pd.Categorical(["X", "Y"])})
+    joined, report = join_dimension(fact, DimensionIndex(branches, "branch_id"))
+    assert joined["size"].dtype == np.int64
+    assert joined["size"].tolist() == [20, 10, 20]
+    assert joined["city"].dtype == "category"
+    assert report.unmatched_rows == 0
+
+def test_missing_foreign_keys_do_not_match():
+    fact = pd.DataFrame({"article_id": [1.0, np.nan, 2.5]})
+    articles = pd.DataFrame({"article_id": [1, 2], "price": [5.0, 6.0]})
+    joined, report = join_dimension(fact, DimensionIndex(articles, "article_id"))
+    assert joined["price"].tolist()[0] == 5.0
+    assert joined["price"].isna().tolist() == [False, True, True]
+    assert report.unmatched_rows == 2
+
+def test_duplicate_dimension_keys_are_rejected():
+    with pytest.raises(ValueError):
+        DimensionIndex(pd.DataFrame({"article_id": [1, 1]}), "article_id")
@@ -2,7 +2,8 @@ import sqlite3
 import pandas as pd
 import tempfile
 import os
-from data_loading import load_table_from_db
+import pytest
+from data_loading import load_table_from_db, load_table_in_chunks, build_select_query, load_tables_parallel, PROBE_ROWS
 
 def test_load_table_from_db():
     with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as tmp:
@@ -29,4 +30,135 @@ def test_load_table_from_db():
         assert "age" in df.columns
         assert df.shape[0] == 2
     finally:
-        os.remove(db_path)
\ No newline at end of file
+        os.remove(db_path)
+
+def test_load_table_in_chunks():
+    with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as tmp:
+        db_path = tmp.name
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE sales (
+                transaction_id INTEGER PRIMARY KEY,
+                branch_id INTEGER,
+                article_id INTEGER,
+                quantity INTEGER,
+                sale_date TEXT
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO sales VALUES (?, ?, ?, ?, ?)",
+            [(i, 1, 1, i, "2023-01-01") for i in range(1, 11)],
+        )
+        conn.commit()
+        conn.close()
+
+        chunks = list(load_table_in_chunks(db_path, "sales", chunksize=4))
+        assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+        assert chunks[0]["quantity"].dtype == "int64"
+        assert pd.concat(chunks)["quantity"].sum() == 55
+
+        # a tiny byte budget shrinks the chunks below the row limit
+        small_chunks = list(load_table_in_chunks(db_path, "sales", chunksize=4, max_bytes=1))
+        assert len(small_chunks) > 3
+        assert sum(len(chunk) for chunk in small_chunks) == 10
+    finally:
+        os.remove(db_path)
+
+def test_byte_budget_holds_from_the_first_chunk(tmp_path):
+    db_path = str(tmp_path / "budget.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE sales (transaction_id INTEGER, branch_id INTEGER, article_id INTEGER, quantity INTEGER, sale_date TEXT)")
+    conn.executemany("INSERT INTO sales VALUES (?, 1, 1, 1, '2023-01-01')", [(i,) for i in range(5000)])
+    conn.commit()
+    conn.close()
+    max_bytes = 50_000
+    chunks = list(load_table_in_chunks(db_path, "sales", chunksize=5000, max_bytes=max_bytes))
+    assert len(chunks[0]) <= PROBE_ROWS
+    assert all(chunk.memory_usage(deep=True).sum() <= max_bytes for chunk in chunks)
+    assert sum(len(chunk) for chunk in chunks) == 5000
+
+def test_load_table_in_chunks_keeps_null_ids(tmp_path):
+    db_path = str(tmp_path / "nulls.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE sales (transaction_id INTEGER, branch_id INTEGER, article_id INTEGER, quantity INTEGER, sale_date TEXT)")
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (1, 1, 1, 2, "2023-01-01"),
+        (2, None, 1, None, "2023-01-02"),
+        (3, 2, 1, 3, "2023-01-03"),
+        (4, 2, 1, 1, "2023-01-04"),
+    ])
+    conn.commit()
+    conn.close()
+
+    chunks = list(load_table_in_chunks(db_path, "sales", chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    assert chunks[0]["branch_id"].isna().tolist() == [False, True]
+    assert chunks[0]["quantity"].dtype == "float64" and chunks[1]["quantity"].dtype == "int64"
+    assert pd.concat(chunks)["quantity"].sum() == 6
+
+def test_build_select_query():
+    query, params = build_select_query(
+        "sales", ["branch_id", "quantity"], start_date="2023-01-01",
+        end_date="2023-01-31", branch_ids={2, 1}
+    )
+    assert query == (
+        "SELECT branch_id, quantity FROM sales WHERE sale_date >= ? "
+        "AND sale_date < ? AND branch_id IN (?, ?)"
+    )
+    assert params == ["2023-01-01", "2023-02-01", 1, 2]
+
+def test_build_select_query_rejects_bad_identifiers():
+    with pytest.raises(ValueError):
+        build_select_query("sales; DROP TABLE sales")
+
+def test_load_table_with_columns_and_filters():
+    with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as tmp:
+        db_path = tmp.name
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE sales (
+                transaction_id INTEGER PRIMARY KEY,
+                branch_id INTEGER,
+                article_id INTEGER,
+                quantity INTEGER,
+                sale_date TEXT
+            )
+        """)
+        conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+            (1, 1, 10, 1, "2023-01-01"),
+            (2, 2, 10, 2, "2023-01-31"),
+            (3, 1, 11, 3, "2023-02-01"),
+            (4, 3, 11, 4, "2023-01-15"),
+        ])
+        conn.commit()
+        conn.close()
+
+        df = load_table_from_db(
+            db_path, "sales", columns=["transaction_id", "quantity"],
+            start_date="2023-01-01", end_date="2023-01-31", branch_ids=[1, 2]
+        )
+        assert list(df.columns) == ["transaction_id", "quantity"]
+        assert sorted(df["transaction_id"]) == [1, 2]
+
+        chunks = list(load_table_in_chunks(db_path, "sales", chunksize=1, article_ids=[11]))
+        assert sorted(pd.concat(chunks)["transaction_id"]) == [3, 4]
+    finally:
+        os.remove(db_path)
+
+def test_load_tables_parallel():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE branches (branch_id INTEGER, city TEXT)")
+        conn.execute("CREATE TABLE articles (article_id INTEGER, price REAL)")
+        conn.executemany("INSERT INTO branches VALUES (?, ?)", [(1, "A"), (2, "B")])
+        conn.execute("INSERT INTO articles VALUES (1, 9.5)")
+        conn.commit()
+        conn.close()
+
+        tables = load_tables_parallel(db_path, {"branches": {"branch_ids": [2]}, "articles": {}})
+        assert list(tables) == ["branches", "articles"]
+        assert tables["branches"]["city"].tolist() == ["B"]
+        assert tables["articles"]["price"].tolist() == [9.5]
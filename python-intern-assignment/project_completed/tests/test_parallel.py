@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+import pytest
+from analysis import calculate_all_metrics
+from data_loading import load_table_from_db
+from parallel import Shard, calculate_metrics_parallel, plan_shards
+from processing import merge_sales_with_articles, add_total_and_date_columns
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as tmp:
+        path = tmp.name
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, category TEXT, price REAL)")
+    conn.execute("""
+        CREATE TABLE sales (
+            transaction_id INTEGER, branch_id INTEGER, article_id INTEGER,
+            quantity INTEGER, sale_date TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?)", [
+        (1, "Article A", "X", 10.0),
+        (2, "Article B", "Y", 5.5),
+        (3, "Article C", "X", 1.25),
+    ])
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (i, i % 4 + 1, i % 3 + 1, i % 5 + 1, f"2023-{i % 12 + 1:02d}-{i % 28 + 1:02d}")
+        for i in range(1, 201)
+    ])
+    conn.commit()
+    conn.close()
+    yield path
+    os.remove(path)
+
+def _single_process(db_path):
+    merged = merge_sales_with_articles(load_table_from_db(db_path, "sales"), load_table_from_db(db_path, "articles"))
+    return calculate_all_metrics(add_total_and_date_columns(merged))
+
+def test_plan_shards(db_path):
+    assert plan_shards(db_path, 3) == [Shard(0, 67), Shard(67, 134), Shard(134, 200)]
+    by_branch = plan_shards(db_path, 2, "branch_id")
+    assert sorted(b for shard in by_branch for b in shard.branch_ids) == [1, 2, 3, 4]
+    with pytest.raises(ValueError):
+        plan_shards(db_path, 2, "article_id")
+
+@pytest.mark.parametrize("workers, shard_key", [
+    (1, "transaction_id"),
+    (1, "branch_id"),
+    (2, "transaction_id"),
+    (2, "branch_id"),
+])
+def test_parallel_metrics_match_single_process(db_path, workers, shard_key):
+    """
+    Tests that sharded results, including the full top-articles ordering, equal a single pass.
+    """
+    expected = _single_process(db_path)
+    results = calculate_metrics_parallel(db_path, workers=workers, shard_key=shard_key, shards=3, chunksize=25)
+    assert results.keys() == expected.keys()
+    for name in expected:
+        pd.testing.assert_series_equal(results[name], expected[name], check_index_type=False)
+
+@pytest.mark.parametrize("shard_key", ["transaction_id", "branch_id"])
+def test_null_shard_keys_are_not_dropped(db_path, shard_key):
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (None, 2, 1, 4, "2023-03-05"),
+        (201, None, 3, 2, "2023-04-06"),
+        (None, None, 2, 7, "2023-05-07"),
+    ])
+    conn.commit()
+    conn.close()
+    assert plan_shards(db_path, 2, shard_key)[-1] == Shard(null_key=shard_key)
+    expected = _single_process(db_path)
+    for workers in (1, 2):
+        results = calculate_metrics_parallel(db_path, workers=workers, shard_key=shard_key, shards=2, chunksize=25)
+        for name in expected:
+            pd.testing.assert_series_equal(results[name], expected[name], check_index_type=False)
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+import pytest
+from data_loading import build_select_query, load_table_from_db, load_table_in_chunks
+from partitioning import (
+    append_rows, archive_partitions, compact_partitions, list_partitions,
+    migrate_to_partitions, prune_partitions
+)
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "retail.db")
+        conn = sqlite3.connect(path)
+        conn.execute("""
+            CREATE TABLE sales (
+                transaction_id INTEGER, branch_id INTEGER, article_id INTEGER,
+                quantity INTEGER, sale_date TEXT
+            )
+        """)
+        conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+            (1, 1, 1, 2, "2023-01-15"),
+            (2, 2, 1, 1, "2023-01-31"),
+            (3, 1, 2, 5, "2023-02-01"),
+            (4, 2, 2, 3, "2023-03-10"),
+            (5, 1, 1, 1, None),
+        ])
+        conn.commit()
+        conn.close()
+        yield path
+
+def test_migration_keeps_every_row_behind_a_view(db_path):
+    counts = migrate_to_partitions(db_path)
+    assert counts == {"sales_202301": 2, "sales_202302": 1, "sales_202303": 1, "sales_undated": 1}
+    df = load_table_from_db(db_path, "sales")
+    assert sorted(df["transaction_id"]) == [1, 2, 3, 4, 5]
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM sales_unpartitioned").fetchone()[0] == 5
+    with pytest.raises(ValueError):
+        migrate_to_partitions(db_path)
+    conn.close()
+
+def test_date_range_reads_only_overlapping_partitions(db_path):
+    migrate_to_partitions(db_path)
+    conn = sqlite3.connect(db_path)
+    assert prune_partitions(conn, "sales", "2023-01-20", "2023-02-10") == ["sales_202301", "sales_202302"]
+    assert prune_partitions(conn, "articles", "2023-01-01") is None
+    conn.close()
+    query, params = build_select_query("sales", start_date="2023-01-20", partitions=["sales_202301", "sales_202302"])
+    assert query.count("UNION ALL") == 1 and len(params) == 2
+    df = load_table_from_db(db_path, "sales", start_date="2023-01-20", end_date="2023-02-10")
+    assert df["transaction_id"].tolist() == [2, 3]
+    chunks = list(load_table_in_chunks(db_path, "sales", chunksize=1, start_date="2024-01-01"))
+    assert chunks == []
+
+def test_append_creates_new_month_partitions(db_path):
+    migrate_to_partitions(db_path)
+    conn = sqlite3.connect(db_path)
+    inserted = append_rows(conn, pd.DataFrame({
+        "transaction_id": [6, 7], "branch_id": [1, 1], "article_id": [2, 2],
+        "quantity": [1, 4], "sale_date": ["2023-03-11", "2023-04-02"],
+    }))
+    assert inserted == {"sales_202303": 1, "sales_202304": 1}
+    assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 7
+    registry = list_partitions(conn).set_index("partition_table")
+    assert registry.loc["sales_202303", "row_count"] == 2
+    assert registry.loc["sales_202304", "last_date"] == "2023-04-02"
+    conn.close()
+
+def test_compact_and_archive_old_partitions(db_path):
+    migrate_to_partitions(db_path, keep_source=False)
+    assert compact_partitions(db_path, "2023-03-01") == ["sales_202301", "sales_202302"]
+    archive_path = os.path.join(os.path.dirname(db_path), "archive.db")
+    assert archive_partitions(db_path, archive_path, "2023-02-01") == ["sales_202301"]
+    assert sorted(load_table_from_db(db_path, "sales")["transaction_id"]) == [3, 4, 5]
+    assert load_table_from_db(archive_path, "sales_202301")["transaction_id"].tolist() == [1, 2]
+    conn = sqlite3.connect(db_path)
+    registry = list_partitions(conn, include_archived=True).set_index("partition_table")
+    conn.close()
+    assert registry.loc["sales_202301", "location"] == archive_path
+    assert registry.loc["sales_202302", "compacted"] == 1
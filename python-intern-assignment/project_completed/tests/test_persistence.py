@@ -0,0 +1,83 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+from persistence import METRIC_TABLES, metric_rows, write_metric_tables
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def metrics():
+    return {
+        "branch_sales": pd.Series([300.0, 200.0], index=pd.Index([1, 2], name="branch_id"), name="total_amount"),
+        "top_articles": pd.Series([7, 3], index=pd.Index(["B", "A"], name="article_name"), name="quantity"),
+        "monthly_revenue": pd.Series(
+            [100.0, 400.0],
+            index=pd.MultiIndex.from_tuples([(2023, 1), (2023, 2)], names=["year", "month"]),
+            name="total_amount",
+        ),
+        "category_revenue": pd.Series([500.0], index=pd.Index(["X"], name="category"), name="total_amount"),
+    }
+
+def test_write_metric_tables_creates_typed_keyed_tables(conn, metrics):
+    report = write_metric_tables(conn, metrics)
+    assert {table: stats["rows"] for table, stats in report.items()} == {
+        "metrics_sales_by_branch": 2,
+        "metrics_top_articles": 2,
+        "metrics_monthly_revenue": 2,
+        "metrics_category_revenue": 1,
+    }
+    columns = conn.execute("PRAGMA table_info(metrics_monthly_revenue)").fetchall()
+    assert [(c[1], c[2], c[5]) for c in columns] == [
+        ("year", "INTEGER", 1), ("month", "INTEGER", 2), ("revenue", "REAL", 0)
+    ]
+    top = conn.execute("SELECT rank, article_name, total_quantity FROM metrics_top_articles ORDER BY rank").fetchall()
+    assert top == [(1, "B", 7), (2, "A", 3)]
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert not any(name.endswith("__staging") for name in tables)
+
+def test_failed_write_keeps_previous_metrics(conn, metrics):
+    write_metric_tables(conn, metrics)
+    broken = dict(metrics)
+    # duplicate keys violate the primary key after the first tables have been swapped
+    broken["category_revenue"] = pd.Series([1.0, 2.0], index=pd.Index(["X", "X"], name="category"))
+    with pytest.raises(sqlite3.IntegrityError):
+        write_metric_tables(conn, broken)
+    assert conn.execute("SELECT SUM(total_sales) FROM metrics_sales_by_branch").fetchone()[0] == 500.0
+    assert conn.execute("SELECT revenue FROM metrics_category_revenue").fetchall() == [(500.0,)]
+
+def test_write_inside_callers_transaction_leaves_the_commit_to_the_caller(conn, metrics):
+    conn.execute("CREATE TABLE notes (note TEXT)")
+    conn.commit()
+    conn.execute("INSERT INTO notes VALUES ('pending')")
+    write_metric_tables(conn, metrics)
+    assert conn.in_transaction  # the caller's work was not committed as a side effect
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0] == 0
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'metrics_sales_by_branch'").fetchone()
+    conn.execute("INSERT INTO notes VALUES ('kept')")
+    broken = dict(metrics, category_revenue=pd.Series([1.0, 2.0], index=pd.Index(["X", "X"], name="category")))
+    with pytest.raises(sqlite3.IntegrityError):
+        write_metric_tables(conn, broken)
+    conn.commit()  # only the failed write was undone
+    assert conn.execute("SELECT note FROM notes").fetchall() == [("kept",)]
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'metrics_sales_by_branch'").fetchone()
+
+def test_full_write_clears_incremental_watermark(conn, metrics):
+    conn.execute("CREATE TABLE metrics_watermark (watermark_column TEXT, last_value TEXT, updated_at TEXT)")
+    conn.execute("INSERT INTO metrics_watermark VALUES ('transaction_id', '10', '')")
+    conn.commit()
+    write_metric_tables(conn, metrics)
+    assert conn.execute("SELECT COUNT(*) FROM metrics_watermark").fetchone()[0] == 0
+
+def test_metric_rows_accepts_frames_and_checks_width():
+    spec = METRIC_TABLES[0]
+    frame = pd.DataFrame({"branch_id": [1, None], "total_sales": [10.0, 5.0]})
+    assert metric_rows(spec, frame) == [(1.0, 10.0)]
+    with pytest.raises(ValueError):
+        metric_rows(spec, pd.DataFrame({"a": [1], "b": [2], "c": [3]}))
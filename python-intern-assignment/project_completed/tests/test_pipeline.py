@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from pipeline import Pipeline, Stage, peak_memory_ratio
+from processing import build_processing_pipeline
+
+
+def _add_column(df):
+    df["doubled"] = df["value"] * 2
+    return df
+
+def test_non_consuming_stage_leaves_caller_frame_unchanged():
+    original = pd.DataFrame({"value": [1, 2, 3]})
+    result = Pipeline([Stage("double", _add_column)]).run(original)
+    assert list(original.columns) == ["value"]
+    assert result["doubled"].tolist() == [2, 4, 6]
+
+def test_consuming_stage_works_in_place():
+    original = pd.DataFrame({"value": [1, 2, 3]})
+    result = Pipeline([Stage("double", _add_column, consumes=True)]).run(original)
+    assert result is original
+
+def test_memory_report_per_stage():
+    """
+    Tests that a loader-first pipeline reports every stage and that adding one column
+    stays well below two copies of the fact table.
+    """
+    rows = 200_000
+    pipeline = Pipeline(
+        [
+            Stage("load", lambda _: pd.DataFrame({"value": np.arange(rows), "other": np.ones(rows)})),
+            Stage("double", _add_column, consumes=True),
+            Stage("sum", lambda df: df["doubled"].sum()),
+        ],
+        track_memory=True,
+    )
+    assert pipeline.run() == 2 * np.arange(rows).sum()
+    assert [report.name for report in pipeline.reports] == ["load", "double", "sum"]
+    assert pipeline.reports[0].output_bytes >= rows * 16
+    assert peak_memory_ratio(pipeline.reports, "load") < 2
+    assert "double" in pipeline.format_report()
+
+def test_processing_pipeline_matches_stepwise_processing():
+    sales = pd.DataFrame({
+        "article_id": [1, 2, 1],
+        "quantity": [2, 1, 3],
+        "sale_date": ["2023-01-05", "2023-02-10", "2023-02-11"],
+    })
+    articles = pd.DataFrame({"article_id": [1, 2], "price": [10.0, 2.5], "article_name": ["a", "b"]})
+    result = build_processing_pipeline(articles).run(sales)
+    assert result["total_amount"].tolist() == [20.0, 2.5, 30.0]
+    assert result["year_month"].tolist() == [202301, 202302, 202302]
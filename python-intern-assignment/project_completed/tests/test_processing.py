@@ -1,5 +1,5 @@
 import pandas as pd
-from processing import merge_sales_with_articles, add_total_and_date_columns
+from processing import merge_sales_with_articles, add_total_and_date_columns, add_branch_details
 
 
 def test_merge_sales_with_articles():
@@ -40,4 +40,34 @@ def test_add_total_and_date_columns():
     assert "month" in processed_df.columns
     assert "year" in processed_df.columns
     assert processed_df.loc[0, "month"] == 1
-    assert processed_df.loc[0, "year"] == 2023 
\ No newline at end of file
+    assert processed_df.loc[0, "year"] == 2023
+
+
+def test_merge_sales_with_articles_duplicate_article_ids():
+    """
+    Tests that duplicate article ids fall back to a regular merge (one row per match)."""
+    sales = pd.DataFrame({"article_id": [1], "quantity": [5]})
+    articles = pd.DataFrame({"article_id": [1, 1], "price": [100, 110]})
+    merged_df = merge_sales_with_articles(sales, articles)
+    assert merged_df["price"].tolist() == [100, 110]
+
+def test_merge_sales_with_articles_shared_columns():
+    """
+    Tests that a column in both frames falls back to a regular merge with suffixes instead of failing."""
+    sales = pd.DataFrame({"article_id": [1, 2], "quantity": [5, 10], "price": [9.0, 4.0]})
+    articles = pd.DataFrame({"article_id": [1, 2], "price": [100.0, 50.0], "category": ["X", "Y"]})
+    merged_df = merge_sales_with_articles(sales, articles)
+    assert merged_df["price_x"].tolist() == [9.0, 4.0]
+    assert merged_df["price_y"].tolist() == [100.0, 50.0]
+    assert merged_df["category"].tolist() == ["X", "Y"]
+
+def test_add_branch_details():
+    """
+    Tests adding branch attributes to sales through branch_id."""
+    sales = pd.DataFrame({"branch_id": [2, 1, 3], "quantity": [1, 2, 3]})
+    branches = pd.DataFrame({"branch_id": [1, 2], "branch_name": ["A", "B"], "city": ["X", "Y"]})
+    result = add_branch_details(sales, branches, columns=["city"])
+    assert list(result.columns) == ["branch_id", "quantity", "city"]
+    assert result["city"].tolist()[:2] == ["Y", "X"]
+    assert pd.isna(result.loc[2, "city"])
+
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import explore_dataframe
+from profiling import StreamingProfile, profile_dataframe, profiled_chunks
+
+
+@pytest.fixture
+def sales():
+    rng = np.random.default_rng(11)
+    n = 30_000
+    amount = rng.lognormal(3, 1, n) + 1e6  # large offset: naive sum of squares loses precision
+    amount[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "transaction_id": np.arange(n),
+        "article_id": rng.integers(0, 700, n),
+        "total_amount": amount,
+        "sale_date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+    })
+
+def test_streaming_statistics_match_pandas(sales):
+    profile = StreamingProfile("Sales")
+    for start in range(0, len(sales), 7_000):
+        profile.update(sales.iloc[start:start + 7_000])
+    result = profile.result()
+    columns = result.columns
+    assert result.complete and result.rows_profiled == len(sales)
+    amount = columns.loc["total_amount"]
+    assert amount["nulls"] == sales["total_amount"].isna().sum()
+    assert amount["mean"] == pytest.approx(sales["total_amount"].mean(), rel=1e-12)
+    assert amount["std"] == pytest.approx(sales["total_amount"].std(), rel=1e-6)
+    assert columns.loc["sale_date", "min"] == sales["sale_date"].min()
+    assert columns.loc["sale_date", "max"] == sales["sale_date"].max()
+    article = columns.loc["article_id"]
+    assert article["approx_distinct"] == pytest.approx(700, rel=4 * article["distinct_rel_error"])
+
+def test_budgets_mark_profile_incomplete(sales):
+    profile = StreamingProfile(max_rows=10_000)
+    assert not profile.update(sales.iloc[:15_000])
+    assert not profile.update(sales.iloc[15_000:])
+    assert profile.rows == 10_000 and not profile.result().complete
+    timed = StreamingProfile(max_seconds=0.0)
+    assert not timed.update(sales) and timed.rows == 0
+    sampled = profile_dataframe(sales, max_rows=5_000)
+    assert sampled.rows_profiled == 5_000 and not sampled.complete
+
+def test_reservoir_sample_is_uniform(sales):
+    profile = StreamingProfile(sample_size=2_000, seed=3)
+    for start in range(0, len(sales), 1_000):
+        profile.update(sales.iloc[start:start + 1_000])
+    sample = profile.result().sample
+    assert len(sample) == 2_000 and sample["transaction_id"].is_unique
+    # a uniform sample is spread evenly over the stream, not biased to its start or end
+    assert sample["transaction_id"].mean() == pytest.approx(len(sales) / 2, rel=0.05)
+
+def test_profiled_chunks_pass_through(sales):
+    chunks = [sales.iloc[start:start + 5_000] for start in range(0, len(sales), 5_000)]
+    profile = StreamingProfile(max_rows=12_000)
+    passed = list(profiled_chunks(iter(chunks), profile))
+    assert len(passed) == len(chunks)
+    assert all(a is b for a, b in zip(passed, chunks))
+    assert profile.rows == 12_000
+
+def test_explore_dataframe_returns_profile(sales):
+    profile = explore_dataframe(sales, "Sales", sample_size=100)
+    assert list(profile.columns.index) == list(sales.columns)
+    assert len(profile.sample) == 100
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+from schema import (
+    INDEXES, SCHEMA_VERSION, ensure_indexes, explain_metric_queries,
+    find_table_scans, schema_version
+)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE branches (branch_id INTEGER, branch_name TEXT, city TEXT)")
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, category TEXT, price REAL)")
+    conn.execute("""
+        CREATE TABLE sales (
+            transaction_id INTEGER, branch_id INTEGER, article_id INTEGER,
+            quantity INTEGER, sale_date TEXT
+        )
+    """)
+    conn.execute("INSERT INTO articles VALUES (1, 'Article A', 'X', 10.0)")
+    conn.execute("INSERT INTO sales VALUES (1, 1, 1, 2, '2023-01-01')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+def test_ensure_indexes_is_idempotent(conn):
+    first = ensure_indexes(conn)
+    assert set(first.values()) == {"created"}
+    assert schema_version(conn) == SCHEMA_VERSION
+    second = ensure_indexes(conn)
+    assert set(second.values()) == {"kept"}
+
+def test_ensure_indexes_migrates_changed_and_obsolete_indexes(conn):
+    conn.execute("CREATE INDEX ix_sales_article ON sales (article_id)")  # older definition
+    conn.execute("CREATE INDEX ix_sales_old ON sales (quantity)")
+    conn.execute("CREATE INDEX my_own_index ON sales (quantity)")
+    actions = ensure_indexes(conn)
+    assert actions["ix_sales_article"] == "rebuilt"
+    assert actions["ix_sales_old"] == "dropped"
+    assert "my_own_index" not in actions
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "my_own_index" in names and "ix_sales_old" not in names
+
+def test_duplicate_dimension_keys_fall_back_to_plain_index(conn):
+    conn.execute("INSERT INTO articles VALUES (1, 'Article A again', 'X', 11.0)")
+    assert ensure_indexes(conn)["ux_articles_article_id"] == "created"
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'ux_articles_article_id'").fetchone()[0]
+    assert not sql.startswith("CREATE UNIQUE")
+    assert ensure_indexes(conn)["ux_articles_article_id"] == "kept"
+
+def test_analyze_only_runs_after_changes(conn):
+    ensure_indexes(conn)
+    conn.execute("DELETE FROM sqlite_stat1")
+    conn.commit()
+    assert set(ensure_indexes(conn).values()) == {"kept"}
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] == 0
+
+def test_metric_queries_avoid_table_scans(conn):
+    assert find_table_scans(explain_metric_queries(conn))  # no indexes yet
+    ensure_indexes(conn)
+    assert find_table_scans(explain_metric_queries(conn)) == {}
+
+def test_skips_missing_tables():
+    conn = sqlite3.connect(":memory:")
+    actions = ensure_indexes(conn)
+    assert set(actions.values()) == {"skipped"}
+    assert len(actions) == len(INDEXES)
+
+def test_table_scans_are_found_in_old_and_new_plan_wording():
+    plans = {
+        "new": ["SCAN s", "SEARCH a USING INDEX ix_articles_id_price (article_id=?)"],
+        "old": ["SCAN TABLE sales AS s", "SCAN TABLE articles"],
+        "index": ["SCAN TABLE sales USING COVERING INDEX ix_sales_article", "SCAN s USING INDEX ix_sales_branch"],
+    }
+    assert find_table_scans(plans) == {"new": ["s"], "old": ["sales", "articles"]}
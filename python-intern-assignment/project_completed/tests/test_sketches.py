@@ -0,0 +1,84 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+from sketches import (
+    CountMinSketch, HyperLogLog, KLLSketch, approximate_metrics, build_sketches,
+    load_sketches, merge_sketches, save_sketches, sketch_from_bytes, summarize_sketches
+)
+
+
+@pytest.fixture
+def sales_with_price():
+    rng = np.random.default_rng(7)
+    n = 20_000
+    article_id = rng.zipf(1.5, n) % 500
+    return pd.DataFrame({
+        "transaction_id": np.arange(n),
+        "branch_id": rng.integers(1, 4, n),
+        "article_id": article_id,
+        "article_name": [f"article {i}" for i in article_id],
+        "quantity": rng.integers(1, 5, n),
+        "total_amount": rng.lognormal(3, 1, n),
+    })
+
+def test_hyperloglog_estimate_and_merge():
+    left = HyperLogLog().add(np.arange(0, 60_000))
+    right = HyperLogLog().add(np.arange(40_000, 100_000))
+    merged = sketch_from_bytes(left.to_bytes()).merge(right)
+    assert merged.estimate() == pytest.approx(100_000, rel=4 * merged.relative_error)
+    assert HyperLogLog().add(["a", "b", "a"]).estimate() == pytest.approx(2, abs=0.1)
+
+def test_hyperloglog_counts_ids_once_across_int_and_float_chunks():
+    ints = HyperLogLog().add(np.arange(1000))
+    floats = HyperLogLog().add(np.r_[np.arange(1000.0), np.nan])  # a chunk with a NULL id stays float64
+    assert floats.estimate() == pytest.approx(ints.estimate())
+    assert ints.merge(floats).estimate() == pytest.approx(1000, rel=4 * ints.relative_error)
+    assert HyperLogLog().add(["a", None, "a"]).estimate() == pytest.approx(1, abs=0.1)
+
+def test_kll_quantiles_within_rank_error():
+    values = np.random.default_rng(3).normal(size=200_000)
+    sketch = KLLSketch()
+    for chunk in np.array_split(values, 20):
+        sketch.merge(KLLSketch().add(chunk))
+    restored = sketch_from_bytes(sketch.to_bytes())
+    assert sum(len(level) for level in restored.levels) < 4 * restored.k
+    for q in (0.5, 0.95):
+        true_rank = np.mean(values <= restored.quantile(q))
+        assert abs(true_rank - q) <= restored.rank_error
+
+def test_count_min_never_undercounts():
+    keys = np.repeat(["a", "b", "c"], [5000, 300, 10])
+    sketch = CountMinSketch(epsilon=0.01).add(keys)
+    estimates = sketch.estimate(["a", "b", "c"])
+    assert all(estimates >= [5000, 300, 10])
+    assert all(estimates <= np.array([5000, 300, 10]) + sketch.max_overcount)
+    assert sketch.heavy_hitters(0.05).index.tolist() == ["a", "b"]
+
+def test_sketch_metrics_merge_through_the_database(sales_with_price):
+    """
+    Tests that per-chunk sketches saved under separate scopes merge into the same
+    answers as the exact computations, within their error bounds.
+    """
+    conn = sqlite3.connect(":memory:")
+    save_sketches(conn, build_sketches(sales_with_price.iloc[:8000]), "day-1")
+    save_sketches(conn, build_sketches(sales_with_price.iloc[8000:]), "day-2")
+    results = summarize_sketches(load_sketches(conn))
+    conn.close()
+
+    distinct = results["distinct_articles_by_branch"]
+    exact = sales_with_price.groupby("branch_id")["article_id"].nunique()
+    assert ((distinct["estimate"] - exact).abs() <= 4 * distinct["std_error"]).all()
+
+    quantiles = results["transaction_value_quantiles"]
+    median = quantiles[quantiles["branch_id"].isna() & (quantiles["quantile"] == 0.5)].iloc[0]
+    true_rank = np.mean(sales_with_price["total_amount"] <= median["value"])
+    assert abs(true_rank - 0.5) <= median["rank_error"]
+
+    hitters = results["heavy_hitter_articles"]
+    exact_top = sales_with_price.groupby("article_name")["quantity"].sum().nlargest(3)
+    assert hitters.index[:3].tolist() == exact_top.index.tolist()
+
+    streamed = approximate_metrics([sales_with_price.iloc[:8000], sales_with_price.iloc[8000:]])
+    assert streamed["distinct_transactions"]["estimate"].iloc[0] == pytest.approx(20_000, rel=0.05)
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+import pytest
+from analysis import calculate_metrics_from_chunks
+from data_loading import load_table_from_db, load_table_in_chunks
+from processing import process_sales_chunks
+from synthetic_data import generate_database
+
+
+@pytest.fixture(scope="module")
+def tmp_dir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+@pytest.fixture(scope="module")
+def db_path(tmp_dir):
+    path = os.path.join(tmp_dir, "synthetic.db")
+    generate_database(path, 60_000, n_articles=400, n_branches=12, seed=1)
+    return path
+
+def _table(db_path, name):
+    conn = sqlite3.connect(db_path)
+    try:
+        return pd.read_sql_query(f"SELECT * FROM {name}", conn)
+    finally:
+        conn.close()
+
+def test_same_seed_gives_same_data(db_path, tmp_dir):
+    again = os.path.join(tmp_dir, "again.db")
+    other = os.path.join(tmp_dir, "other.db")
+    assert generate_database(again, 60_000, n_articles=400, n_branches=12, seed=1)["sales"] == 60_000
+    generate_database(other, 60_000, n_articles=400, n_branches=12, seed=2)
+    for table in ("branches", "articles", "sales"):
+        pd.testing.assert_frame_equal(_table(db_path, table), _table(again, table))
+    assert not _table(db_path, "sales").equals(_table(other, "sales"))
+
+def test_distributions_are_skewed(db_path):
+    sales = _table(db_path, "sales")
+    article_share = sales["article_id"].value_counts(normalize=True)
+    assert article_share.iloc[0] > 20 / 400  # Zipf: the top article sells far above a uniform share
+    assert article_share.iloc[:40].sum() > 0.5
+    branch_rows = sales["branch_id"].value_counts()
+    assert branch_rows.max() > 2 * branch_rows.min()
+    months = pd.to_datetime(sales["sale_date"]).dt.month.value_counts()
+    assert months[12] > 1.3 * months[6]
+
+def test_generated_database_runs_through_the_pipeline(db_path):
+    df_articles = load_table_from_db(db_path, "articles")
+    chunks = load_table_in_chunks(db_path, "sales", chunksize=25_000)
+    metrics = calculate_metrics_from_chunks(process_sales_chunks(chunks, df_articles))
+    assert len(metrics["branch_sales"]) == 12
+    assert metrics["monthly_revenue"].index.get_level_values("year").unique().tolist() == [2023, 2024]
+    assert metrics["top_articles"].sum() == _table(db_path, "sales")["quantity"].sum()
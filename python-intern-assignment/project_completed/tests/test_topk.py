@@ -0,0 +1,67 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+from topk import merge_top_k, select_top_k, top_k_articles, top_k_articles_from_chunks, top_k_articles_sql
+
+
+@pytest.fixture
+def sales_with_price():
+    return pd.DataFrame({
+        "branch_id": [1, 1, 2, 2, 2, 1],
+        "article_name": ["A", "B", "C", "A", "D", "D"],
+        "category": ["X", "X", "Y", "X", "Y", "Y"],
+        "quantity": [5, 3, 3, 1, 7, 1],
+        "total_amount": [50.0, 3.0, 30.0, 10.0, 7.0, 1.0],
+        "year_month": [202301, 202301, 202301, 202302, 202302, 202302],
+    })
+
+def test_select_top_k_matches_full_sort():
+    rng = np.random.default_rng(0)
+    totals = pd.Series(rng.integers(0, 50, 1000), index=[f"a{i:04d}" for i in range(1000)])
+    expected = totals.sort_values(ascending=False, kind="stable").head(10)
+    pd.testing.assert_series_equal(select_top_k(totals, 10), expected)
+    assert select_top_k(totals, 0).empty
+    assert len(select_top_k(totals, 5000)) == 1000
+
+def test_top_k_articles_overall_and_partitioned(sales_with_price):
+    assert top_k_articles(sales_with_price, k=2).to_dict() == {"D": 8, "A": 6}
+    assert top_k_articles(sales_with_price, k=1, measure="revenue").to_dict() == {"A": 60.0}
+    by_category = top_k_articles(sales_with_price, k=1, partition_by="category")
+    assert by_category.to_dict() == {("X", "A"): 6, ("Y", "D"): 8}
+    by_month = top_k_articles(sales_with_price, k=1, partition_by="month")
+    assert by_month.index.names == ["year_month", "article_name"]
+    with pytest.raises(ValueError):
+        top_k_articles(sales_with_price, measure="margin")
+
+def test_streaming_top_k_combines_totals_before_selecting(sales_with_price):
+    """
+    Tests that an article which is never the top of a single chunk still wins overall.
+    """
+    chunks = [sales_with_price.iloc[:3], sales_with_price.iloc[3:]]
+    pd.testing.assert_series_equal(
+        top_k_articles_from_chunks(chunks, k=2), top_k_articles(sales_with_price, k=2)
+    )
+
+def test_merge_top_k_of_disjoint_branches(sales_with_price):
+    expected = top_k_articles(sales_with_price, k=1, partition_by="branch")
+    per_branch = [
+        top_k_articles(sales_with_price[sales_with_price["branch_id"] == branch], k=1, partition_by="branch")
+        for branch in (2, 1)
+    ]
+    pd.testing.assert_series_equal(merge_top_k(per_branch, k=1), expected, check_index_type=False)
+
+def test_top_k_articles_sql_matches_pandas():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE articles (article_id INTEGER, article_name TEXT, category TEXT, price REAL)")
+    conn.execute("CREATE TABLE sales (transaction_id INTEGER, branch_id INTEGER, article_id INTEGER, quantity INTEGER, sale_date TEXT)")
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?)", [(1, "A", "X", 10.0), (2, "B", "X", 1.0), (3, "C", "Y", 10.0)])
+    conn.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?)", [
+        (1, 1, 1, 5, "2023-01-01"), (2, 1, 2, 3, "2023-01-02"), (3, 2, 3, 3, "2023-02-01"), (4, 2, 1, 1, "2023-02-03"),
+    ])
+    assert top_k_articles_sql(conn, k=2).to_dict() == {"A": 6, "B": 3}
+    assert top_k_articles_sql(conn, k=1, measure="revenue", partition_by="month").to_dict() == {
+        (202301, "A"): 50.0, (202302, "C"): 30.0,
+    }
+    conn.close()
@@ -0,0 +1,64 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from utils import log_queue, setup_logging, shutdown_logging, worker_logging
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    level = logging.getLogger().level
+    yield
+    shutdown_logging()
+    logging.getLogger().setLevel(level)
+
+def _log_from_worker(message: str) -> int:
+    logging.info(message)
+    return os.getpid()
+
+class _CountingPayload:
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "payload"
+
+def test_setup_logging_is_idempotent_and_flushes_on_shutdown(tmp_path):
+    setup_logging(log_file=str(tmp_path / "a.log"))
+    setup_logging(log_file=str(tmp_path / "b.log"))
+    logging.info("hello %s", "world")
+    shutdown_logging()
+    assert "[INFO] hello world" in (tmp_path / "a.log").read_text()
+    assert not (tmp_path / "b.log").exists()
+    assert log_queue() is None
+
+def test_debug_payloads_are_not_formatted_at_info(tmp_path):
+    setup_logging(log_file=str(tmp_path / "app.log"))
+    payload = _CountingPayload()
+    logging.debug("metric table:\n%s", payload)
+    assert payload.formatted == 0
+    logging.info("metric table:\n%s", payload)
+    assert payload.formatted >= 1  # pytest's capture handlers format it too
+
+def test_json_lines_and_rotation(tmp_path):
+    setup_logging(log_file=str(tmp_path / "app.log"), json_lines=True, max_bytes=2_000, backup_count=2)
+    for i in range(100):
+        logging.warning("record %s", i)
+    shutdown_logging()
+    assert (tmp_path / "app.log.1").exists() and not (tmp_path / "app.log.3").exists()
+    entries = [json.loads(line) for line in (tmp_path / "app.log").read_text().splitlines()]
+    assert entries[-1]["message"] == "record 99" and entries[-1]["level"] == "WARNING"
+
+def test_worker_processes_log_through_the_listener(tmp_path):
+    setup_logging(log_file=str(tmp_path / "app.log"), json_lines=True)
+    with ProcessPoolExecutor(2, initializer=worker_logging, initargs=(log_queue(), logging.INFO)) as executor:
+        pids = set(executor.map(_log_from_worker, ["from worker"] * 4))
+    shutdown_logging()
+    entries = [json.loads(line) for line in (tmp_path / "app.log").read_text().splitlines()]
+    worker_entries = [entry for entry in entries if entry["message"] == "from worker"]
+    assert len(worker_entries) == 4
+    assert {entry["process"] for entry in worker_entries} <= pids
+    assert os.getpid() not in pids
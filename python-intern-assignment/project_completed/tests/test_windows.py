@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from windows import (
+    RollingRevenue, daily_revenue, daily_revenue_from_chunks, month_over_month_growth, rolling_revenue
+)
+
+
+@pytest.fixture
+def sales_with_price():
+    rng = np.random.default_rng(1)
+    days = pd.to_datetime("2023-01-01") + pd.to_timedelta(rng.integers(0, 120, 400), unit="D")
+    return pd.DataFrame({
+        "branch_id": rng.integers(1, 4, 400),
+        "sale_date": days + pd.to_timedelta(rng.integers(0, 86400, 400), unit="s"),
+        "total_amount": rng.integers(1, 100, 400).astype(float),
+    })
+
+def _naive_rolling(sales_with_price, branch, window):
+    branch_sales = sales_with_price[sales_with_price["branch_id"] == branch]
+    per_day = branch_sales.groupby(branch_sales["sale_date"].dt.normalize())["total_amount"].sum()
+    return per_day.asfreq("D", fill_value=0).rolling(f"{window}D").sum()
+
+def test_rolling_revenue_matches_naive_rolling_sum(sales_with_price):
+    result = rolling_revenue(daily_revenue(sales_with_price, by="branch"), windows=(7, 30))
+    for branch in (1, 2, 3):
+        naive = _naive_rolling(sales_with_price, branch, 30)
+        computed = result.loc[branch, "revenue_30d"].loc[naive.index]
+        np.testing.assert_allclose(computed.to_numpy(), naive.to_numpy())
+
+def test_streaming_daily_totals(sales_with_price):
+    chunks = [sales_with_price.iloc[:150], sales_with_price.iloc[150:]]
+    pd.testing.assert_series_equal(
+        daily_revenue_from_chunks(chunks, by="branch"), daily_revenue(sales_with_price, by="branch")
+    )
+
+def test_incremental_windows_match_batch(sales_with_price):
+    """
+    Tests that adding days one at a time (including gaps) gives the batch result, and that
+    a state rebuilt from stored daily totals continues identically.
+    """
+    daily = daily_revenue(sales_with_price, by="branch")
+    batch = rolling_revenue(daily)
+    days = sorted(daily.index.get_level_values("day").unique())
+    state = RollingRevenue()
+    for day in days[:60]:
+        state.add_day(day, daily.xs(day, level="day"))
+    resumed = RollingRevenue.from_daily(daily[daily.index.get_level_values("day") <= days[59]])
+    for day in days[60:]:
+        latest = state.add_day(day, daily.xs(day, level="day"))
+        resumed.add_day(day, daily.xs(day, level="day"))
+        expected = batch.xs(day, level="day").loc[latest.index]
+        np.testing.assert_allclose(latest.to_numpy(), expected.to_numpy())
+    np.testing.assert_allclose(resumed.current().sort_index(), state.current().sort_index())
+    with pytest.raises(ValueError):
+        state.add_day(days[0], 1.0)
+
+def test_month_over_month_growth():
+    daily = pd.Series(
+        [100.0, 50.0, 150.0],
+        index=pd.DatetimeIndex(["2023-01-05", "2023-01-20", "2023-03-01"], name="day"),
+    )
+    growth = month_over_month_growth(daily)
+    assert growth["revenue"].to_dict() == {202301: 150.0, 202302: 0.0, 202303: 150.0}
+    assert np.isnan(growth.loc[202301, "growth"]) and growth.loc[202302, "growth"] == -1.0
+    assert np.isnan(growth.loc[202303, "growth"])
+
+def test_empty_daily_series():
+    empty = pd.Series(dtype=float, index=pd.DatetimeIndex([], name="day"))
+    assert month_over_month_growth(empty).empty
+    assert list(month_over_month_growth(empty).columns) == ["revenue", "previous_revenue", "growth"]
+    assert list(rolling_revenue(empty, (7,)).columns) == ["revenue_7d"]
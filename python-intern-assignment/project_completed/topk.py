@@ -0,0 +1,182 @@
+import heapq
+import logging
+import sqlite3
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from aggregation import Metric, combine_metric_results, compute_metrics
+
+# Ranking measure -> column of the processed sales frame
+TOP_K_MEASURES = {"quantity": "quantity", "revenue": "total_amount"}
+
+# Partition -> column of the processed sales frame
+TOP_K_PARTITIONS = {"category": "category", "branch": "branch_id", "month": "year_month"}
+
+# The same measures and partitions as SQL expressions over sales s JOIN articles a
+_SQL_MEASURES = {"quantity": "SUM(s.quantity)", "revenue": "TOTAL(s.quantity * a.price)"}
+_SQL_PARTITIONS = {
+    "category": "a.category",
+    "branch": "s.branch_id",
+    "month": "CAST(strftime('%Y%m', s.sale_date) AS INTEGER)",
+}
+
+
+def _top_k_metric(measure: str, partition_by: Optional[str]) -> Metric:
+    if measure not in TOP_K_MEASURES:
+        raise ValueError(f"Unknown measure: {measure}. Use one of {tuple(TOP_K_MEASURES)}")
+    if partition_by is not None and partition_by not in TOP_K_PARTITIONS:
+        raise ValueError(f"Unknown partition: {partition_by}. Use one of {tuple(TOP_K_PARTITIONS)}")
+    keys = ("article_name",) if partition_by is None else (TOP_K_PARTITIONS[partition_by], "article_name")
+    return Metric(f"top_{measure}_by_{partition_by}", keys, TOP_K_MEASURES[measure])
+
+
+def select_top_k(totals: pd.Series, k: int) -> pd.Series:
+    """
+    Returns the k largest values, largest first, ties in index order. The k-th largest value is
+    found with a linear-time partition and only the values at or above it are sorted,
+    so the cost is O(n + k log k) instead of a full sort.
+    """
+    totals = totals[totals.notna()]
+    if k <= 0:
+        return totals.iloc[:0]
+    values = totals.to_numpy()
+    if k < len(values):
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        candidates = np.flatnonzero(values >= kth)  # keeps every tie at the boundary
+    else:
+        candidates = np.arange(len(values))
+    order = np.lexsort((candidates, -values[candidates].astype(np.float64)))[:k]
+    return totals.iloc[candidates[order]]
+
+
+def _per_partition(totals: pd.Series, k: int) -> pd.Series:
+    groups = totals.groupby(level=0, sort=True).indices
+    pieces = [select_top_k(totals.iloc[positions], k) for _, positions in sorted(groups.items())]
+    return pd.concat(pieces) if pieces else totals.iloc[:0]
+
+
+def _select(totals: pd.Series, k: int, partition_by: Optional[str]) -> pd.Series:
+    return select_top_k(totals, k) if partition_by is None else _per_partition(totals, k)
+
+
+def _with_partition_column(sales_with_price: pd.DataFrame, partition_by: Optional[str]) -> pd.DataFrame:
+    if partition_by != "month" or "year_month" in sales_with_price.columns:
+        return sales_with_price
+    return sales_with_price.assign(year_month=sales_with_price["year"] * 100 + sales_with_price["month"])
+
+
+def top_k_articles(
+    sales_with_price: pd.DataFrame,
+    k: int = 5,
+    measure: str = "quantity",
+    partition_by: Optional[str] = None,
+) -> pd.Series:
+    """
+    Returns the k best-selling articles by quantity or revenue, overall or per category,
+    branch or month (yyyymm). Partitioned results are indexed by (partition, article_name).
+    """
+    metric = _top_k_metric(measure, partition_by)
+    df = _with_partition_column(sales_with_price, partition_by)
+    totals = compute_metrics(df, [metric], finalize=False)[metric.name]
+    return _select(totals, k, partition_by)
+
+
+def top_k_articles_from_chunks(
+    chunks: Iterable[pd.DataFrame],
+    k: int = 5,
+    measure: str = "quantity",
+    partition_by: Optional[str] = None,
+) -> pd.Series:
+    """
+    Streaming version of `top_k_articles`. Per-article totals are combined across chunks
+    (an article outside one chunk's top k can still make the overall top k) and the
+    selection runs once at the end.
+    """
+    metric = _top_k_metric(measure, partition_by)
+    totals = None
+    for chunk in chunks:
+        partial = compute_metrics(_with_partition_column(chunk, partition_by), [metric], finalize=False)
+        totals = combine_metric_results([metric], totals, partial)
+    if totals is None:
+        return pd.Series(dtype=float)
+    return _select(totals[metric.name], k, partition_by)
+
+
+def merge_top_k(candidates: Iterable[pd.Series], k: int) -> pd.Series:
+    """
+    Merges top-k results computed over disjoint groups, e.g. per-branch top k from workers
+    that each own whole branches. Every input is already ordered within its partitions, so
+    they are merged lazily with a heap and only k items per partition are taken.
+    """
+    candidates = [candidate for candidate in candidates if len(candidate)]
+    if not candidates:
+        return pd.Series(dtype=float)
+    partitioned = candidates[0].index.nlevels > 1
+    runs: Dict[object, List[List[Tuple[object, object]]]] = {}
+    for candidate in candidates:
+        by_partition: Dict[object, List[Tuple[object, object]]] = {}
+        for key, value in candidate.items():
+            by_partition.setdefault(key[0] if partitioned else None, []).append((key, value))
+        for partition, run in by_partition.items():
+            runs.setdefault(partition, []).append(run)
+    items = []
+    for partition in sorted(runs, key=lambda p: (p is None, p)):
+        merged = heapq.merge(*runs[partition], key=lambda item: item[1], reverse=True)
+        items.extend(islice(merged, k))
+    keys = [key for key, _ in items]
+    index = pd.MultiIndex.from_tuples(keys) if partitioned else pd.Index(keys)
+    index.names = candidates[0].index.names
+    return pd.Series([value for _, value in items], index=index, name=candidates[0].name)
+
+
+def top_k_articles_sql(
+    conn: sqlite3.Connection,
+    k: int = 5,
+    measure: str = "quantity",
+    partition_by: Optional[str] = None,
+) -> pd.Series:
+    """
+    Computes `top_k_articles` inside SQLite with k as a query parameter. Per-partition
+    results use ROW_NUMBER() over each partition.
+    """
+    metric = _top_k_metric(measure, partition_by)
+    value = metric.value
+    try:
+        if partition_by is None:
+            query = f"""
+                SELECT a.article_name, {_SQL_MEASURES[measure]} AS {value}
+                FROM sales s
+                JOIN articles a ON s.article_id = a.article_id
+                WHERE a.article_name IS NOT NULL
+                GROUP BY a.article_name
+                ORDER BY {value} DESC, a.article_name
+                LIMIT ?
+            """
+        else:
+            partition = metric.keys[0]
+            query = f"""
+                WITH totals AS (
+                    SELECT {_SQL_PARTITIONS[partition_by]} AS {partition}, a.article_name,
+                           {_SQL_MEASURES[measure]} AS {value}
+                    FROM sales s
+                    JOIN articles a ON s.article_id = a.article_id
+                    WHERE a.article_name IS NOT NULL
+                    GROUP BY 1, 2
+                ), ranked AS (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY {partition} ORDER BY {value} DESC, article_name
+                    ) AS rank
+                    FROM totals
+                    WHERE {partition} IS NOT NULL
+                )
+                SELECT {partition}, article_name, {value} FROM ranked
+                WHERE rank <= ?
+                ORDER BY {partition}, rank
+            """
+        df = pd.read_sql_query(query, conn, params=(int(k),))
+        return df.set_index(list(df.columns[:-1]))[value]
+    except Exception as e:
+        logging.error("Error occurred while selecting top %s articles in SQLite: %s", k, e)
+        return pd.Series(dtype=float)
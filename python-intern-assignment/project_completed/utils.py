@@ -1,11 +1,104 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import multiprocessing
+from typing import Optional
 
-def setup_logging(log_file: str = "app.log"):
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()  # This sends logs to the terminal
-        ]
-    )
\ No newline at end of file
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+# Set while logging is configured: the queue records go through and the listener writing them
+_queue = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line, for log shippers and ad-hoc analysis.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _file_handler(log_file: str, max_bytes: Optional[int], backup_count: int, rotate_when: Optional[str]) -> logging.Handler:
+    if max_bytes:
+        return logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    if rotate_when:
+        return logging.handlers.TimedRotatingFileHandler(log_file, when=rotate_when, backupCount=backup_count)
+    return logging.FileHandler(log_file)
+
+def setup_logging(
+    log_file: str = "app.log",
+    level: int = logging.INFO,
+    json_lines: bool = False,
+    max_bytes: Optional[int] = None,
+    backup_count: int = 5,
+    rotate_when: Optional[str] = None,
+):
+    """
+    Configures the root logger once per process. Records are put on a queue and written
+    to the log file and the terminal by one background listener thread, so logging never
+    blocks on I/O. The queue is a multiprocessing queue, so worker processes can log
+    through it too (see `worker_logging`). The file rotates at `max_bytes` or at
+    `rotate_when` (e.g. "midnight"); `json_lines` writes one JSON object per record.
+    Entry points call this; later calls are no-ops.
+    """
+    global _queue, _listener
+    if _listener is not None:
+        return
+    file_handler = _file_handler(log_file, max_bytes, backup_count, rotate_when)
+    file_handler.setFormatter(JsonLinesFormatter() if json_lines else logging.Formatter(LOG_FORMAT))
+    terminal = logging.StreamHandler()  # This sends logs to the terminal
+    terminal.setFormatter(logging.Formatter(LOG_FORMAT))
+    _queue = multiprocessing.Queue(-1)
+    _listener = logging.handlers.QueueListener(_queue, file_handler, terminal, respect_handler_level=True)
+    _listener.start()
+    _attach_queue(_queue, level)
+    atexit.register(shutdown_logging)
+
+def _attach_queue(queue, level: int):
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(queue))
+    root.setLevel(level)
+
+def log_queue():
+    """
+    Returns the queue configured by `setup_logging`, or None if logging is not configured.
+    """
+    return _queue
+
+def worker_logging(queue, level: int = logging.INFO):
+    """
+    Initializer for worker processes: sends their records to the parent's listener.
+    Does nothing when the parent has not configured logging (`queue` is None).
+    """
+    if queue is not None:
+        _attach_queue(queue, level)
+
+def shutdown_logging():
+    """
+    Writes out every queued record, stops the listener and closes the log files.
+    """
+    global _queue, _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+        root.removeHandler(handler)
+    for handler in _listener.handlers:
+        handler.close()
+    _queue.close()
+    _queue, _listener = None, None
@@ -0,0 +1,207 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from aggregation import Metric, combine_metric_results, compute_metrics
+
+DEFAULT_WINDOWS = (7, 30, 90)
+
+# Grouping -> column of the processed sales frame (None: one series for all sales)
+WINDOW_GROUPS = {"branch": "branch_id", "category": "category", None: None}
+
+
+def _daily_metric(by: Optional[str]) -> Metric:
+    if by not in WINDOW_GROUPS:
+        raise ValueError(f"Unknown grouping: {by}. Use one of {tuple(WINDOW_GROUPS)}")
+    keys = ("day",) if by is None else (WINDOW_GROUPS[by], "day")
+    return Metric(f"daily_revenue_by_{by}", keys, "total_amount")
+
+
+def _with_day(sales_with_price: pd.DataFrame) -> pd.DataFrame:
+    df = sales_with_price.copy(deep=False)
+    df["day"] = pd.to_datetime(df["sale_date"]).dt.normalize()
+    return df
+
+
+def daily_revenue(sales_with_price: pd.DataFrame, by: Optional[str] = None) -> pd.Series:
+    """
+    Pre-aggregates revenue per day, optionally per branch or category. The result is
+    indexed by (group, day), or by day alone, and only has days with sales.
+    """
+    metric = _daily_metric(by)
+    return compute_metrics(_with_day(sales_with_price), [metric], finalize=False)[metric.name]
+
+
+def daily_revenue_from_chunks(chunks: Iterable[pd.DataFrame], by: Optional[str] = None) -> pd.Series:
+    """
+    Streaming version of `daily_revenue`; only the per-day totals are kept between chunks.
+    """
+    metric = _daily_metric(by)
+    totals = None
+    for chunk in chunks:
+        partials = compute_metrics(_with_day(chunk), [metric], finalize=False)
+        totals = combine_metric_results([metric], totals, partials)
+    return totals[metric.name] if totals is not None else pd.Series(dtype=float)
+
+
+def _wide_daily(daily: pd.Series) -> pd.DataFrame:
+    """
+    Turns daily totals into a days x groups frame covering every calendar day, with 0 for
+    days without sales.
+    """
+    if daily.index.nlevels > 1:
+        wide = daily.unstack(level=0, fill_value=0)
+    else:
+        wide = daily.to_frame(name=None)
+    days = wide.index
+    return wide.reindex(pd.date_range(days.min(), days.max(), freq="D", name="day"), fill_value=0)
+
+
+def _long(values: np.ndarray, grouped: bool) -> np.ndarray:
+    """
+    Flattens a days x groups array in (group, day) order to match the long index.
+    """
+    return values.T.ravel() if grouped else values[:, 0]
+
+
+def rolling_revenue(daily: pd.Series, windows: Tuple[int, ...] = DEFAULT_WINDOWS) -> pd.DataFrame:
+    """
+    Returns trailing-window revenue (e.g. `revenue_7d`: the day itself and the 6 before it)
+    for every calendar day and group. Each window is the difference of two prefix sums,
+    so the cost is one pass over the days whatever the window lengths.
+    """
+    if daily.empty:
+        return pd.DataFrame(columns=[f"revenue_{window}d" for window in windows])
+    grouped = daily.index.nlevels > 1
+    wide = _wide_daily(daily)
+    values = wide.to_numpy(dtype=np.float64)
+    prefix = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    ends = np.arange(1, len(values) + 1)
+    columns = {}
+    for window in windows:
+        starts = np.maximum(ends - window, 0)
+        columns[f"revenue_{window}d"] = _long(prefix[ends] - prefix[starts], grouped)
+    if grouped:
+        index = pd.MultiIndex.from_product([wide.columns, wide.index], names=[daily.index.names[0], "day"])
+    else:
+        index = wide.index
+    return pd.DataFrame(columns, index=index)
+
+
+def month_over_month_growth(daily: pd.Series) -> pd.DataFrame:
+    """
+    Rolls daily totals up to yyyymm months and returns each month's revenue, the previous
+    month's revenue and the growth between them (NaN when the previous month had none).
+    Months without sales inside the covered range count as 0.
+    """
+    if daily.empty:
+        return pd.DataFrame(columns=["revenue", "previous_revenue", "growth"])
+    grouped = daily.index.nlevels > 1
+    days = daily.index.get_level_values(-1)
+    months = pd.PeriodIndex(days, freq="M")
+    keys = [daily.index.get_level_values(0), months] if grouped else [months]
+    monthly = daily.groupby(keys).sum()
+    if grouped:
+        wide = monthly.unstack(level=0, fill_value=0)
+    else:
+        wide = monthly.to_frame(name=None)
+    wide = wide.reindex(pd.period_range(wide.index.min(), wide.index.max(), freq="M"), fill_value=0)
+    current = wide.to_numpy(dtype=np.float64)
+    previous = np.vstack([np.full((1, current.shape[1]), np.nan), current[:-1]])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth = np.where(previous > 0, current / previous - 1, np.nan)
+    year_month = wide.index.year * 100 + wide.index.month
+    if grouped:
+        index = pd.MultiIndex.from_product([wide.columns, year_month], names=[daily.index.names[0], "year_month"])
+    else:
+        index = pd.Index(year_month, name="year_month")
+    return pd.DataFrame(
+        {
+            "revenue": _long(current, grouped),
+            "previous_revenue": _long(previous, grouped),
+            "growth": _long(growth, grouped),
+        },
+        index=index,
+    )
+
+
+class RollingRevenue:
+    """
+    Trailing-window revenue maintained one day at a time. A ring buffer per group holds the
+    last max(windows) daily totals and a running sum per window, so adding a day costs
+    O(groups x windows), independent of the window lengths and of the history before it.
+    Days must be added in increasing order; skipped days count as days without sales.
+    """
+
+    def __init__(self, windows: Tuple[int, ...] = DEFAULT_WINDOWS):
+        self.windows = tuple(windows)
+        self.size = max(self.windows)
+        self.groups: Dict[object, int] = {}
+        self.buffer = np.zeros((0, self.size))
+        self.sums = np.zeros((0, len(self.windows)))
+        self.day: Optional[pd.Timestamp] = None
+        self._position = -1  # days added so far - 1; the buffer slot is position % size
+
+    @classmethod
+    def from_daily(cls, daily: pd.Series, windows: Tuple[int, ...] = DEFAULT_WINDOWS) -> "RollingRevenue":
+        """
+        Starts from stored daily totals; only the last max(windows) days are replayed.
+        """
+        state = cls(windows)
+        if daily.empty:
+            return state
+        wide = _wide_daily(daily)
+        for day, row in wide.iloc[-state.size:].iterrows():
+            state.add_day(day, row if daily.index.nlevels > 1 else row.iloc[0])
+        return state
+
+    def _row(self, group) -> int:
+        if group not in self.groups:
+            self.groups[group] = len(self.groups)
+            self.buffer = np.vstack([self.buffer, np.zeros((1, self.size))])
+            self.sums = np.vstack([self.sums, np.zeros((1, len(self.windows)))])
+        return self.groups[group]
+
+    def _advance(self, values: np.ndarray):
+        self._position += 1
+        slot = self._position % self.size
+        for i, window in enumerate(self.windows):
+            # the value leaving the window; read before the slot is overwritten
+            leaving = self.buffer[:, (self._position - window) % self.size] if self._position >= window else 0.0
+            self.sums[:, i] += values - leaving
+        self.buffer[:, slot] = values
+
+    def add_day(self, day, totals) -> pd.DataFrame:
+        """
+        Adds one day's revenue (a Series by group, or a number when ungrouped) and returns
+        the windows ending on that day.
+        """
+        day = pd.Timestamp(day).normalize()
+        totals = totals if isinstance(totals, pd.Series) else pd.Series({None: totals})
+        if self.day is not None:
+            gap = (day - self.day).days
+            if gap < 1:
+                raise ValueError(f"Day {day.date()} is not after the last added day {self.day.date()}")
+            if gap > self.size:
+                # nothing from before the gap is still inside any window
+                self.buffer[:] = 0
+                self.sums[:] = 0
+                self._position += gap - 1
+            else:
+                for _ in range(gap - 1):
+                    self._advance(np.zeros(len(self.groups)))
+        rows = [self._row(group) for group in totals.index]
+        values = np.zeros(len(self.groups))
+        values[rows] = totals.to_numpy(dtype=np.float64)
+        self._advance(values)
+        self.day = day
+        return self.current()
+
+    def current(self) -> pd.DataFrame:
+        """
+        Returns the windows ending on the last added day, one row per group.
+        """
+        groups = list(self.groups)
+        return pd.DataFrame(
+            self.sums.copy(), index=pd.Index(groups), columns=[f"revenue_{window}d" for window in self.windows]
+        )